@@ -0,0 +1,6 @@
+"""
+Mesures de performance de l'application sur des decks synthétiques (1k à 1M cartes).
+
+    python -m benchmarks.deck 100000 -o deck.json       # génère un deck
+    python -m benchmarks.run --sizes 1000,10000,100000   # chronomètre les chemins critiques
+"""
@@ -0,0 +1,139 @@
+"""
+Générateur de decks synthétiques, reproductibles à graine égale.
+
+Les catégories suivent une loi de Zipf (quelques catégories très fournies, beaucoup de petites),
+les boîtes une répartition donnée en poids, et les dates de révision sont tirées dans les
+`max_age` derniers jours : une partie des cartes est due, comme dans un vrai deck.
+
+L'historique des révisions (generate_history) simule un élève : chaque carte a une mémoire qui
+s'oublie selon la courbe d'algorithms.retrievability, renforcée à chaque bonne réponse.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from src.algorithms import DAY, retrievability
+from src.history import RECORD, card_key
+from src.scheduler import INTERVAL_SECONDS
+
+DEFAULT_BOX_WEIGHTS = (40, 25, 15, 12, 8)  # Les cartes s'accumulent dans les premières boîtes
+DEFAULT_CATEGORIES = 12
+DEFAULT_SKEW = 1.1  # Exposant de Zipf ; 0 pour des catégories de même taille
+DEFAULT_MAX_AGE = 60  # Jours
+DEFAULT_REVIEWS_PER_CARD = 10  # Révisions par carte dans l'historique synthétique
+
+CATEGORY_NAMES = ("git", "bash", "docker", "python", "sql", "vim", "kubectl", "regex",
+                  "ssh", "systemd", "tmux", "awk", "sed", "make", "npm", "cargo")
+VERBS = ("afficher", "supprimer", "renommer", "lister", "compresser", "annuler", "copier",
+         "fusionner", "filtrer", "trier", "chercher", "redémarrer", "inspecter", "exporter")
+OBJECTS = ("la branche", "le fichier", "le conteneur", "la table", "le processus", "le dépôt",
+           "le service", "la session", "le tampon", "l'archive", "le paquet", "l'image")
+FLAGS = ("--all", "-r", "--force", "-v", "--dry-run", "-n", "--quiet", "-p", "--since", "-i")
+
+
+def category_names(count):
+    """Noms des `count` catégories : les noms connus, puis numérotés au-delà."""
+    return [CATEGORY_NAMES[i] if i < len(CATEGORY_NAMES) else f"categorie-{i}" for i in range(count)]
+
+
+def generate_deck(size, seed=0, categories=DEFAULT_CATEGORIES, skew=DEFAULT_SKEW,
+                  box_weights=DEFAULT_BOX_WEIGHTS, max_age=DEFAULT_MAX_AGE, now=None):
+    """
+    Génère `size` cartes (dictionnaires au format du deck), toujours les mêmes pour une même graine.
+    Les questions sont uniques ; les identifiants sont dérivés de la graine et du rang.
+    """
+    rng = random.Random(seed)
+    names = category_names(categories)
+    category_weights = [1 / (rank + 1) ** skew for rank in range(categories)]
+    # Dates relatives au jour courant : la part de cartes dues reste la même d'un jour à l'autre
+    now = now or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    # Tirages groupés : bien plus rapides qu'un appel à rng.choices par carte
+    card_categories = rng.choices(names, category_weights, k=size)
+    boxes = rng.choices(range(len(box_weights)), box_weights, k=size)
+    max_age_seconds = max_age * 86400
+
+    cards = []
+    for i in range(size):
+        verb, object, flag = rng.choice(VERBS), rng.choice(OBJECTS), rng.choice(FLAGS)
+        category = card_categories[i]
+        revised = now - timedelta(seconds=rng.random() * max_age_seconds)
+        cards.append({
+            'id': f"{seed:08x}{i:024x}",
+            'question': f"Comment {verb} {object} n°{i} avec {category} ?",
+            'command': f"{category} {verb} {flag} {i}",
+            'box': boxes[i],
+            'category': category,
+            'last_revision': revised.isoformat(),
+        })
+    return cards
+
+
+def write_deck(path, cards):
+    """Écrit le deck au format de JsonStorage (une carte par ligne)."""
+    encode = json.JSONEncoder(separators=(',', ':')).encode
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("[\n" + ",\n".join(encode(card) for card in cards) + "\n]\n")
+
+
+def generate_history(path, cards, reviews_per_card=DEFAULT_REVIEWS_PER_CARD, seed=0, now=None):
+    """
+    Écrit un historique de révisions synthétique (format de history.ReviewHistory), reproductible
+    à graine égale : `reviews_per_card` révisions par carte, chacune à l'échéance de sa boîte
+    (avec un retard aléatoire), réussie avec la probabilité de s'en souvenir. La stabilité de
+    la mémoire de chaque carte est multipliée à chaque bonne réponse, réduite à chaque erreur.
+    La dernière révision a lieu un jour avant `now`. Renvoie le nombre de révisions écrites.
+    """
+    rng = random.Random(seed)
+    events = []
+    for card in cards:
+        key, box, stability, timestamp = card_key(card['id']), 0, rng.lognormvariate(0, 1), 0.0
+        for _ in range(reviews_per_card):
+            elapsed = INTERVAL_SECONDS[box] * rng.uniform(0.8, 2.0)
+            timestamp += elapsed
+            correct = rng.random() < retrievability(elapsed / DAY, stability)
+            after = min(box + 1, len(INTERVAL_SECONDS) - 1) if correct else max(box - 1, 0)
+            stability *= 2.5 if correct else 0.5
+            events.append((timestamp, key, box << 4 | after, correct))
+            box = after
+    events.sort(key=lambda event: event[0])
+    offset = (now or time.time()) - DAY - (events[-1][0] if events else 0.0)
+    with open(path, "wb") as file:
+        file.write(b"".join(RECORD.pack(timestamp + offset, key, boxes, correct, 0xFFFF, 5.0)
+                            for timestamp, key, boxes, correct in events))
+    return len(events)
+
+
+def parse_weights(text):
+    """Poids des boîtes, séparés par des virgules (« 40,25,15,12,8 »)."""
+    try:
+        weights = [float(weight) for weight in text.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"poids invalides : {text!r}")
+    if not weights or any(weight < 0 for weight in weights) or not any(weights):
+        raise argparse.ArgumentTypeError(f"poids invalides : {text!r}")
+    return weights
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.deck", description="Génère un deck synthétique.")
+    parser.add_argument("size", type=int, help="nombre de cartes")
+    parser.add_argument("-o", "--output", default="leitner_cards.json")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--categories", type=int, default=DEFAULT_CATEGORIES)
+    parser.add_argument("--skew", type=float, default=DEFAULT_SKEW, help="exposant de Zipf des catégories")
+    parser.add_argument("--boxes", type=parse_weights, default=DEFAULT_BOX_WEIGHTS,
+                        help="poids des boîtes, par exemple 40,25,15,12,8")
+    parser.add_argument("--max-age", type=int, default=DEFAULT_MAX_AGE, help="ancienneté maximale des révisions, en jours")
+    args = parser.parse_args(argv)
+
+    cards = generate_deck(args.size, args.seed, args.categories, args.skew, args.boxes, args.max_age)
+    write_deck(args.output, cards)
+    print(f"{len(cards)} carte(s) écrite(s) dans {args.output}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
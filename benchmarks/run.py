@@ -0,0 +1,390 @@
+"""
+Chronomètre les chemins critiques de l'application sur des decks synthétiques de taille croissante :
+chargement, sauvegarde, modification et requêtes du deck (LeitnerService), puis filtrage de la
+liste des cartes, boîtes de révision et session de révision complète, sous Qt hors écran.
+
+    python -m benchmarks.run --sizes 1000,10000,100000 --storage json,sqlite,binary -o resultats.json
+    python -m benchmarks.run --baseline resultats.json    # compare à une exécution précédente
+
+Chaque mesure est répétée ; le fichier JSON donne, en millisecondes, le minimum, la médiane,
+la moyenne et le maximum, sous une clé « moteur/taille/mesure ». La comparaison porte sur
+les médianes : le code de sortie vaut 1 si une mesure a ralenti au-delà de la tolérance.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from src.model import LeitnerService
+from src.storage import BinaryStorage, JsonStorage, ShardedStorage, SqliteStorage
+
+from .deck import (DEFAULT_BOX_WEIGHTS, DEFAULT_CATEGORIES, DEFAULT_MAX_AGE, DEFAULT_REVIEWS_PER_CARD,
+                   DEFAULT_SKEW, category_names, generate_deck, generate_history, parse_weights, write_deck)
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_REPEAT = 5
+UPDATES = 200  # Cartes modifiées par mesure de update_card
+BULK = 500  # Cartes sélectionnées par action en masse
+EXECUTIONS = 20  # Réponses exécutées par mesure du mode 'execute'
+SESSION_LENGTH = 50  # Réponses données pendant une session de révision simulée
+CORRECT_RATE = 0.8  # Part de bonnes réponses pendant la session
+DEFAULT_TOLERANCE = 0.25  # Ralentissement toléré (médiane) avant de signaler une régression
+NOISE_FLOOR_MS = 0.05  # En dessous, un écart n'est pas significatif
+
+
+def summarize(samples):
+    """Statistiques d'une série de durées (secondes), en millisecondes."""
+    samples = [sample * 1000 for sample in samples]
+    return {
+        'min': round(min(samples), 4),
+        'median': round(statistics.median(samples), 4),
+        'mean': round(statistics.fmean(samples), 4),
+        'max': round(max(samples), 4),
+        'runs': len(samples),
+    }
+
+
+def measure(func, repeat, setup=None, per=1):
+    """Exécute `func` `repeat` fois (précédée de `setup`, non chronométrée) ; durée par opération si `per` > 1."""
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) / per)
+    return summarize(samples)
+
+
+class Bench:
+    """Décks et résultats d'une exécution."""
+
+    def __init__(self, args):
+        self.args = args
+        self.results = {}
+        self.app = None  # QApplication, créée à la première mesure des vues
+
+    def record(self, kind, size, name, stats):
+        key = f"{kind}/{size}/{name}"
+        self.results[key] = stats
+        print(f"{key:<55} {stats['median']:>12.3f} ms", file=sys.stderr)
+
+    def make_storage(self, kind, directory):
+        deck_path = os.path.join(directory, "leitner_cards.json")
+        if kind == "sqlite":
+            return SqliteStorage(os.path.join(directory, "leitner_cards.db"), deck_path)
+        if kind == "binary":
+            return BinaryStorage(os.path.join(directory, "leitner_cards.bin"), deck_path)
+        if kind == "sharded":
+            return ShardedStorage(os.path.join(directory, "leitner_shards"), deck_path)
+        return JsonStorage(deck_path)
+
+    def run(self):
+        args = self.args
+        for size in args.sizes:
+            cards = generate_deck(size, args.seed, args.categories, args.skew, args.boxes, args.max_age)
+            for kind in args.storage:
+                with tempfile.TemporaryDirectory(prefix="leitner-bench-") as directory:
+                    write_deck(os.path.join(directory, "leitner_cards.json"), cards)
+                    self.run_deck(kind, size, directory, cards)
+            del cards
+
+    def run_deck(self, kind, size, directory, cards):
+        args = self.args
+        repeat = args.repeat
+        storage = self.make_storage(kind, directory)
+        if kind in ("sqlite", "binary", "sharded"):
+            # Premier lancement : import du deck JSON, hors mesure
+            storage.load()
+            storage.close()
+        # Après l'import : le dossier du stockage découpé (sharded) n'est créé que par lui
+        generate_history(storage.sidecar_path("leitner_history.bin"), cards, args.reviews_per_card, args.seed)
+
+        services = []
+
+        def new_service():
+            while services:
+                services.pop().close()
+            services.append(LeitnerService(self.make_storage(kind, directory), load=False))
+
+        self.record(kind, size, "load_cards", measure(lambda: services[-1].load_cards(), repeat, new_service))
+        # Démarrage puis révision d'une seule catégorie (la découpe par catégorie n'en charge qu'une)
+        category = category_names(self.args.categories)[-1]
+
+        def load_category():
+            services[-1].load_cards()
+            services[-1].get_due_cards(0, category)
+
+        self.record(kind, size, "load_cards+due_category", measure(load_category, repeat, new_service))
+        service = services[-1]
+        try:
+            self.run_service(kind, size, service)
+            if self.args.views:
+                self.run_views(kind, size, service)
+        finally:
+            service.close()
+
+    def run_service(self, kind, size, service):
+        repeat = self.args.repeat
+        rng = random.Random(self.args.seed)
+        cards = service.get_all_cards()
+
+        self.record(kind, size, "save_cards", measure(service.save_cards, repeat))
+
+        def update_cards():
+            for card in rng.sample(cards, min(UPDATES, len(cards))):
+                card['box'] = (card['box'] + 1) % 5
+                service.update_card(card)
+
+        self.record(kind, size, "update_card", measure(update_cards, repeat, per=min(UPDATES, len(cards))))
+        # Les modifications sont écrites en arrière-plan : coût de leur écriture effective
+        self.record(kind, size, "update_card+flush", measure(service.flush, repeat, update_cards))
+
+        names = category_names(self.args.categories)
+        queries = [(box, category) for box in range(5) for category in ("All", names[0], names[-1])]
+
+        def query_boxes():
+            for box, category in queries:
+                service.get_cards_by_box_and_category(box, category)
+
+        self.record(kind, size, "get_cards_by_box_and_category",
+                    measure(query_boxes, repeat, per=len(queries)))
+        self.record(kind, size, "get_all_categories", measure(service.get_all_categories, repeat))
+
+        # Action en masse (sélection multiple) : une transaction, donc une seule écriture
+        def move_cards():
+            service.move_cards([card['id'] for card in rng.sample(cards, min(BULK, len(cards)))], 2)
+            service.flush()
+
+        self.record(kind, size, "move_cards+flush", measure(move_cards, repeat))
+
+        # Renommage d'une catégorie puis retour au nom d'origine (cartes de la catégorie seulement)
+        def rename_category():
+            service.rename_category(names[-1], names[-1] + "-renamed")
+            service.rename_category(names[-1] + "-renamed", names[-1])
+
+        self.record(kind, size, "rename_category", measure(rename_category, repeat, per=2))
+
+        # Réponse enregistrée : changement de boîte, écriture et ajout à l'historique
+        service.history.stats  # Agrégats de l'historique synthétique calculés hors mesure
+
+        def review_cards():
+            for card in rng.sample(cards, min(UPDATES, len(cards))):
+                service.review_card(card, rng.random() < CORRECT_RATE, 5.0)
+
+        self.record(kind, size, "review_card", measure(review_cards, repeat, per=min(UPDATES, len(cards))))
+        recent = time.time() - 3600
+        self.record(kind, size, "history_range", measure(lambda: list(service.history.events(recent)), repeat))
+
+        # Mode 'execute' : verdict d'une première réponse à chaque carte, exécutée dans le bac à
+        # sable avec la commande attendue (deux processus par réponse, en même temps)
+        from src.matching import make_matcher
+        matcher, service.matcher = service.matcher, make_matcher("execute")
+        sample = rng.sample(cards, min(EXECUTIONS, len(cards)))
+
+        def submit_answers():
+            for card in sample:
+                service.submit_answer(card, "echo réponse fausse").result()
+
+        service.prepare_answers()
+        submit_answers()  # Processus d'exécution lancés
+        if not service.command_pool.unavailable:
+            self.record(kind, size, "submit_answer[execute]",
+                        measure(submit_answers, repeat, service.command_pool.clear, per=len(sample)))
+        service.matcher = matcher
+
+        # Doublons : index MinHash construit d'un coup, rapport sur tout le deck, puis recherche
+        # des cartes semblables à une carte (ajout d'une carte)
+        index = service.duplicate_index
+        self.record(kind, size, "duplicate_index_build", measure(index.ensure_built, 1, index.reset))
+        self.record(kind, size, "find_duplicates", measure(service.find_duplicates, 1))
+        probes = [{'question': card['question'] + " ?", 'command': card['command']}
+                  for card in rng.sample(cards, min(UPDATES, len(cards)))]
+        self.record(kind, size, "find_similar",
+                    measure(lambda: [service.find_similar(card) for card in probes], repeat, per=len(probes)))
+
+        # Statistiques : conversion du deck en tableaux NumPy, puis prévision sur 90 jours
+        from src import forecast
+        self.record(kind, size, "forecast_arrays", measure(lambda: forecast.DeckArrays(cards), repeat))
+        deck = forecast.DeckArrays(cards)
+        self.record(kind, size, "forecast_90_days", measure(lambda: forecast.forecast(deck), repeat))
+
+        # Algorithmes de planification : lecture de l'historique, ajustement des paramètres
+        # (une seule fois : plusieurs secondes sur un million de révisions), puis changement
+        # d'algorithme, qui recalcule et enregistre l'échéance de toutes les cartes
+        from src import optimizer
+        from src.algorithms import ALGORITHMS, make_algorithm
+        self.record(kind, size, "history_read_all", measure(lambda: optimizer.ReviewLog.read(service.history), repeat))
+        log = optimizer.ReviewLog.read(service.history)
+        for name in ALGORITHMS:
+            self.record(kind, size, f"fit_algorithm[{name}]", measure(lambda: optimizer.fit(make_algorithm(name), log), 1))
+        self.record(kind, size, "set_algorithm[fsrs]", measure(lambda: service.set_algorithm(make_algorithm("fsrs"), log), 1))
+        self.record(kind, size, "set_algorithm[leitner]",
+                    measure(lambda: service.set_algorithm(make_algorithm("leitner"), log), 1))
+
+    def run_views(self, kind, size, service):
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PySide6.QtCore import QCoreApplication, QEvent
+        from PySide6.QtWidgets import QApplication
+        from src.store import CardStore
+        from src.views.card_management_view import CardManagementView
+        from src.views.review_view import ReviewView, StartReviewView
+
+        if self.app is None:
+            self.app = QApplication.instance() or QApplication([])
+
+        def delete_later():
+            # Sans boucle d'événements, les widgets remplacés ne sont détruits qu'à la demande
+            QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+
+        repeat = self.args.repeat
+        store = CardStore(service)
+        names = category_names(self.args.categories)
+
+        management = CardManagementView(store)
+        management.index_timer.stop()
+        self.record(kind, size, "view/search_index_build",
+                    measure(self.build_search_index(service), 1))
+        filters = {
+            'all': ("", "Toutes les catégories"),
+            'keyword': ("fusionner", "Toutes les catégories"),
+            'keyword+category': ("fusionner", names[0]),
+            'rare': (f"n°{size // 2} ", "Toutes les catégories"),
+        }
+        for label, (keyword, category) in filters.items():
+            management.search_input.setText(keyword)
+            management.category_combo.blockSignals(True)
+            management.category_combo.setCurrentText(category)
+            management.category_combo.blockSignals(False)
+            self.record(kind, size, f"view/filter_cards[{label}]", measure(management.filter_cards, repeat))
+            self.record(kind, size, f"view/display_cards[{label}]", measure(management.display_cards, repeat))
+        management.close()
+
+        review = ReviewView(store)
+        for category in ("All", names[0]):
+            review.category_input.blockSignals(True)
+            review.category_input.setCurrentText(category)
+            review.category_input.blockSignals(False)
+            self.record(kind, size, f"view/update_revision_boxes[{category}]",
+                        measure(review.update_revision_boxes, repeat, delete_later))
+        review.close()
+
+        rng = random.Random(self.args.seed)
+
+        def review_session():
+            # Ouverture de la boîte 1, puis réponses successives, comme au clavier
+            view = StartReviewView(store, 0, "All")
+            for _ in range(min(SESSION_LENGTH, len(view.questions))):
+                card = view.questions[view.current_index]
+                answer = card['command'] if rng.random() < CORRECT_RATE else "réponse fausse"
+                view.command_input.setPlainText(answer)
+                view.submit_revision()
+                view.next_question()
+            view.close()
+
+        self.record(kind, size, "view/review_session", measure(review_session, repeat, delete_later))
+        delete_later()
+
+    @staticmethod
+    def build_search_index(service):
+        def build():
+            service.search_index.reset()
+            while not service.search_index.build_step():
+                pass
+        return build
+
+    def metadata(self):
+        args = self.args
+        try:
+            commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                    text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'commit': commit,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sizes': args.sizes,
+            'storage': args.storage,
+            'repeat': args.repeat,
+            'seed': args.seed,
+            'categories': args.categories,
+            'skew': args.skew,
+            'boxes': list(args.boxes),
+            'max_age': args.max_age,
+            'reviews_per_card': args.reviews_per_card,
+            'views': args.views,
+        }
+
+
+def compare(results, baseline, tolerance):
+    """Affiche l'écart des médianes avec une exécution précédente ; renvoie les clés en régression."""
+    regressions = []
+    for key, stats in results.items():
+        if key not in baseline:
+            continue
+        before, after = baseline[key]['median'], stats['median']
+        change = (after - before) / before if before else 0.0
+        slower = after - before > NOISE_FLOOR_MS and change > tolerance
+        if slower:
+            regressions.append(key)
+        print(f"{key:<55} {before:>10.3f} -> {after:>10.3f} ms  {change:+7.1%}{'  RÉGRESSION' if slower else ''}")
+    return regressions
+
+
+def parse_list(convert):
+    def parse(text):
+        try:
+            return [convert(item) for item in text.split(",") if item]
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"liste invalide : {text!r}")
+    return parse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="Mesures de performance sur des decks synthétiques.")
+    parser.add_argument("--sizes", type=parse_list(int), default=list(DEFAULT_SIZES), help="tailles de deck, par exemple 1000,10000,1000000")
+    parser.add_argument("--storage", type=parse_list(str), default=["json"], help="moteurs de stockage : json, sqlite, binary, sharded, ou plusieurs (json,sqlite)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--categories", type=int, default=DEFAULT_CATEGORIES)
+    parser.add_argument("--skew", type=float, default=DEFAULT_SKEW, help="exposant de Zipf des catégories")
+    parser.add_argument("--boxes", type=parse_weights, default=DEFAULT_BOX_WEIGHTS, help="poids des boîtes, par exemple 40,25,15,12,8")
+    parser.add_argument("--max-age", type=int, default=DEFAULT_MAX_AGE, help="ancienneté maximale des révisions, en jours")
+    parser.add_argument("--reviews-per-card", type=int, default=DEFAULT_REVIEWS_PER_CARD,
+                        help="révisions par carte dans l'historique synthétique")
+    parser.add_argument("--no-views", dest="views", action="store_false", help="sans les mesures des vues Qt")
+    parser.add_argument("-o", "--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="résultats précédents à comparer")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="ralentissement toléré (0.25 = 25 %%)")
+    args = parser.parse_args(argv)
+    unknown = set(args.storage) - {"json", "sqlite", "binary", "sharded"}
+    if unknown:
+        parser.error(f"moteur de stockage inconnu : {', '.join(sorted(unknown))}")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)['results']
+
+    bench = Bench(args)
+    bench.run()
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump({'meta': bench.metadata(), 'results': bench.results}, file, indent=2)
+    print(f"Résultats écrits dans {args.output}.", file=sys.stderr)
+
+    if baseline is not None and compare(bench.results, baseline, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Temps de démarrage, mesuré dans des processus neufs :
+
+- import de l'application graphique (src.main) et de la ligne de commande (src.cli), d'après
+  `python -X importtime`, avec les modules les plus coûteux ;
+- délai jusqu'à l'affichage de la fenêtre d'accueil (Qt hors écran).
+
+    python -m benchmarks.startup -o demarrage.json [--baseline avant.json]
+
+La ligne de commande ne doit jamais importer PySide6 : le script échoue si c'est le cas.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from .run import DEFAULT_TOLERANCE, compare, summarize
+
+DEFAULT_REPEAT = 5
+TOP_MODULES = 15
+
+# Affiche la fenêtre d'accueil puis quitte aussitôt, sans attendre la boucle d'événements
+SHOW_WINDOW = """
+import os
+from PySide6.QtWidgets import QApplication
+from src.main import LeitnerApp
+app = QApplication([])
+window = LeitnerApp()
+window.show()
+app.processEvents()
+os._exit(0)
+"""
+
+
+def python(*args, env=None):
+    """Lance un interpréteur neuf à la racine du dépôt ; renvoie (durée en secondes, stderr)."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, *args], cwd=root, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} a échoué :\n{process.stderr}")
+    return elapsed, process.stderr
+
+
+def import_times(module):
+    """
+    Sortie de -X importtime : {module: (propre, cumulé)} en secondes, dans l'ordre d'import.
+    Les lignes ont la forme « import time:   self [us] | cumulative | module ».
+    """
+    _, stderr = python("-X", "importtime", "-c", f"import {module}")
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(own) / 1e6, int(cumulative) / 1e6)
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description="Temps de démarrage de l'application.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("-o", "--output", default="startup_results.json")
+    parser.add_argument("--baseline", help="résultats précédents à comparer")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    results = {}
+    details = {}
+    for module in ("src.main", "src.cli"):
+        runs = [import_times(module) for _ in range(args.repeat)]
+        results[f"startup/import {module}"] = summarize([times[module][1] for times in runs])
+        pyside = sorted(name.strip() for name in runs[0] if name.strip().startswith("PySide6"))
+        if module == "src.cli" and pyside:
+            raise SystemExit(f"src.cli importe PySide6 ({', '.join(pyside)})")
+        slowest = sorted(runs[0].items(), key=lambda item: -item[1][0])[:TOP_MODULES]
+        details[module] = {
+            'pyside6_modules': pyside,
+            'slowest_modules_ms': {name.strip(): round(own * 1000, 3) for name, (own, _) in slowest},
+        }
+
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    results["startup/window shown"] = summarize([python("-c", SHOW_WINDOW, env=env)[0] for _ in range(args.repeat)])
+    results["startup/interpreter"] = summarize([python("-c", "pass")[0] for _ in range(args.repeat)])
+
+    for key, stats in results.items():
+        print(f"{key:<55} {stats['median']:>12.3f} ms", file=sys.stderr)
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump({'meta': {'python': sys.version.split()[0], 'repeat': args.repeat, 'imports': details},
+                   'results': results}, file, indent=2)
+    print(f"Résultats écrits dans {args.output}.", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)['results']
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
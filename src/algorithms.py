@@ -0,0 +1,253 @@
+"""
+Algorithmes de planification : délai avant la prochaine révision d'une carte après une réponse.
+
+Trois algorithmes, choisis par la commande `python -m src schedule --algorithm …`, qui recalcule
+l'échéance de toutes les cartes (choix enregistré avec les paramètres dans scheduling.json, à côté
+du deck) ; une variable d'environnement ne suffirait pas, les cartes garderaient leurs échéances :
+
+- 'leitner' (par défaut) : le délai est fixé par la boîte (REVISION_INTERVALS) ;
+- 'sm2' : SuperMemo 2, un facteur de facilité par carte multiplie le délai à chaque réussite ;
+- 'fsrs' : modèle de mémoire à la FSRS, stabilité et difficulté par carte.
+
+Dans tous les cas, la carte passe à la boîte suivante si la réponse est juste et revient à la
+précédente sinon : les boîtes restent le classement affiché. L'état propre à l'algorithme est
+gardé sur la carte, dans le champ 'schedule' ({'algorithm', 'interval' (s), ...}) ; une carte
+sans ce champ suit les délais des boîtes. next_due_timestamp (scheduler.py) n'a besoin que de
+'interval' : les échéances ne dépendent pas de l'algorithme actif.
+
+Le délai d'une carte est celui au bout duquel elle a 90 % de chances d'être retenue, selon la
+courbe d'oubli partagée `retrievability`. Les règles de chaque algorithme sont écrites une seule
+fois, avec des opérations `ops` : ScalarOps (math) pour une réponse, ou leur équivalent NumPy
+dans optimizer.py pour rejouer tout l'historique et ajuster les paramètres (voir optimizer.fit).
+"""
+import json
+import math
+
+from .scheduler import INTERVAL_SECONDS
+from .storage.writer import atomic_write
+
+DEFAULT_ALGORITHM = "leitner"
+DAY = 86400.0
+INTERVAL_DAYS = [seconds / DAY for seconds in INTERVAL_SECONDS]  # Délais des boîtes, en jours
+
+# Courbe d'oubli (FSRS 4.5) : R(t, S) = (1 + FACTOR * t / S) ** DECAY, soit 90 % au bout de S jours
+DECAY = -0.5
+FACTOR = 19 / 81
+
+
+def retrievability(elapsed, stability):
+    """Probabilité de se souvenir d'une carte `elapsed` jours après sa révision, pour un délai `stability`."""
+    return (1 + FACTOR * elapsed / stability) ** DECAY
+
+
+class ScalarOps:
+    """Opérations sur des nombres, pour appliquer un algorithme à une seule réponse."""
+    exp = staticmethod(math.exp)
+    minimum = staticmethod(min)
+    maximum = staticmethod(max)
+
+    @staticmethod
+    def where(condition, if_true, if_false):
+        return if_true if condition else if_false
+
+    @staticmethod
+    def take(values, index):
+        return values[index]
+
+
+class Algorithm:
+    """
+    Règles communes. Une sous-classe définit ses paramètres (PARAMETERS, DEFAULTS, BOUNDS : bornes
+    de l'ajustement), les noms des champs de son état (STATE) et trois règles, écrites avec `ops` :
+
+    - initial(box, w, ops) : état d'une carte encore jamais révisée avec cet algorithme ;
+    - update(state, correct, elapsed, box, w, ops) : état après une réponse, `elapsed` jours
+      après la révision précédente, la carte étant dans la boîte `box` ;
+    - interval(state, box, w, ops) : délai (jours) avant la révision suivante.
+    """
+
+    name = None
+    PARAMETERS = ()
+    DEFAULTS = ()
+    BOUNDS = ()
+    STATE = ()
+
+    def __init__(self, parameters=None):
+        """`parameters` : dictionnaire {nom: valeur} ou liste dans l'ordre de PARAMETERS ; défauts sinon."""
+        if isinstance(parameters, dict):
+            parameters = [parameters.get(name, default) for name, default in zip(self.PARAMETERS, self.DEFAULTS)]
+        self.parameters = [float(value) for value in (parameters or self.DEFAULTS)]
+
+    def parameters_dict(self):
+        return dict(zip(self.PARAMETERS, self.parameters))
+
+    @property
+    def box_intervals(self):
+        """Vrai si les délais sont ceux des boîtes : rien n'est alors gardé sur les cartes."""
+        return False
+
+    def initial(self, box, w, ops):
+        return ()
+
+    def update(self, state, correct, elapsed, box, w, ops):
+        return state
+
+    def interval(self, state, box, w, ops):
+        raise NotImplementedError
+
+    # --- Une carte ---------------------------------------------------------------
+
+    def state_of(self, card):
+        """État de la carte pour cet algorithme : celui qu'elle porte, ou l'état initial de sa boîte."""
+        schedule = card.get('schedule')
+        if schedule and schedule.get('algorithm') == self.name:
+            return tuple(schedule[name] for name in self.STATE)
+        return self.initial(clamp_box(card.get('box')), self.parameters, ScalarOps)
+
+    def review(self, card, correct, box, now):
+        """
+        Nouveau champ 'schedule' d'une carte après une réponse, la carte passant dans la boîte
+        `box` ; None si la carte suit simplement les délais des boîtes.
+        """
+        if self.box_intervals:
+            return None
+        box_before = clamp_box(card.get('box'))
+        state = self.state_of(card)
+        revised_at = getattr(card, 'revised_at', None)
+        if revised_at is not None:
+            elapsed = max(now - revised_at, 0.0) / DAY
+        else:
+            elapsed = self.interval(state, box_before, self.parameters, ScalarOps)  # Inconnu : révisée à temps
+        state = self.update(state, correct, elapsed, box_before, self.parameters, ScalarOps)
+        return self.schedule(state, self.interval(state, box, self.parameters, ScalarOps))
+
+    def schedule(self, state, interval):
+        """Champ 'schedule' d'une carte : état et délai (jours) ; les valeurs sont arrondies pour le deck."""
+        schedule = {'algorithm': self.name, 'interval': round(float(interval) * DAY, 1)}
+        for name, value in zip(self.STATE, state):
+            value = float(value)
+            schedule[name] = int(value) if value.is_integer() else round(value, 4)
+        return schedule
+
+
+def clamp_box(box):
+    return min(max(int(box or 0), 0), len(INTERVAL_DAYS) - 1)
+
+
+class LeitnerAlgorithm(Algorithm):
+    """Système de Leitner : un délai par boîte (ceux de REVISION_INTERVALS par défaut)."""
+
+    name = "leitner"
+    PARAMETERS = tuple(f"box_{box + 1}" for box in range(len(INTERVAL_DAYS)))
+    DEFAULTS = tuple(INTERVAL_DAYS)
+    BOUNDS = ((1 / 1440, 1000.0),) * len(INTERVAL_DAYS)  # D'une minute à un peu moins de trois ans
+
+    def interval(self, state, box, w, ops):
+        return ops.take(w, box)
+
+    @property
+    def box_intervals(self):
+        return self.parameters == list(self.DEFAULTS)
+
+
+MIN_EASE = 1.3
+
+
+class SM2Algorithm(Algorithm):
+    """
+    SuperMemo 2, réponses justes ou fausses : après une réussite, le délai passe à `first`, puis
+    `second` jours, puis est multiplié par la facilité de la carte ; un échec ramène au premier
+    délai. La facilité commence à `ease`, gagne `ease_bonus` à chaque réussite et perd
+    `ease_penalty` à chaque échec, sans descendre sous 1,3.
+    """
+
+    name = "sm2"
+    PARAMETERS = ('first', 'second', 'ease', 'ease_bonus', 'ease_penalty')
+    DEFAULTS = (1.0, 6.0, 2.5, 0.0, 0.2)
+    BOUNDS = ((1 / 1440, 30.0), (1 / 1440, 100.0), (MIN_EASE, 5.0), (0.0, 1.0), (0.0, 1.0))
+    STATE = ('repetitions', 'ease', 'days')
+
+    def initial(self, box, w, ops):
+        # Une carte venue d'un autre algorithme garde le délai de sa boîte
+        return box, w[2], ops.take(INTERVAL_DAYS, box)
+
+    def update(self, state, correct, elapsed, box, w, ops):
+        repetitions, ease, days = state
+        grown = ops.where(repetitions == 0, w[0], ops.where(repetitions == 1, w[1], days * ease))
+        days = ops.where(correct, grown, w[0])
+        ease = ops.maximum(ops.where(correct, ease + w[3], ease - w[4]), MIN_EASE)
+        repetitions = ops.where(correct, repetitions + 1, 0)
+        return repetitions, ease, days
+
+    def interval(self, state, box, w, ops):
+        return state[2]
+
+
+MIN_STABILITY = 0.005  # Jours (7 minutes)
+MEAN_REVERSION = 0.05  # Part de la difficulté ramenée vers la difficulté initiale à chaque réponse
+
+
+class FSRSAlgorithm(Algorithm):
+    """
+    Modèle de mémoire à la FSRS : chaque carte a une stabilité S (jours pour descendre à 90 % de
+    chances de s'en souvenir) et une difficulté D (1 à 10). Une réussite multiplie S d'autant
+    plus que la carte est facile, que S est petite et que la carte était presque oubliée ; un
+    échec ramène S à une valeur plus faible. Un échec augmente D, qui revient peu à peu vers sa
+    valeur initiale. Le délai est S.
+    """
+
+    name = "fsrs"
+    PARAMETERS = ('lapse_scale', 'lapse_difficulty', 'lapse_stability', 'lapse_retrievability',
+                  'growth', 'growth_saturation', 'growth_retrievability', 'difficulty_step', 'difficulty')
+    DEFAULTS = (2.18, 0.05, 0.34, 1.26, 1.49, 0.14, 0.94, 0.86, 5.0)
+    BOUNDS = ((0.01, 10.0), (0.0, 1.0), (0.01, 1.0), (0.0, 5.0), (-1.0, 4.0), (0.0, 1.0), (0.0, 4.0),
+              (0.0, 3.0), (1.0, 10.0))
+    STATE = ('stability', 'difficulty')
+
+    def initial(self, box, w, ops):
+        return ops.take(INTERVAL_DAYS, box), w[8]
+
+    def update(self, state, correct, elapsed, box, w, ops):
+        stability, difficulty = state
+        recall = retrievability(elapsed, stability)
+        success = stability * (1 + ops.exp(w[4]) * (11 - difficulty) * stability ** -w[5]
+                               * (ops.exp(w[6] * (1 - recall)) - 1))
+        lapse = w[0] * difficulty ** -w[1] * ((stability + 1) ** w[2] - 1) * ops.exp(w[3] * (1 - recall))
+        stability = ops.maximum(ops.where(correct, success, ops.minimum(lapse, stability)), MIN_STABILITY)
+        difficulty = ops.where(correct, difficulty, difficulty + 2 * w[7])
+        difficulty = ops.minimum(ops.maximum(difficulty + MEAN_REVERSION * (w[8] - difficulty), 1.0), 10.0)
+        return stability, difficulty
+
+    def interval(self, state, box, w, ops):
+        return state[0]
+
+
+ALGORITHMS = {algorithm.name: algorithm for algorithm in (LeitnerAlgorithm, SM2Algorithm, FSRSAlgorithm)}
+
+
+def make_algorithm(name=None, parameters=None):
+    """Construit l'algorithme demandé ('leitner', 'sm2' ou 'fsrs'), par défaut DEFAULT_ALGORITHM."""
+    name = name or DEFAULT_ALGORITHM
+    if name not in ALGORITHMS:
+        raise ValueError(f"Algorithme de planification inconnu : {name}")
+    return ALGORITHMS[name](parameters)
+
+
+def load_algorithm(path):
+    """
+    Algorithme enregistré pour le deck (scheduling.json) avec ses paramètres ajustés ; sans
+    fichier, DEFAULT_ALGORITHM avec ses paramètres par défaut.
+    """
+    try:
+        with open(path, encoding="utf-8") as file:
+            data = json.load(file)
+    except FileNotFoundError:
+        return make_algorithm()
+    except (OSError, ValueError):
+        return make_algorithm()  # Fichier illisible : on repart des réglages par défaut
+    return make_algorithm(data.get('algorithm'), data.get('parameters'))
+
+
+def save_algorithm(path, algorithm):
+    atomic_write(path, json.dumps({'algorithm': algorithm.name, 'parameters': algorithm.parameters_dict()},
+                                  ensure_ascii=False, indent=2))
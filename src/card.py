@@ -0,0 +1,207 @@
+import sys
+from datetime import datetime
+
+# Champs stockés dans des attributs dédiés, dans l'ordre d'écriture du deck
+FIELDS = ('id', 'question', 'command', 'box', 'category', 'last_revision', 'version')
+
+
+def to_epoch(value):
+    """Convertit une date de révision (ISO, datetime ou epoch) en epoch ; None si absente."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
+
+
+def to_iso(epoch):
+    """Date de révision au format ISO (format historique du deck), ou None."""
+    return datetime.fromtimestamp(epoch).isoformat() if epoch is not None else None
+
+
+class Card:
+    """
+    Carte en mémoire, compacte : attributs à emplacements fixes (__slots__), catégorie internée
+    (une seule chaîne partagée par toutes les cartes d'une catégorie), boîte entière et date de
+    dernière révision en epoch (float), analysée une seule fois au chargement.
+
+    La carte se manipule aussi comme un dictionnaire (card['question'], card.get('box'),
+    dict(card), ...) : vue de cette façon, 'last_revision' reste une chaîne ISO, comme dans
+    le fichier du deck. Les champs inconnus sont conservés dans `extra`.
+
+    `version` compte les modifications enregistrées de la carte (None : jamais modifiée) ; les
+    moteurs de stockage l'incrémentent et s'en servent pour détecter les modifications concurrentes.
+
+    `answer_key` garde la forme canonique de la commande pour la comparaison des réponses
+    (voir matching.check_answer) ; elle n'est pas enregistrée et s'efface quand card['command'] change.
+    """
+
+    __slots__ = ('id', 'question', 'command', 'box', 'category', 'revised_at', 'extra', 'version', 'answer_key')
+    DATA_SLOTS = __slots__[:-1]  # Tout sauf le cache
+
+    def __init__(self, id=None, question="", command=None, box=None, category=None, revised_at=None, extra=None,
+                 version=None):
+        self.id = id
+        self.question = question
+        self.command = command
+        self.box = int(box) if box is not None else None
+        self.category = sys.intern(category) if category is not None else None
+        self.revised_at = revised_at  # Dernière révision (epoch), ou None
+        self.extra = extra  # Autres champs {nom: valeur}, ou None
+        self.version = int(version) if version is not None else None
+        self.answer_key = None  # (mode, forme canonique de la commande), calculée à la demande
+
+    @classmethod
+    def from_dict(cls, data):
+        """Construit une carte à partir d'un dictionnaire (format du deck) ; une Card est renvoyée telle quelle."""
+        if isinstance(data, cls):
+            return data
+        extra = {key: value for key, value in data.items() if key not in FIELDS} or None
+        get = data.get
+        return cls(get('id'), get('question', ""), get('command'), get('box'), get('category'),
+                   to_epoch(get('last_revision')), extra, get('version'))
+
+    def to_dict(self):
+        """Dictionnaire sérialisable en JSON, au format historique du deck."""
+        data = {}
+        if self.id is not None:
+            data['id'] = self.id
+        data['question'] = self.question
+        for key in ('command', 'box', 'category'):
+            value = getattr(self, key)
+            if value is not None:
+                data[key] = value
+        if self.revised_at is not None:
+            data['last_revision'] = to_iso(self.revised_at)
+        if self.version is not None:
+            data['version'] = self.version
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    # --- Vue dictionnaire --------------------------------------------------
+
+    def __getitem__(self, key):
+        if key == 'last_revision':
+            value = to_iso(self.revised_at)
+        elif key in FIELDS:
+            value = getattr(self, key)
+        elif self.extra is not None and key in self.extra:
+            return self.extra[key]
+        else:
+            raise KeyError(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key == 'last_revision':
+            self.revised_at = to_epoch(value)
+        elif key == 'box':
+            self.box = int(value) if value is not None else None
+        elif key == 'category':
+            self.category = sys.intern(value) if value is not None else None
+        elif key == 'command':
+            self.command = value
+            self.answer_key = None
+        elif key in FIELDS:
+            setattr(self, key, value)
+        elif value is None:
+            if self.extra is not None:  # Comme pour les champs dédiés : None retire le champ
+                self.extra.pop(key, None)
+                if not self.extra:
+                    self.extra = None
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        if key == 'last_revision':
+            self.revised_at = None
+        elif key in FIELDS:
+            setattr(self, key, None)
+            if key == 'command':
+                self.answer_key = None
+        else:
+            del self.extra[key]
+            if not self.extra:
+                self.extra = None
+
+    def __contains__(self, key):
+        if key == 'last_revision':
+            return self.revised_at is not None
+        if key in FIELDS:
+            return getattr(self, key) is not None
+        return self.extra is not None and key in self.extra
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        keys = [key for key in FIELDS if key in self]
+        if self.extra:
+            keys.extend(self.extra)
+        return keys
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def update(self, other=(), **kwargs):
+        if isinstance(other, Card):
+            for name in Card.__slots__:  # Emplacements des données, sans ceux d'une sous-classe
+                setattr(self, name, getattr(other, name))
+            if self.extra is not None:
+                self.extra = dict(self.extra)
+        else:
+            for key, value in (other.items() if hasattr(other, 'items') else other):
+                self[key] = value
+        for key, value in kwargs.items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        if default:
+            return default[0]
+        raise KeyError(key)
+
+    def copy(self):
+        card = Card()
+        card.update(self)
+        return card
+
+    def __eq__(self, other):
+        if isinstance(other, Card):
+            return all(getattr(self, name) == getattr(other, name) for name in self.DATA_SLOTS)
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None  # Mutable, comme un dictionnaire
+
+    def __repr__(self):
+        return f"Card({self.to_dict()!r})"
@@ -0,0 +1,187 @@
+"""
+Registre des catégories : nombre de cartes par catégorie et par boîte, tenu à jour à chaque
+modification du deck (comme les autres index de LeitnerService).
+
+Une catégorie existe tant qu'une carte la porte (compteur de références) ou qu'elle a été créée
+explicitement sans carte (add_category). Les noms et les compteurs sont enregistrés dans
+categories.json, à côté du deck ; les compteurs y sont ceux de la dernière sauvegarde et sont
+recalculés au chargement du deck.
+
+Avec un moteur qui charge le deck par catégorie, les catégories pas encore chargées sont
+comptées d'après les nombres qu'il fournit (manifeste), remplacés par les cartes à leur chargement.
+"""
+import json
+import os
+
+from .scheduler import ALL, REVISION_INTERVALS
+from .storage.writer import atomic_write
+
+NUM_BOXES = len(REVISION_INTERVALS)
+
+
+class CategoryRegistry:
+    """Compteurs par (catégorie, boîte) ; toutes les lectures sont en O(catégories)."""
+
+    def __init__(self, path="categories.json"):
+        self.path = path
+        self._counts = {}  # catégorie -> [cartes par boîte]
+        self._totals = [0] * NUM_BOXES  # Toutes catégories confondues (catégorie 'All')
+        self._positions = {}  # id -> (catégorie, boîte), tuple partagé par les cartes de même position
+        self._shared = {}
+        self._declared = set()  # Catégories créées sans carte
+        self._unloaded = {}  # catégorie -> cartes par boîte, pour les catégories pas encore chargées
+        self.listener = None  # Appelé avec la liste des noms quand une catégorie apparaît ou disparaît
+        self._dirty = False
+
+    # --- Persistance -----------------------------------------------------------
+
+    def load(self):
+        """Lit le registre enregistré ; l'ancien format (liste de noms) est accepté."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return  # Registre illisible : reconstruit à partir du deck
+        if isinstance(data, list):
+            data = {'declared': data}
+        self._declared = {name for name in data.get('declared', []) if name and name != ALL}
+        self._counts = {name: list(counts) for name, counts in data.get('counts', {}).items()}
+        self._totals = [sum(counts[box] for counts in self._counts.values()) for box in range(NUM_BOXES)]
+
+    def save(self):
+        """Écrit le registre s'il a changé depuis la dernière sauvegarde."""
+        if self._dirty:
+            atomic_write(self.path, json.dumps({'declared': sorted(self._declared), 'counts': self._counts},
+                                               ensure_ascii=False))
+            self._dirty = False
+
+    # --- Index du deck -----------------------------------------------------------
+
+    def rebuild(self, cards, unloaded=None):
+        """Recompte les cartes ; `unloaded` donne les cartes par boîte des catégories pas encore chargées."""
+        names = set(self._counts)
+        self._counts = {}
+        self._totals = [0] * NUM_BOXES
+        self._positions.clear()
+        self._shared.clear()
+        for card in cards:
+            self._add(card)
+        self._unloaded = {category: list(counts) for category, counts in (unloaded or {}).items()}
+        for category, counts in self._unloaded.items():
+            self._add_counts(category, counts, 1)
+        self._dirty = True
+        if names != set(self._counts):
+            self._names_changed()
+
+    def on_change(self, event, card):
+        """Répercute une modification du deck (voir LeitnerService.add_listener)."""
+        before = len(self._counts)
+        created = card.category is not None and card.category not in self._counts
+        if event == 'deleted':
+            self._remove(card.id)
+        elif event in ('added', 'updated', 'moved'):
+            if self._positions.get(card.id) == self._position(card):
+                return
+            self._remove(card.id)
+            self._add(card)
+        else:
+            return
+        self._dirty = True
+        if created or len(self._counts) != before:
+            self._names_changed()
+
+    def _position(self, card):
+        key = (card.category, min(max(int(card.box or 0), 0), NUM_BOXES - 1))
+        return self._shared.setdefault(key, key)
+
+    def _add(self, card):
+        self._positions[card.id] = position = self._position(card)
+        category, box = position
+        if category is not None:
+            counts = self._counts.get(category)
+            if counts is None:
+                counts = self._counts[category] = [0] * NUM_BOXES
+                self._declared.discard(category)  # Désormais référencée par une carte
+            counts[box] += 1
+        self._totals[box] += 1
+
+    def _remove(self, card_id):
+        position = self._positions.pop(card_id, None)
+        if position is None:
+            return
+        category, box = position
+        self._totals[box] -= 1
+        if category is not None:
+            counts = self._counts[category]
+            counts[box] -= 1
+            if not any(counts):
+                del self._counts[category]  # Plus aucune carte : la catégorie disparaît
+
+    def _add_counts(self, category, counts, sign):
+        for box, count in enumerate(counts[:NUM_BOXES]):
+            self._totals[box] += sign * count
+        if category is not None:
+            current = self._counts.setdefault(category, [0] * NUM_BOXES)
+            for box, count in enumerate(counts[:NUM_BOXES]):
+                current[box] += sign * count
+            if not any(current):
+                del self._counts[category]
+
+    def loaded(self, category):
+        """Les cartes d'une catégorie chargée après coup ont été ajoutées : ses nombres fournis sont retirés."""
+        counts = self._unloaded.pop(category, None)
+        if counts is None:
+            return
+        before = set(self._counts)
+        self._add_counts(category, counts, -1)
+        self._dirty = True
+        if set(self._counts) != before:
+            self._names_changed()
+
+    def _names_changed(self):
+        if self.listener is not None:
+            self.listener(self.names())
+
+    # --- Lecture -----------------------------------------------------------------
+
+    def names(self):
+        """Catégories existantes (référencées ou créées), par ordre alphabétique."""
+        return sorted((self._counts.keys() | self._declared) - {ALL}, key=str.lower)
+
+    def __contains__(self, category):
+        return category in self._counts or category in self._declared
+
+    def count(self, category, box):
+        """Nombre de cartes d'une boîte pour une catégorie (ou 'All')."""
+        if category == ALL:
+            return self._totals[box]
+        counts = self._counts.get(category)
+        return counts[box] if counts is not None else 0
+
+    def counts(self, category):
+        """Cartes par boîte d'une catégorie (ou 'All')."""
+        if category == ALL:
+            return list(self._totals)
+        return list(self._counts.get(category, [0] * NUM_BOXES))
+
+    def references(self, category):
+        """Nombre de cartes portant la catégorie."""
+        return sum(self._counts.get(category, ()))
+
+    # --- Modifications ---------------------------------------------------------
+
+    def declare(self, category):
+        """Crée une catégorie sans carte ; sans effet si elle existe déjà."""
+        if category and category != ALL and category not in self:
+            self._declared.add(category)
+            self._dirty = True
+            self._names_changed()
+
+    def forget(self, category):
+        """Retire une catégorie créée sans carte (après un renommage, par exemple)."""
+        if category in self._declared:
+            self._declared.discard(category)
+            self._dirty = True
+            self._names_changed()
@@ -0,0 +1,319 @@
+"""
+Interface en ligne de commande, sans Qt : consulter et réviser le deck depuis un terminal,
+un script ou un serveur sans affichage. Ce module n'importe jamais PySide6.
+
+    python -m src due [--box 1] [--category git] [--limit 20] [--json]
+    python -m src stats [--json]
+    python -m src review [--box 1] [--category git] [--limit 20]
+    python -m src history [--since 2024-05-01] [--until 2024-06-01] [--json]
+    python -m src schedule [--algorithm fsrs] [--fit] [--json]
+    python -m src duplicates [--threshold 0.8] [--limit 20] [--merge] [--json]
+
+Les boîtes sont numérotées de 1 à 5, comme dans l'application.
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+
+from .algorithms import ALGORITHMS, make_algorithm
+from .duplicates import THRESHOLD
+from .matching import TokenMatcher, same_segments
+from .model import LeitnerService
+from .scheduler import ALL, REVISION_INTERVALS, next_due_timestamp
+from .storage import DeckInUseError
+
+NUM_BOXES = len(REVISION_INTERVALS)
+QUIT = ":q"  # Réponse qui termine la révision
+HISTORY_DAYS = 14  # Jours affichés par la commande history
+
+
+def format_duration(seconds):
+    """Durée lisible (« 2j 3h 10m », « 45m »), comme dans la fenêtre de révision."""
+    minutes, _ = divmod(int(abs(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    if days:
+        return f"{days}j {hours}h {minutes}m"
+    if hours:
+        return f"{hours}h {minutes}m"
+    return f"{minutes}m"
+
+
+def boxes(args):
+    """Index des boîtes demandées (toutes par défaut)."""
+    return [args.box - 1] if args.box is not None else list(range(NUM_BOXES))
+
+
+def due_cards(service, args):
+    """Cartes dues, boîte par boîte, dans la limite demandée."""
+    cards = []
+    for box in boxes(args):
+        limit = args.limit - len(cards) if args.limit is not None else None
+        if limit is not None and limit <= 0:
+            break
+        cards.extend(service.get_due_cards(box, args.category, limit=limit))
+    return cards
+
+
+def command_due(service, args):
+    now = time.time()
+    cards = due_cards(service, args)
+    if args.json:
+        json.dump([dict(card, due_at=next_due_timestamp(card)) for card in cards], sys.stdout,
+                  ensure_ascii=False, indent=2)
+        print()
+        return 0
+    for card in cards:
+        late = format_duration(now - next_due_timestamp(card))
+        print(f"[Boîte {card['box'] + 1}] ({card.get('category') or '-'}) {card['question']}  - en retard de {late}")
+    print(f"{len(cards)} carte(s) à réviser.", file=sys.stderr)
+    return 0
+
+
+def command_stats(service, args):
+    now = time.time()
+    categories = service.get_all_categories()
+    stats = {'boxes': [], 'categories': {}}
+    for box in range(NUM_BOXES):
+        next_due = service.scheduler.next_due(args.category, box)
+        stats['boxes'].append({
+            'box': box + 1,
+            'cards': service.count_cards(box, args.category),
+            'due': len(service.scheduler.due_cards(args.category, box, now)),
+            'next_due': next_due,
+        })
+    for category in categories:
+        stats['categories'][category] = sum(service.count_cards(box, category) for box in range(NUM_BOXES))
+    stats['total'] = sum(box['cards'] for box in stats['boxes'])
+
+    if args.json:
+        json.dump(stats, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return 0
+    print(f"{stats['total']} carte(s)" + (f" dans la catégorie {args.category}" if args.category != ALL else ""))
+    for box in stats['boxes']:
+        if box['next_due'] is None:
+            status = "vide"
+        elif box['due']:
+            status = f"{box['due']} à réviser"
+        else:
+            status = f"prochaine révision dans {format_duration(box['next_due'] - now)}"
+        print(f"  Boîte {box['box']} : {box['cards']:>7} carte(s) - {status}")
+    if args.category == ALL and categories:
+        print("Catégories :")
+        for category, count in sorted(stats['categories'].items(), key=lambda item: -item[1]):
+            print(f"  {category:<20} {count:>7}")
+    return 0
+
+
+def report_conflicts(conflicts):
+    for conflict in conflicts:
+        print(f"Carte {conflict.card_id} modifiée ailleurs entre-temps : "
+              f"{'réponse non enregistrée' if conflict.remote is not None else 'carte supprimée'}.")
+
+
+def command_review(service, args):
+    cards = due_cards(service, args)
+    if not cards:
+        print("Il n'y a plus de fiches à réviser.")
+        return 0
+    service.prepare_answers()  # Mode 'execute' : processus d'exécution prêts avant la première réponse
+    print(f"{len(cards)} carte(s) à réviser ; « {QUIT} » ou Ctrl+D pour arrêter.\n")
+    results = []
+    for number, card in enumerate(cards, 1):
+        # Le deck a pu être modifié par l'application ou une autre révision pendant la session
+        report_conflicts(service.sync())
+        if service.get_card(card['id']) is not card:
+            continue  # Supprimée ailleurs
+        print(f"[{number}/{len(cards)}] [Boîte {card['box'] + 1}] {card['question']}")
+        shown_at = time.monotonic()
+        try:
+            answer = input("> ")
+        except EOFError:
+            print()
+            break
+        if answer.strip() == QUIT:
+            break
+        correct_answer = card['command'].strip()
+        correct = service.submit_answer(card, answer).result()
+        service.review_card(card, correct, time.monotonic() - shown_at)
+        results.append(correct)
+        print("✔ Correct!\n" if correct else f"✘ Incorrect! La bonne réponse est : {correct_answer}\n")
+    service.flush()
+    report_conflicts(service.sync())
+    if results:
+        print(f"{sum(results)}/{len(results)} bonne(s) réponse(s).")
+    return 0
+
+
+def command_history(service, args):
+    history = service.history
+    stats = history.stats
+    start = args.since.timestamp() if args.since else None
+    end = args.until.timestamp() if args.until else None
+    events = list(history.events(start, end))  # Seule la période demandée est lue
+    if args.json:
+        json.dump({'stats': stats.to_dict(), 'events': [event._asdict() for event in events]},
+                  sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return 0
+    for event in events:
+        when = datetime.fromtimestamp(event.timestamp).strftime("%Y-%m-%d %H:%M")
+        print(f"{when}  {event.card}  boîte {event.box_before + 1} → {event.box_after + 1}  "
+              f"{'✔' if event.correct else '✘'}  {event.latency:5.1f} s  {event.category or '-'}")
+    print(f"{len(events)} révision(s) sur la période, {stats.events} au total.")
+    if stats.events:
+        print(f"Temps de réponse moyen : {stats.latency / stats.events:.1f} s")
+        print("Réussite par boîte :")
+        for box in range(NUM_BOXES):
+            rate = stats.success_rate(stats.boxes, box)
+            if rate is not None:
+                print(f"  Boîte {box + 1} : {rate:6.1%} ({stats.boxes[str(box)][0]} révision(s))")
+        print("Réussite par catégorie :")
+        for category, (reviews, _) in sorted(stats.categories.items(), key=lambda item: -item[1][0]):
+            print(f"  {category or '-':<20} {stats.success_rate(stats.categories, category):6.1%} ({reviews} révision(s))")
+        print("Révisions par jour :")
+        for day, count in sorted(stats.days.items())[-HISTORY_DAYS:]:
+            print(f"  {day}  {count:>5}")
+    return 0
+
+
+def command_schedule(service, args):
+    algorithm = service.algorithm
+    if args.algorithm and args.algorithm != algorithm.name:
+        algorithm = make_algorithm(args.algorithm)
+    result = None
+    if args.fit:
+        result = service.fit_algorithm(algorithm)  # Ajusté à l'historique, puis appliqué au deck
+    elif algorithm is not service.algorithm:
+        service.set_algorithm(algorithm)  # Échéances de toutes les cartes recalculées
+    algorithm = service.algorithm
+    if args.json:
+        data = {'algorithm': algorithm.name, 'parameters': algorithm.parameters_dict()}
+        if result is not None:
+            data['fit'] = {'reviews': result.reviews, 'loss_before': result.loss_before, 'loss': result.loss,
+                           'iterations': result.iterations, 'seconds': result.seconds}
+        json.dump(data, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return 0
+    if result is not None:
+        if result.loss is None:
+            print("Pas assez de révisions dans l'historique : paramètres inchangés.")
+        else:
+            print(f"Ajusté sur {result.reviews} révision(s) en {result.seconds:.1f} s ({result.iterations} itération(s)) : "
+                  f"perte {result.loss_before:.4f} → {result.loss:.4f}")
+    print(f"Algorithme : {algorithm.name}")
+    for name, value in algorithm.parameters_dict().items():
+        print(f"  {name:<24} {value:.4g}")
+    return 0
+
+
+def command_duplicates(service, args):
+    started = time.perf_counter()
+    groups = service.find_duplicates(args.threshold)
+    seconds = time.perf_counter() - started
+    merged = 0
+    if args.merge:
+        with service.batch():  # Une seule écriture pour toutes les fusions
+            for group in groups:
+                for same in same_commands(group):
+                    # La carte la plus avancée (boîte, puis révision la plus récente) est gardée
+                    kept = max(same, key=lambda card: (card.get('box', 0), card.revised_at or 0.0))
+                    service.merge_cards(kept['id'], [card['id'] for card in same])
+                    merged += len(same) - 1
+    if args.json:
+        json.dump([[dict(card) for card in group] for group in groups[:args.limit]], sys.stdout,
+                  ensure_ascii=False, indent=2)
+        print()
+        return 0
+    for group in groups[:args.limit]:
+        print(f"{len(group)} carte(s) :")
+        for card in group:
+            print(f"  [Boîte {card.get('box', 0) + 1}] ({card.get('category') or '-'}) {card['question']}  "
+                  f"→ {card.get('command', '')}")
+    if len(groups) > args.limit:
+        print(f"... et {len(groups) - args.limit} autre(s) groupe(s)")
+    duplicates = sum(len(group) - 1 for group in groups)
+    print(f"{len(groups)} groupe(s) de doublons, {duplicates} carte(s) en trop, trouvés en {seconds:.1f} s"
+          + (f" ; {merged} carte(s) de même commande supprimée(s)." if args.merge else "."), file=sys.stderr)
+    return 0
+
+
+def same_commands(group):
+    """
+    Cartes d'un groupe de doublons qui ont la même commande, au sens du mode 'tokens' (espaces,
+    guillemets, ordre des options) : seules celles-ci sont fusionnées. Des questions presque
+    identiques peuvent attendre des commandes différentes (`-n prod` et `-n dev`).
+    """
+    by_command = []  # (forme canonique de la première carte, cartes de même commande)
+    for card in group:
+        segments = TokenMatcher.canonical(card.get('command') or "", {})
+        for canonical, cards in by_command:
+            if same_segments(canonical, segments):
+                cards.append(card)
+                break
+        else:
+            by_command.append((segments, [card]))
+    return [cards for _, cards in by_command if len(cards) > 1]
+
+
+COMMANDS = {
+    'due': command_due,
+    'stats': command_stats,
+    'review': command_review,
+    'history': command_history,
+    'schedule': command_schedule,
+    'duplicates': command_duplicates,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src", description="Deck Leitner en ligne de commande (sans interface graphique).")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_filters(subparser, limit=True):
+        subparser.add_argument("--category", default=ALL, help="catégorie (par défaut : toutes)")
+        if limit:
+            subparser.add_argument("--box", type=int, choices=range(1, NUM_BOXES + 1), help="boîte (par défaut : toutes)")
+            subparser.add_argument("--limit", type=int, help="nombre maximal de cartes")
+
+    due = subparsers.add_parser("due", help="liste les cartes à réviser")
+    add_filters(due)
+    due.add_argument("--json", action="store_true", help="sortie JSON")
+    stats = subparsers.add_parser("stats", help="cartes par boîte et par catégorie")
+    add_filters(stats, limit=False)
+    stats.add_argument("--json", action="store_true", help="sortie JSON")
+    review = subparsers.add_parser("review", help="révise les cartes dues dans le terminal")
+    add_filters(review)
+    history = subparsers.add_parser("history", help="révisions passées et taux de réussite")
+    history.add_argument("--since", type=datetime.fromisoformat, help="date de début (AAAA-MM-JJ)")
+    history.add_argument("--until", type=datetime.fromisoformat, help="date de fin, exclue (AAAA-MM-JJ)")
+    history.add_argument("--json", action="store_true", help="sortie JSON")
+    schedule = subparsers.add_parser("schedule", help="algorithme de planification et ajustement à l'historique")
+    schedule.add_argument("--algorithm", choices=sorted(ALGORITHMS), help="change d'algorithme (échéances recalculées)")
+    schedule.add_argument("--fit", action="store_true", help="ajuste les paramètres à l'historique des révisions")
+    schedule.add_argument("--json", action="store_true", help="sortie JSON")
+    duplicates = subparsers.add_parser("duplicates", help="cartes en double ou presque")
+    duplicates.add_argument("--threshold", type=float, default=THRESHOLD,
+                            help=f"similarité minimale, de 0 à 1 (par défaut : {THRESHOLD})")
+    duplicates.add_argument("--limit", type=int, default=20, help="nombre maximal de groupes affichés")
+    duplicates.add_argument("--merge", action="store_true",
+                            help="supprime les doublons de même commande, en gardant la carte la plus avancée")
+    duplicates.add_argument("--json", action="store_true", help="sortie JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        service = LeitnerService()
+    except DeckInUseError as error:  # Deck binaire ouvert par l'application
+        print(error, file=sys.stderr)
+        return 1
+    try:
+        return COMMANDS[args.command](service, args)
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
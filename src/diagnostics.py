@@ -0,0 +1,198 @@
+"""
+Instrumentation optionnelle : nombre d'appels et histogrammes de durée des méthodes de
+LeitnerService et des rafraîchissements des vues, octets écrits à chaque sauvegarde, taille du deck.
+
+Activée par la variable d'environnement LEITNER_DIAGNOSTICS=1. Les mesures sont alors affichées
+dans la fenêtre « Diagnostics » et écrites à la sortie du programme dans
+LEITNER_DIAGNOSTICS_OUTPUT.json et .prom (format texte Prometheus ; par défaut leitner_diagnostics).
+
+Désactivée, elle ne coûte rien : les décorateurs renvoient la fonction d'origine, sans enveloppe.
+"""
+import atexit
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+ENABLED = os.environ.get("LEITNER_DIAGNOSTICS", "") not in ("", "0")
+OUTPUT = os.environ.get("LEITNER_DIAGNOSTICS_OUTPUT", "leitner_diagnostics")
+
+# Bornes supérieures des classes des histogrammes (convention Prometheus : secondes, octets)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = tuple(1 << shift for shift in range(8, 31, 2))  # 256 o à 1 Gio
+
+PREFIX = "leitner"
+# Familles de mesures : nom Prometheus -> (étiquette, bornes, description)
+FAMILIES = {
+    'call_duration_seconds': ('name', LATENCY_BUCKETS, "Durée des appels instrumentés"),
+    'write_bytes': ('file', SIZE_BUCKETS, "Octets écrits par sauvegarde"),
+}
+
+
+class Histogram:
+    """Histogramme cumulable : effectifs par classe, somme, nombre et maximum des valeurs."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Dernière classe : au-delà de la dernière borne
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Quantile approché : borne supérieure de la classe qui le contient (max au-delà)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'max': self.max,
+            'buckets': dict(zip([str(bound) for bound in self.buckets] + ["+Inf"], self.counts)),
+        }
+
+
+class Registry:
+    """Mesures collectées ; observe() peut être appelé depuis n'importe quel thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}  # (famille, étiquette) -> Histogram
+        self._gauges = {}  # nom -> fonction sans argument renvoyant la valeur courante
+        self.started_at = time.time()
+
+    def observe(self, family, label, value):
+        with self._lock:
+            histogram = self._histograms.get((family, label))
+            if histogram is None:
+                histogram = self._histograms[(family, label)] = Histogram(FAMILIES[family][1])
+            histogram.observe(value)
+
+    def gauge(self, name, read):
+        """Déclare une jauge, lue au moment de l'affichage ou de l'export."""
+        self._gauges[name] = read
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self.started_at = time.time()
+
+    def histograms(self, family):
+        """{étiquette: Histogram} d'une famille, triés par étiquette."""
+        with self._lock:
+            return {label: histogram for (name, label), histogram in sorted(self._histograms.items())
+                    if name == family}
+
+    def gauges(self):
+        values = {}
+        for name, read in self._gauges.items():
+            try:
+                values[name] = read()
+            except Exception:
+                values[name] = None  # Stockage fermé, par exemple
+        return values
+
+    def to_dict(self):
+        return {
+            'started_at': self.started_at,
+            'uptime_seconds': time.time() - self.started_at,
+            'gauges': self.gauges(),
+            **{family: {label: histogram.to_dict() for label, histogram in self.histograms(family).items()}
+               for family in FAMILIES},
+        }
+
+    def to_prometheus(self):
+        """Mesures au format texte d'exposition de Prometheus."""
+        lines = []
+        for name, value in self.gauges().items():
+            if value is not None:
+                lines += [f"# TYPE {PREFIX}_{name} gauge", f"{PREFIX}_{name} {value}"]
+        for family, (label_name, _, help) in FAMILIES.items():
+            histograms = self.histograms(family)
+            if not histograms:
+                continue
+            metric = f"{PREFIX}_{family}"
+            lines += [f"# HELP {metric} {help}", f"# TYPE {metric} histogram"]
+            for label, histogram in histograms.items():
+                cumulative = 0
+                for bound, count in zip([repr(float(bound)) for bound in histogram.buckets] + ["+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{{label_name}="{label}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{{label_name}="{label}"}} {histogram.sum!r}')
+                lines.append(f'{metric}_count{{{label_name}="{label}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, output=OUTPUT):
+        """Écrit les mesures dans output.json et output.prom."""
+        with open(output + ".json", "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, indent=2)
+        with open(output + ".prom", "w", encoding="utf-8") as file:
+            file.write(self.to_prometheus())
+
+
+registry = Registry()
+
+
+def timed(name):
+    """Décorateur : durée de chaque appel enregistrée sous `name` (fonction inchangée si désactivé)."""
+    def decorate(func):
+        if not ENABLED:
+            return func
+        # Branchée sur un signal, l'enveloppe (*args) recevrait tous ses arguments (index, checked...) :
+        # comme Qt pour une méthode ordinaire, on ne transmet que ceux que la fonction accepte.
+        code = func.__code__
+        max_args = None if code.co_flags & inspect.CO_VARARGS else code.co_argcount
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args[:max_args], **kwargs)
+            finally:
+                registry.observe('call_duration_seconds', name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def instrument(prefix):
+    """Décorateur de classe : chronomètre toutes ses méthodes publiques, sous « prefix.méthode »."""
+    def decorate(cls):
+        if not ENABLED:
+            return cls
+        for name, attribute in list(vars(cls).items()):
+            if not name.startswith("_") and inspect.isfunction(attribute):
+                setattr(cls, name, timed(f"{prefix}.{name}")(attribute))
+        return cls
+    return decorate
+
+
+def record_write(file, size):
+    """Octets écrits dans un fichier du deck lors d'une sauvegarde ('snapshot', 'journal', ...)."""
+    if ENABLED:
+        registry.observe('write_bytes', file, size)
+
+
+if ENABLED:
+    atexit.register(registry.dump)
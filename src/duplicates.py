@@ -0,0 +1,337 @@
+"""
+Détection des cartes en double ou presque : MinHash et LSH sur la question et la commande.
+
+Une carte est décrite par l'ensemble de ses traits : trigrammes de chaque mot de la question
+(l'ordre des mots ne compte pas, une faute de frappe ne change que quelques trigrammes) et mots
+de la commande. La similarité de deux cartes est l'indice de Jaccard de ces ensembles, estimé
+par leurs signatures MinHash (SIGNATURE_SIZE minimums de hachages) : la part des minimums égaux.
+Les signatures sont découpées en BANDS bandes de ROWS valeurs ; deux cartes qui ont une bande
+identique sont candidates (hachage sensible à la localité) : une paire de similarité J l'est
+avec une probabilité 1 - (1 - J ** ROWS) ** BANDS (97 % à 0,6, plus de 99,9 % à 0,8), sans
+comparer chaque carte à tout le deck.
+
+Les clés des bandes sont rangées dans des tableaux NumPy triés, une recherche se fait par
+dichotomie ; les cartes ajoutées depuis le dernier tri sont parcourues à part, et les tableaux
+retriés quand elles deviennent trop nombreuses. L'index est tenu à jour au fil des modifications
+(LeitnerService.indexes) et construit par tranches à la demande, comme l'index de recherche.
+NumPy n'est importé qu'à la construction.
+"""
+import re
+from itertools import chain, islice
+from zlib import crc32
+
+SIGNATURE_SIZE = 64
+BANDS = 16
+ROWS = SIGNATURE_SIZE // BANDS
+THRESHOLD = 0.7  # Similarité à partir de laquelle deux cartes sont signalées comme doublons
+SEED = 20240501  # Graine des fonctions de hachage de MinHash
+MIX = 0x9E3779B97F4A7C15  # Multiplicateur (impair) qui combine les valeurs d'une bande en une clé
+WORD = re.compile(r"\w+")
+COMMAND = 1  # Valeur initiale du CRC des mots de la commande : distincts des trigrammes de la question
+WORD_CACHE_SIZE = 100_000  # Mots dont les trigrammes hachés sont gardés
+
+_WORD_GRAMS = {}  # Mot -> hachages de ses trigrammes
+
+np = None  # NumPy, importé à la première construction
+
+
+def features(question, command):
+    """
+    Traits d'une carte, hachés par CRC-32 (stable d'une exécution à l'autre) : trigrammes des
+    mots de la question, bordés d'espaces, et mots de la commande. Les trigrammes d'un mot sont
+    gardés : le vocabulaire d'un deck se répète d'une carte à l'autre.
+    """
+    cache = _WORD_GRAMS
+    hashes = []
+    for word in WORD.findall(question.lower()):
+        grams = cache.get(word)
+        if grams is None:
+            if len(cache) >= WORD_CACHE_SIZE:
+                cache.clear()
+            padded = f" {word} "
+            grams = cache[word] = tuple({crc32(padded[i:i + 3].encode()) for i in range(len(word))})
+        hashes.extend(grams)
+    if command:
+        hashes.extend([crc32(word.encode(), COMMAND) for word in command.split()])
+    return list(set(hashes)) or [0]
+
+
+class DuplicateIndex:
+    """
+    Signatures MinHash des cartes et clés de leurs bandes. Une ligne par version indexée d'une
+    carte ; une carte modifiée (question ou commande) ou supprimée laisse une ligne périmée,
+    écartée des résultats puis retirée au tri suivant.
+    """
+
+    BUILD_BATCH = 2000  # Cartes indexées par appel à build_step
+    RECENT_MIN = 1000  # Lignes non triées tolérées (et au moins un huitième du deck)
+
+    def __init__(self, load_cards):
+        self._load_cards = load_cards  # Fonction renvoyant toutes les cartes, appelée à la construction
+        self.reset()
+
+    def reset(self):
+        """Vide l'index ; il devra être reconstruit."""
+        self._built = False
+        self._pending = None  # Itérateur des cartes restant à indexer
+        self._removed = set()  # Cartes supprimées pendant la construction
+        self._ids = []  # Ligne -> identifiant de la carte, None si la ligne est périmée
+        self._fingerprints = []  # Ligne -> empreinte (question, commande), pour repérer un texte modifié
+        self._rows = {}  # Identifiant -> ligne à jour
+        self._signatures = None  # (capacité, SIGNATURE_SIZE) uint32
+        self._keys = None  # (capacité, BANDS) uint64 : clé de chaque bande
+        self._count = 0  # Lignes occupées
+        self._stale = 0  # Lignes périmées
+        self._sorted_count = 0  # Lignes couvertes par les tableaux triés
+        self._order = None  # (BANDS, lignes triées) : lignes, par clé croissante dans chaque bande
+        self._sorted_keys = None  # (BANDS, lignes triées) : clés correspondantes
+
+    @property
+    def built(self):
+        return self._built
+
+    def build_step(self, limit=BUILD_BATCH):
+        """Indexe au plus `limit` cartes ; renvoie True lorsque l'index est complet."""
+        if self._built:
+            return True
+        if self._pending is None:
+            _import_numpy()
+            self._pending = iter(list(self._load_cards()))
+        batch = list(islice(self._pending, limit))
+        # Une carte déjà indexée ou supprimée entre-temps a été traitée par on_change
+        self._append([card for card in batch if card['id'] not in self._rows and card['id'] not in self._removed])
+        if len(batch) < limit:
+            self._built = True
+            self._pending = None
+            self._removed.clear()
+            self._sort()
+        return self._built
+
+    def ensure_built(self):
+        """Termine la construction de l'index d'un seul coup."""
+        while not self.build_step():
+            pass
+
+    def on_change(self, event, card):
+        """Répercute une modification du deck (voir LeitnerService.add_listener)."""
+        if not self._built and self._pending is None:
+            return  # Construction pas encore commencée : rien à tenir à jour
+        card_id = card['id']
+        if event == 'deleted':
+            self._discard(card_id)
+            if not self._built:
+                self._removed.add(card_id)
+            return
+        row = self._rows.get(card_id)
+        if row is None or self._fingerprints[row] != fingerprint(card):
+            self._discard(card_id)
+            self._append([card])
+
+    # --- Requêtes ---------------------------------------------------------------
+
+    def query(self, card, threshold=THRESHOLD):
+        """
+        Cartes de l'index semblables à `card` (dictionnaire ou Card, indexée ou non), hors
+        elle-même : liste de (identifiant, similarité), de la plus proche à la moins proche.
+        """
+        return self.query_many([card], threshold)[0][0]
+
+    def query_many(self, cards, threshold=THRESHOLD):
+        """
+        Recherche groupée (import) : pour chaque carte, (doublons dans l'index, doublons plus haut
+        dans `cards`), sous forme de listes de (identifiant ou position, similarité).
+        """
+        self.ensure_built()
+        if not cards:
+            return []
+        if self._count - self._sorted_count > max(self.RECENT_MIN, self._sorted_count // 8) or \
+                self._stale > self._count // 4:
+            self._sort()
+        signatures = _signatures([features(card['question'], card.get('command')) for card in cards])
+        keys = _band_keys(signatures)
+        # Recherche par dichotomie dans les lignes triées, pour toutes les cartes d'un coup
+        low = np.empty((BANDS, len(cards)), dtype=np.int64)
+        high = np.empty_like(low)
+        for band in range(BANDS):
+            low[band] = np.searchsorted(self._sorted_keys[band], keys[:, band], 'left')
+            high[band] = np.searchsorted(self._sorted_keys[band], keys[:, band], 'right')
+        recent = self._keys[self._sorted_count:self._count]
+        buckets = [{} for _ in range(BANDS)]  # Clé de bande -> positions des cartes précédentes de `cards`
+        results = []
+        for position, card in enumerate(cards):
+            rows = [self._order[band, low[band, position]:high[band, position]]
+                    for band in np.flatnonzero(high[:, position] > low[:, position])]
+            if len(recent):
+                rows.append(self._sorted_count + np.flatnonzero((recent == keys[position]).any(axis=1)))
+            results.append((self._matches(card.get('id'), signatures[position], rows, threshold),
+                            self._batch_matches(position, signatures, keys, buckets, threshold)))
+        return results
+
+    def groups(self, threshold=THRESHOLD):
+        """
+        Groupes de cartes en double ou presque (listes d'identifiants, les plus grands d'abord) :
+        chaque carte d'un groupe ressemble à la première, la plus ancienne dans l'index. Dans
+        chaque paquet de lignes de même clé de bande, chaque ligne n'est comparée qu'à la première
+        du paquet et à sa voisine, sans comparer toutes les paires d'un paquet.
+        """
+        self.ensure_built()
+        self._sort()
+        count = self._count
+        firsts, seconds = [], []
+        for band in range(BANDS):
+            order, keys = self._order[band], self._sorted_keys[band]
+            same = np.flatnonzero(keys[1:] == keys[:-1]) + 1  # Ligne triée de même clé que la précédente
+            if not len(same):
+                continue
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])  # Début de chaque paquet
+            leaders = starts[np.searchsorted(starts, same, 'right') - 1]
+            firsts.append(order[np.r_[same - 1, leaders]])
+            seconds.append(order[np.r_[same, same]])
+        if not firsts:
+            return []
+        first, second = np.concatenate(firsts), np.concatenate(seconds)
+        similar = (first != second) & (self._similarity_pairs(first, second) >= threshold)
+        first, second = first[similar], second[similar]
+        older, newer = np.minimum(first, second), np.maximum(first, second)
+        order = np.lexsort((newer, older))
+        # Groupes en étoile, dans l'ordre des lignes : une carte rejoint la première carte plus
+        # ancienne qui lui ressemble, si celle-ci n'a pas elle-même rejoint un groupe
+        centers = [-1] * count
+        for row, other in zip(older[order].tolist(), newer[order].tolist()):
+            if centers[other] == -1 and centers[row] in (-1, row):
+                centers[row] = centers[other] = row
+        groups = {}
+        for row, center in enumerate(centers):
+            if center != -1:
+                groups.setdefault(center, []).append(self._ids[row])
+        return sorted(groups.values(), key=len, reverse=True)
+
+    # --- Interne ----------------------------------------------------------------
+
+    def _matches(self, card_id, signature, rows, threshold):
+        if not rows:
+            return []
+        rows = np.unique(np.concatenate(rows))
+        similarity = (self._signatures[rows] == signature).mean(axis=1)
+        matches = []
+        for row, value in zip(rows[similarity >= threshold].tolist(), similarity[similarity >= threshold].tolist()):
+            other = self._ids[row]
+            if other is not None and other != card_id:
+                matches.append((other, value))
+        matches.sort(key=lambda match: -match[1])
+        return matches
+
+    @staticmethod
+    def _batch_matches(position, signatures, keys, buckets, threshold):
+        """Cartes précédentes du même lot ayant une bande commune et assez semblables."""
+        candidates = set()
+        for band in range(BANDS):
+            key = int(keys[position, band])
+            candidates.update(buckets[band].get(key, ()))
+            buckets[band].setdefault(key, []).append(position)
+        if not candidates:
+            return []
+        candidates = sorted(candidates)
+        similarity = (signatures[candidates] == signatures[position]).mean(axis=1).tolist()
+        return [(other, value) for other, value in zip(candidates, similarity) if value >= threshold]
+
+    def _similarity_pairs(self, first, second, chunk=1 << 18):
+        result = np.empty(len(first))
+        for start in range(0, len(first), chunk):
+            end = start + chunk
+            result[start:end] = (self._signatures[first[start:end]] == self._signatures[second[start:end]]).mean(axis=1)
+        return result
+
+    def _append(self, cards):
+        if not cards:
+            return
+        texts = [(card['question'], card.get('command')) for card in cards]
+        signatures = _signatures([features(question, command) for question, command in texts])
+        start, end = self._count, self._count + len(cards)
+        if self._signatures is None or end > len(self._signatures):
+            capacity = max(end, 2 * (len(self._signatures) if self._signatures is not None else 0), 1024)
+            self._signatures = _grow(self._signatures, capacity, SIGNATURE_SIZE, np.uint32)
+            self._keys = _grow(self._keys, capacity, BANDS, np.uint64)
+        self._signatures[start:end] = signatures
+        self._keys[start:end] = _band_keys(signatures)
+        for row, card, text in zip(range(start, end), cards, texts):
+            self._rows[card['id']] = row
+            self._ids.append(card['id'])
+            self._fingerprints.append(hash(text))
+        self._count = end
+
+    def _discard(self, card_id):
+        row = self._rows.pop(card_id, None)
+        if row is not None:
+            self._ids[row] = None
+            self._stale += 1
+
+    def _sort(self):
+        """Retire les lignes périmées et retrie les clés de toutes les lignes."""
+        if self._stale:
+            live = np.array([row for row, card_id in enumerate(self._ids) if card_id is not None], dtype=np.int64)
+            self._signatures = self._signatures[live]
+            self._keys = self._keys[live]
+            self._ids = [self._ids[row] for row in live.tolist()]
+            self._fingerprints = [self._fingerprints[row] for row in live.tolist()]
+            self._rows = {card_id: row for row, card_id in enumerate(self._ids)}
+            self._count = len(self._ids)
+            self._stale = 0
+        if self._keys is None:
+            self._signatures = _grow(None, 0, SIGNATURE_SIZE, np.uint32)
+            self._keys = _grow(None, 0, BANDS, np.uint64)
+        keys = self._keys[:self._count]
+        self._order = np.argsort(keys, axis=0, kind='stable').T.copy()
+        self._sorted_keys = np.take_along_axis(keys, self._order.T, axis=0).T.copy()
+        self._sorted_count = self._count
+
+
+def fingerprint(card):
+    return hash((card['question'], card.get('command')))  # Comme dans DuplicateIndex._append
+
+
+def _import_numpy():
+    global np, _MULTIPLIERS, _OFFSETS
+    if np is None:
+        import numpy
+        rng = numpy.random.default_rng(SEED)
+        # Hachages multiplicatifs : bits de poids fort de (a * x + b) mod 2^64, a impair
+        _MULTIPLIERS = rng.integers(1, 1 << 63, SIGNATURE_SIZE, dtype=numpy.uint64) * numpy.uint64(2) + numpy.uint64(1)
+        _OFFSETS = rng.integers(0, 1 << 63, SIGNATURE_SIZE, dtype=numpy.uint64)
+        np = numpy
+
+
+def _signatures(feature_lists, chunk=500):
+    """
+    Signatures MinHash (cartes, SIGNATURE_SIZE) de listes de traits, calculées par blocs de
+    `chunk` cartes : chaque bloc hache tous ses traits d'un coup (SIGNATURE_SIZE × traits valeurs).
+    """
+    _import_numpy()
+    if len(feature_lists) > chunk:
+        return np.concatenate([_signatures(feature_lists[start:start + chunk], chunk)
+                               for start in range(0, len(feature_lists), chunk)])
+    lengths = np.fromiter(map(len, feature_lists), dtype=np.int64, count=len(feature_lists))
+    flat = np.fromiter(chain.from_iterable(feature_lists), dtype=np.uint64, count=int(lengths.sum()))
+    starts = np.zeros(len(feature_lists), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=starts[1:])
+    hashed = np.multiply.outer(_MULTIPLIERS, flat)
+    hashed += _OFFSETS[:, None]
+    hashed >>= np.uint64(32)
+    return np.minimum.reduceat(hashed, starts, axis=1).T.astype(np.uint32)
+
+
+def _band_keys(signatures):
+    """Clé de chaque bande (cartes, BANDS) : ses ROWS valeurs combinées en un entier de 64 bits."""
+    rows = signatures.reshape(len(signatures), BANDS, ROWS).astype(np.uint64)
+    keys = rows[:, :, 0].copy()
+    for row in range(1, ROWS):
+        keys *= np.uint64(MIX)
+        keys ^= rows[:, :, row]
+    return keys
+
+
+def _grow(array, capacity, width, dtype):
+    grown = np.empty((capacity, width), dtype=dtype)
+    if array is not None:
+        grown[:len(array)] = array
+    return grown
@@ -0,0 +1,86 @@
+"""
+Prévision de la charge de révision et répartition du deck, calculées avec NumPy.
+
+Le deck est converti une fois en tableaux (dernière révision en epoch, boîte, délai choisi par
+l'algorithme de planification, code de catégorie) ; les échéances s'obtiennent alors en une
+opération, revised_at + délai (INTERVALS[box] sans algorithme), et les cartes dues chaque jour
+en un seul np.bincount sur (catégorie, boîte, jour).
+Ce module importe NumPy : il n'est chargé qu'à l'ouverture des statistiques.
+"""
+import time
+from datetime import datetime, timedelta
+from operator import attrgetter
+
+import numpy as np
+
+from .scheduler import INTERVAL_SECONDS
+
+INTERVALS = np.array(INTERVAL_SECONDS)  # Délai de chaque boîte (s), partagé avec scheduler.py
+NUM_BOXES = len(INTERVALS)
+DAY = 86400.0
+DEFAULT_DAYS = 90
+
+
+class DeckArrays:
+    """
+    Colonnes du deck utiles aux statistiques : `revised_at` (epoch, NaN si jamais révisée),
+    `boxes` (0 à NUM_BOXES - 1), `intervals` (délai en secondes choisi par l'algorithme de
+    planification, NaN pour les cartes qui suivent les délais des boîtes), `categories` (code
+    dans `names`, '' pour les cartes sans catégorie).
+    """
+
+    def __init__(self, cards):
+        """`cards` : des Card, comme les renvoient les moteurs de stockage."""
+        # Une liste par attribut, convertie d'un bloc : None devient NaN
+        self.revised_at = np.array(list(map(attrgetter('revised_at'), cards)), dtype=np.float64)
+        boxes = np.array(list(map(attrgetter('box'), cards)), dtype=np.float64)
+        self.boxes = np.nan_to_num(boxes, nan=0.0).astype(np.int64)
+        np.clip(self.boxes, 0, NUM_BOXES - 1, out=self.boxes)
+        self.intervals = np.array([extra['schedule']['interval'] if extra and extra.get('schedule') else np.nan
+                                   for extra in map(attrgetter('extra'), cards)], dtype=np.float64)
+        codes = {}
+        self.categories = np.array([codes.setdefault(category or "", len(codes))
+                                    for category in map(attrgetter('category'), cards)], dtype=np.int64)
+        self.names = list(codes)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def due_at(self):
+        """Échéance de chaque carte (epoch) ; 0 pour une carte jamais révisée, due tout de suite."""
+        due = self.revised_at + np.where(np.isnan(self.intervals), INTERVALS[self.boxes], self.intervals)
+        return np.nan_to_num(due, nan=0.0, copy=False)
+
+
+def start_of_day(now=None):
+    """Minuit (heure locale) du jour de `now`, en epoch."""
+    now = time.time() if now is None else now
+    return datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+
+
+def forecast(deck, days=DEFAULT_DAYS, now=None):
+    """
+    Cartes dues par jour : tableau [catégorie, boîte, jour] de forme (len(deck.names), NUM_BOXES, days).
+    Le jour 0 (aujourd'hui) compte aussi les cartes en retard ; les échéances au-delà de `days`
+    jours sont ignorées. La prévision suppose qu'aucune carte n'est révisée d'ici là.
+    Les jours durent 24 h à partir de minuit : un changement d'heure décale la limite d'une heure.
+    """
+    shape = (max(len(deck.names), 1), NUM_BOXES, days)
+    day = np.floor((deck.due_at() - start_of_day(now)) / DAY)
+    np.maximum(day, 0, out=day)
+    keep = day < days
+    index = (deck.categories[keep] * NUM_BOXES + deck.boxes[keep]) * days + day[keep].astype(np.int64)
+    return np.bincount(index, minlength=shape[0] * NUM_BOXES * days).reshape(shape)
+
+
+def box_distribution(deck):
+    """Nombre de cartes par [catégorie, boîte]."""
+    shape = (max(len(deck.names), 1), NUM_BOXES)
+    index = deck.categories * NUM_BOXES + deck.boxes
+    return np.bincount(index, minlength=shape[0] * NUM_BOXES).reshape(shape)
+
+
+def day_labels(days=DEFAULT_DAYS, now=None):
+    """Dates des jours de la prévision."""
+    first = datetime.fromtimestamp(start_of_day(now)).date()
+    return [first + timedelta(days=offset) for offset in range(days)]
@@ -0,0 +1,232 @@
+"""
+Historique des révisions : un événement par réponse, dans un journal binaire en ajout seul.
+
+Chaque événement occupe 32 octets (RECORD) : date (epoch), carte, boîte avant et après la
+réponse, réussite, temps de réponse et catégorie. Les événements sont écrits dans l'ordre
+chronologique, ce qui permet de retrouver une période par dichotomie sans lire le reste du fichier.
+
+Les statistiques (réussite par boîte, par catégorie, révisions par jour) sont tenues à jour à
+chaque événement et enregistrées à côté du journal avec le nombre d'événements qu'elles couvrent :
+à l'ouverture, seuls les événements écrits depuis sont relus.
+"""
+import hashlib
+import json
+import os
+import struct
+import time
+from collections import namedtuple
+from datetime import date
+
+from .storage.writer import atomic_write
+
+# date, carte (16 octets), boîtes avant et après (4 bits chacune), réussite, catégorie,
+# temps de réponse (s)
+RECORD = struct.Struct("<d16sB?Hf")
+RECORD_SIZE = RECORD.size  # 32 octets
+NO_CATEGORY = 0xFFFF
+READ_RECORDS = 4096  # Événements lus à la fois lors d'un parcours
+
+ReviewEvent = namedtuple("ReviewEvent", "timestamp card box_before box_after correct latency category")
+
+
+def card_key(card_id):
+    """Identifiant de carte sur 16 octets : les identifiants hexadécimaux tels quels, les autres hachés."""
+    try:
+        key = bytes.fromhex(card_id)
+    except (TypeError, ValueError):
+        key = b""
+    if len(key) != 16:
+        key = hashlib.blake2b(str(card_id).encode(), digest_size=16).digest()
+    return key
+
+
+class HistoryStats:
+    """Agrégats des révisions, mis à jour événement par événement."""
+
+    def __init__(self, data=None):
+        data = data or {}
+        self.events = data.get('events', 0)  # Événements du journal déjà comptés
+        self.boxes = data.get('boxes', {})  # boîte (avant la réponse) -> [révisions, réussites]
+        self.categories = data.get('categories', {})  # catégorie -> [révisions, réussites]
+        self.days = data.get('days', {})  # date ISO -> révisions
+        self.latency = data.get('latency', 0.0)  # Somme des temps de réponse
+
+    def add(self, event):
+        correct = int(event.correct)
+        for table, key in ((self.boxes, str(event.box_before)), (self.categories, event.category or "")):
+            counts = table.setdefault(key, [0, 0])
+            counts[0] += 1
+            counts[1] += correct
+        day = date.fromtimestamp(event.timestamp).isoformat()
+        self.days[day] = self.days.get(day, 0) + 1
+        self.latency += event.latency
+        self.events += 1
+
+    def success_rate(self, table, key):
+        """Part de bonnes réponses (0 à 1) pour une boîte ou une catégorie, ou None sans révision."""
+        reviews, correct = table.get(str(key) if table is self.boxes else key, (0, 0))
+        return correct / reviews if reviews else None
+
+    def to_dict(self):
+        return {'events': self.events, 'boxes': self.boxes, 'categories': self.categories,
+                'days': self.days, 'latency': self.latency}
+
+
+class ReviewHistory:
+    """
+    Journal des révisions (path) et ses fichiers annexes : path.categories (une catégorie par
+    ligne ; son rang est le code enregistré dans les événements) et path.stats.json (agrégats).
+    Les fichiers ne sont lus ou créés qu'au premier usage.
+    """
+
+    STATS_EVERY = 100  # Événements entre deux enregistrements des agrégats (et à la fermeture)
+
+    def __init__(self, path="leitner_history.bin"):
+        self.path = path
+        self.categories_path = path + ".categories"
+        self.stats_path = path + ".stats.json"
+        self._file = None  # Ouvert en ajout au premier événement
+        self._categories = None  # Noms, dans l'ordre des codes
+        self._codes = None  # nom -> code
+        self._stats = None
+        self._last_timestamp = None
+        self._unsaved = 0
+
+    # --- Catégories ----------------------------------------------------------
+
+    def _load_categories(self):
+        if self._categories is None:
+            self._categories = []
+            if os.path.exists(self.categories_path):
+                with open(self.categories_path, encoding="utf-8") as file:
+                    self._categories = [line.rstrip("\n") for line in file]
+            self._codes = {name: code for code, name in enumerate(self._categories)}
+
+    def _category_code(self, category):
+        if not category:
+            return NO_CATEGORY
+        self._load_categories()
+        code = self._codes.get(category)
+        if code is None:
+            code = len(self._categories)
+            with open(self.categories_path, "a", encoding="utf-8") as file:
+                file.write(category.replace("\n", " ") + "\n")
+            self._categories.append(category)
+            self._codes[category] = code
+        return code
+
+    def _decode(self, fields):
+        timestamp, key, boxes, correct, code, latency = fields
+        category = None
+        if code != NO_CATEGORY:
+            self._load_categories()
+            category = self._categories[code] if code < len(self._categories) else None
+        return ReviewEvent(timestamp, key.hex(), boxes >> 4, boxes & 0xF, correct, latency, category)
+
+    # --- Écriture --------------------------------------------------------------
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, "ab")
+            size = self._file.tell()
+            if size % RECORD_SIZE:
+                # Dernier événement à moitié écrit (arrêt brutal) : on l'abandonne
+                self._file.truncate(size - size % RECORD_SIZE)
+                self._file.seek(0, os.SEEK_END)
+            count = self._file.tell() // RECORD_SIZE
+            self._last_timestamp = self._read_timestamp(count - 1) if count else None
+        return self._file
+
+    def record(self, card_id, category, box_before, box_after, correct, latency=0.0, timestamp=None):
+        """Ajoute un événement au journal et aux agrégats ; renvoie l'événement."""
+        stats = self.stats  # Chargés avant l'écriture, pour ne pas compter l'événement deux fois
+        file = self._open()
+        timestamp = time.time() if timestamp is None else timestamp
+        if self._last_timestamp is not None and timestamp < self._last_timestamp:
+            timestamp = self._last_timestamp  # Horloge reculée : le journal reste trié
+        self._last_timestamp = timestamp
+        fields = (timestamp, card_key(card_id), box_before << 4 | box_after, bool(correct),
+                  self._category_code(category), latency or 0.0)
+        file.write(RECORD.pack(*fields))
+        file.flush()
+        event = self._decode(fields)
+        stats.add(event)
+        self._unsaved += 1
+        if self._unsaved >= self.STATS_EVERY:
+            self.save_stats()
+        return event
+
+    def save_stats(self):
+        if self._stats is not None and self._unsaved:
+            atomic_write(self.stats_path, json.dumps(self._stats.to_dict()))
+            self._unsaved = 0
+
+    def close(self):
+        self.save_stats()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # --- Lecture ---------------------------------------------------------------
+
+    def __len__(self):
+        """Nombre d'événements enregistrés."""
+        if self._file is not None:
+            return self._file.tell() // RECORD_SIZE
+        return os.path.getsize(self.path) // RECORD_SIZE if os.path.exists(self.path) else 0
+
+    def _read_timestamp(self, index):
+        with open(self.path, "rb") as file:
+            file.seek(index * RECORD_SIZE)
+            return struct.unpack("<d", file.read(8))[0]
+
+    def _bisect(self, file, timestamp, count):
+        """Rang du premier événement daté de `timestamp` ou après (dichotomie sur le fichier)."""
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            file.seek(middle * RECORD_SIZE)
+            if struct.unpack("<d", file.read(8))[0] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def events(self, start=None, end=None, first=0):
+        """
+        Événements datés de [start, end[ (epoch ; None pour ne pas borner), dans l'ordre.
+        Seule la partie du journal qui couvre la période est lue.
+        """
+        count = len(self)
+        if not count:
+            return
+        with open(self.path, "rb") as file:
+            begin = max(first, self._bisect(file, start, count) if start is not None else 0)
+            stop = self._bisect(file, end, count) if end is not None else count
+            file.seek(begin * RECORD_SIZE)
+            while begin < stop:
+                batch = min(READ_RECORDS, stop - begin)
+                data = file.read(batch * RECORD_SIZE)
+                for fields in RECORD.iter_unpack(data):
+                    yield self._decode(fields)
+                begin += batch
+
+    @property
+    def stats(self):
+        """Agrégats à jour : ceux enregistrés, complétés des événements écrits depuis."""
+        if self._stats is None:
+            data = None
+            if os.path.exists(self.stats_path):
+                try:
+                    with open(self.stats_path, encoding="utf-8") as file:
+                        data = json.load(file)
+                except (OSError, ValueError):
+                    data = None  # Agrégats illisibles : recalculés depuis le journal
+            stats = HistoryStats(data)
+            if stats.events > len(self):
+                stats = HistoryStats()  # Journal remplacé ou tronqué
+            for event in self.events(first=stats.events):
+                stats.add(event)
+                self._unsaved += 1
+            self._stats = stats
+        return self._stats
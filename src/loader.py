@@ -0,0 +1,62 @@
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class DeckLoader:
+    """
+    Lecture du deck dans un thread : parcourt storage.read_batches() et dépose chaque lot
+    dans une file. Le thread ne modifie pas le deck : c'est à celui qui appelle poll()
+    (le thread de l'interface) d'intégrer les lots, avec LeitnerService.load_batch().
+    """
+
+    def __init__(self, batches, name="leitner-loader"):
+        self._batches = batches  # Générateur (cartes, avancement, total)
+        self._queue = queue.SimpleQueue()
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.finished = False  # Plus aucun lot à venir (lecture terminée, échouée ou annulée)
+        self.error = None
+
+    def start(self):
+        self._thread.start()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Arrête la lecture au lot suivant et attend la fin du thread."""
+        self._cancelled.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _run(self):
+        try:
+            for cards, done, total in self._batches:
+                if self._cancelled.is_set():
+                    break
+                self._queue.put((cards, min(100, done * 100 // total) if total else 100))
+        except Exception as error:
+            logger.exception("Échec du chargement du deck")
+            self.error = error
+        finally:
+            self._batches.close()
+            self._queue.put(None)  # Fin de la lecture
+
+    def poll(self):
+        """
+        Renvoie le prochain lot lu, sous la forme (cartes, pourcentage), ou None s'il n'y en a
+        pas encore ; `finished` passe à True une fois le dernier lot rendu.
+        """
+        if self.finished:
+            return None
+        try:
+            item = self._queue.get_nowait()
+        except queue.Empty:
+            return None
+        if item is None:
+            self.finished = True
+        return item
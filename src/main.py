@@ -1,15 +1,18 @@
 import sys
 from PySide6.QtWidgets import QApplication # type: ignore
 from .model import LeitnerService
+from .store import CardStore
 from .views.home_view import HomeView
 
 class LeitnerApp(HomeView):
     def __init__(self):
-        super().__init__()
-        self.leitner_service = LeitnerService()
+        # Un seul deck pour toute l'application, partagé par toutes les fenêtres ; il n'est lu
+        # (en arrière-plan) qu'à l'ouverture de la première fenêtre qui en a besoin
+        super().__init__(CardStore(LeitnerService(load=False)))
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = LeitnerApp()
+    app.aboutToQuit.connect(window.store.close)
     window.show()
     sys.exit(app.exec())
@@ -0,0 +1,380 @@
+"""
+Comparaison de la réponse tapée avec la commande attendue.
+
+Quatre modes, du plus strict au plus tolérant :
+
+- 'exact' : chaînes identiques aux espaces de début et de fin près (comportement historique) ;
+- 'normalized' : espaces multiples, lignes vides et style des guillemets ignorés ;
+- 'tokens' : découpage en mots selon les règles du shell (guillemets, échappements, opérateurs,
+  comme shlex en mode POSIX) ; les options d'une commande peuvent être
+  dans n'importe quel ordre et les options courtes regroupées ou non (`ls -la /tmp` =
+  `ls -a -l /tmp`), les arguments gardent leur ordre ; le mot qui suit une option en est
+  peut-être la valeur (`-p 8080:80`) : deux options n'échangent pas leurs valeurs ; une réponse
+  sur plusieurs lignes (ou avec ; && || |) est comparée commande par commande ;
+- 'fuzzy' : comme 'tokens', avec quelques fautes de frappe tolérées (distance d'édition bornée) ;
+- 'execute' : comme 'tokens' ; une réponse qui diffère encore est exécutée, ainsi que la commande
+  attendue, dans un bac à sable (voir sandbox.py et LeitnerService.submit_answer) : elle est juste
+  si les deux commandes donnent la même sortie et le même code de sortie.
+
+La forme canonique de la commande attendue n'est calculée qu'une fois : elle est gardée sur la
+carte (Card.answer_key) et effacée quand la commande est modifiée.
+"""
+import os
+import re
+
+DEFAULT_MODE = "tokens"
+
+QUOTES = str.maketrans({"‘": "'", "’": "'", "“": '"', "”": '"', "«": '"', "»": '"', "'": '"'})
+SPACES = re.compile(r"[ \t]+")
+SEPARATORS = frozenset((";", "&&", "||", "|", "&"))
+QUOTING = re.compile(r"['\"\\]")
+QUOTED_SPAN = re.compile(r"""('[^']*'|"(?:[^"\\]|\\.)*")""")
+SIMPLE = re.compile(r"[^'\"\\|&;<>()]*")  # Sans guillemet ni opérateur : str.split suffit
+UNQUOTED_TOKEN = re.compile(r"&&|\|\||[|&;]|[()<>]+|[^\s|&;()<>]+")  # Mots et opérateurs, sans guillemet
+# Mot du shell : suite de morceaux nus, entre apostrophes, entre guillemets ou échappés
+WORD = r"""(?:[^\s'"\\|&;()<>]+|'[^']*'|"(?:[^"\\]|\\.)*"|\\.)+"""
+# Opérateur, mot, ou caractère isolé (guillemet non fermé, échappement en fin de ligne)
+TOKEN = re.compile(rf"""(&&|\|\||[|&;]|[()<>]+)|({WORD})|(\S)""", re.S)
+QUOTED = re.compile(r"""'([^']*)'|"((?:[^"\\]|\\.)*)"|\\(.)""", re.S)
+ESCAPED_IN_QUOTES = re.compile(r'\\([\\"$`])')  # Seuls caractères échappés entre guillemets
+
+
+class ExactMatcher:
+    name = "exact"
+    executes = False  # Vrai si les réponses refusées sont ensuite exécutées (mode 'execute')
+
+    def key(self, command):
+        """Forme canonique d'une commande ; deux commandes équivalentes ont la même."""
+        return command.strip()
+
+    def matches(self, key, answer):
+        return self.key(answer) == key
+
+
+class NormalizedMatcher(ExactMatcher):
+    name = "normalized"
+
+    def key(self, command):
+        lines = (SPACES.sub(" ", line).strip() for line in command.translate(QUOTES).splitlines())
+        return "\n".join(line for line in lines if line)
+
+
+class TokenMatcher(ExactMatcher):
+    """
+    La clé garde aussi la forme canonique de chaque ligne de la commande : dans une réponse sur
+    plusieurs lignes, seules celles qui diffèrent de la commande attendue sont analysées.
+    """
+    name = "tokens"
+
+    def key(self, command):
+        lines = {}
+        return tuple(command.split()), self.canonical(command, lines), lines
+
+    def matches(self, key, answer):
+        words, canonical, lines = key
+        # Sans guillemet ni échappement, les espaces ne font que séparer les mots :
+        # mêmes mots dans le même ordre, même découpage shell, sans rien analyser
+        if not QUOTING.search(answer) and tuple(answer.split()) == words:
+            return True
+        # Comparaison ligne à ligne : on s'arrête à la première commande qui diffère
+        position = 0
+        for line in answer.splitlines():
+            line_segments = lines.get(line_key(line))
+            if line_segments is None:
+                line_segments = self.line_segments(line)
+            end = position + len(line_segments)
+            if not same_segments(canonical[position:end], line_segments):
+                return False
+            position = end
+        return position == len(canonical)
+
+    @classmethod
+    def canonical(cls, command, lines, learn=True):
+        """
+        Commandes successives (lignes, ou séparées par ; && || | &), chacune sous la forme
+        (arguments, options triées, mots dans l'ordre ; voir line_segments). `lines` associe une
+        ligne déjà analysée (espaces normalisés) à ses commandes ; avec learn=True, les nouvelles lignes y sont ajoutées.
+        """
+        segments = []
+        for line in command.splitlines():
+            normalized = line_key(line)
+            line_segments = lines.get(normalized)
+            if line_segments is None:
+                line_segments = cls.line_segments(line)
+                if learn:
+                    lines[normalized] = line_segments
+            segments.extend(line_segments)
+        return tuple(segments)
+
+    @staticmethod
+    def line_segments(line):
+        """
+        Commandes d'une ligne, chacune sous deux formes, car on ne sait pas quelles options
+        attendent une valeur : (arguments, options triées, mots dans l'ordre). Dans la première,
+        le mot qui suit une option est gardé avec elle (`-f archive.tar`) plutôt que parmi les
+        arguments : changer l'ordre des options ne leur échange pas leurs valeurs. Dans la
+        seconde, seules les options qui se suivent sont triées, les mots gardant leur place
+        (`ls -l -a /tmp` = `ls -a -l /tmp`). Deux commandes sont les mêmes si l'une des deux
+        formes l'est (same_segments). Un groupe d'options courtes est développé (-la en -a -l),
+        sauf dans la première forme s'il est suivi d'un mot : ses lettres y sont seulement triées.
+
+        >>> same = lambda a, b: same_segments(TokenMatcher.line_segments(a), TokenMatcher.line_segments(b))
+        >>> same("ls -la", "ls -a -l"), same("rm -rf build", "rm -fr build")
+        (True, True)
+        >>> same("ls -l -a /tmp", "ls -a -l /tmp"), same("ls -la /tmp", "ls -a -l /tmp")
+        (True, True)
+        >>> same("rm -r -f build", "rm -f -r build"), same("grep -i -n foo f", "grep -n -i foo f")
+        (True, True)
+        >>> same("git log --oneline --graph main", "git log --graph --oneline main")
+        True
+        >>> same("ls -l /tmp -a", "ls -a -l /tmp"), same("tar -x -f archive.tar", "tar -f archive.tar -x")
+        (True, True)
+        >>> same("kubectl get pods -n prod", "kubectl get pods -n dev")
+        False
+        >>> same("docker run -p 8080:80 -v /data:/data nginx", "docker run -v /data:/data -p 8080:80 nginx")
+        True
+        >>> same("docker run -p 8080:80 -v /data:/data nginx", "docker run -v 8080:80 -p /data:/data nginx")
+        False
+        >>> same("chown -u root -g wheel f", "chown -g root -u wheel f")
+        False
+
+        Sans savoir que -f de tar attend une valeur, `tar -x -f archive.tar` et
+        `tar -f -x archive.tar` ne se distinguent pas de `ls -l -a /tmp` et `ls -a -l /tmp` :
+
+        >>> same("tar -x -f archive.tar", "tar -f -x archive.tar")
+        True
+        """
+        if SIMPLE.fullmatch(line):
+            words = line.split()
+        elif QUOTING.search(line) is None:
+            words = UNQUOTED_TOKEN.findall(line)
+        else:
+            words = shell_words(line)
+        segments = []
+        arguments, options, ordered = [], [], []
+        option = None  # Dernière option, en attente de sa valeur éventuelle
+        run = []  # Options qui se suivent, triées dans `ordered` au mot suivant
+        for word in words:
+            if word.startswith("-") and word != "-" and word != "--":
+                if option is not None:
+                    options.extend(_expand(option))
+                option = word
+                run.extend(_expand(word))
+                continue
+            ordered.extend(sorted(run))
+            run = []
+            if word in SEPARATORS:
+                if option is not None:
+                    options.extend(_expand(option))
+                    option = None
+                if arguments or options:
+                    segments.append((tuple(arguments), tuple(sorted(options)), tuple(ordered)))
+                    arguments, options, ordered = [], [], []
+                segments.append(((word,), (), (word,)))
+                continue
+            if option is not None:
+                options.append(_short_cluster(option) + " " + word)
+                option = None
+            else:
+                arguments.append(word)
+            ordered.append(word)
+        ordered.extend(sorted(run))
+        if option is not None:
+            options.extend(_expand(option))
+        if arguments or options:
+            segments.append((tuple(arguments), tuple(sorted(options)), tuple(ordered)))
+        return tuple(segments)
+
+
+def same_segments(a, b):
+    """
+    Vrai si les commandes `a` et `b` (voir TokenMatcher.line_segments) sont les mêmes : une à une,
+    avec les valeurs attachées à leurs options ou avec les mots dans l'ordre.
+    """
+    return len(a) == len(b) and all(x[:2] == y[:2] or x[2] == y[2] for x, y in zip(a, b))
+
+
+def _is_cluster(option):
+    return len(option) > 2 and option[1] != "-" and option[1:].isalpha()
+
+
+def _expand(option):
+    """Option sans valeur : un groupe d'options courtes devient une option par lettre."""
+    return ["-" + letter for letter in option[1:]] if _is_cluster(option) else [option]
+
+
+def _short_cluster(option):
+    """Option suivie d'un mot : lettres d'un groupe d'options courtes triées, sans le développer."""
+    return "-" + "".join(sorted(option[1:])) if _is_cluster(option) else option
+
+
+def line_key(line):
+    """
+    Ligne aux espaces normalisés hors guillemets : deux lignes de même clé ont les mêmes mots.
+    Avec un échappement (\\), les espaces peuvent compter : la ligne est seulement rognée.
+    """
+    if not QUOTING.search(line):
+        return " ".join(line.split())
+    if "\\" in line:
+        return line.strip()
+    parts = QUOTED_SPAN.split(line.strip())
+    parts[::2] = [SPACES.sub(" ", part) for part in parts[::2]]
+    return "".join(parts)
+
+
+def shell_words(line):
+    """
+    Mots d'une ligne de shell, guillemets retirés, les opérateurs (| && ; > ...) à part.
+    Une expression régulière plutôt que shlex, dix fois plus lent. Guillemet non fermé :
+    découpage aux espaces.
+    """
+    words = []
+    for operator, word, stray in TOKEN.findall(line):
+        if stray:
+            return line.split()
+        if operator:
+            words.append(operator)
+        elif "'" in word or '"' in word or "\\" in word:
+            words.append(QUOTED.sub(_unquote, word))
+        else:
+            words.append(word)
+    return words
+
+
+def _unquote(match):
+    single, double, escaped = match.groups()
+    if single is not None:
+        return single
+    if double is not None:
+        return ESCAPED_IN_QUOTES.sub(r"\1", double)
+    return escaped
+
+
+class FuzzyMatcher(TokenMatcher):
+    """Forme canonique de 'tokens' mise à plat, à `max_distance` fautes près (une par 10 caractères)."""
+    name = "fuzzy"
+
+    def __init__(self, max_distance=2, chars_per_error=10):
+        self.max_distance = max_distance
+        self.chars_per_error = chars_per_error
+
+    def key(self, command):
+        lines = {}
+        texts, ordered = [], {}
+        for arguments, options, words in self.canonical(command, lines):
+            texts.append(" ".join(arguments + options))
+            ordered[" ".join(words)] = texts[-1]
+        return "\n".join(texts), lines, frozenset(texts), ordered
+
+    def matches(self, key, answer):
+        expected, lines, known, ordered = key
+        allowed = min(self.max_distance, len(expected) // self.chars_per_error)
+        texts = []
+        changed = 0  # Commandes de la réponse absentes de la commande attendue
+        for line in answer.splitlines():
+            line_segments = lines.get(line_key(line))
+            if line_segments is None:
+                line_segments = self.line_segments(line)
+            for arguments, options, words in line_segments:
+                text = " ".join(arguments + options)
+                if text not in known:
+                    # Mêmes mots dans l'ordre qu'une commande attendue : c'est elle (same_segments)
+                    text = ordered.get(" ".join(words), text)
+                if text not in known:
+                    # Une faute modifie au plus deux commandes (en coupant ou en joignant deux
+                    # lignes) : au-delà, la distance dépasse forcément la tolérance
+                    changed += 1
+                    if changed > 2 * allowed:
+                        return False
+                texts.append(text)
+        return within_distance("\n".join(texts), expected, allowed)
+
+
+def within_distance(a, b, limit):
+    """
+    Vrai si la distance de Levenshtein entre a et b est au plus `limit`. Le préfixe et le suffixe
+    communs sont retirés, puis seule une bande de largeur 2 * limit + 1 est calculée.
+    """
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > limit:
+        return False
+    start = _common_prefix(a, b)
+    a, b = a[start:], b[start:]
+    end = _common_prefix(a[::-1], b[::-1])
+    a, b = a[:len(a) - end], b[:len(b) - end]
+    return _banded_distance(a, b, limit) <= limit
+
+
+def _common_prefix(a, b):
+    """Longueur du préfixe commun, par dichotomie : les comparaisons de tranches se font en C."""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _banded_distance(a, b, limit):
+    """Distance d'édition, ou limit + 1 dès qu'elle dépasse forcément `limit`."""
+    infinity = limit + 1
+    width = 2 * limit + 1
+    # row[d] : distance entre a[:i] et b[:j], pour j = i - limit + d
+    row = [j if 0 <= j <= len(b) else infinity for j in range(-limit, limit + 1)]
+    for i in range(1, len(a) + 1):
+        char = a[i - 1]
+        current = [infinity] * width
+        for d in range(width):
+            j = i - limit + d
+            if j < 0 or j > len(b):
+                continue
+            if j == 0:
+                current[d] = i
+                continue
+            value = row[d] + (char != b[j - 1])  # Substitution (ou égalité)
+            if d + 1 < width and row[d + 1] + 1 < value:  # Suppression
+                value = row[d + 1] + 1
+            if d and current[d - 1] + 1 < value:  # Insertion
+                value = current[d - 1] + 1
+            current[d] = value
+        if min(current) > limit:
+            return infinity
+        row = current
+    d = len(b) - len(a) + limit
+    return min(row[d], infinity) if 0 <= d < width else infinity
+
+
+class ExecuteMatcher(TokenMatcher):
+    """Comparaison de 'tokens' ; l'exécution des réponses refusées est confiée au service (sandbox.py)."""
+    name = "execute"
+    executes = True
+
+
+MATCHERS = {matcher.name: matcher for matcher in (ExactMatcher, NormalizedMatcher, TokenMatcher, FuzzyMatcher,
+                                                  ExecuteMatcher)}
+
+
+def make_matcher(mode=None):
+    """
+    Construit le comparateur demandé ('exact', 'normalized', 'tokens', 'fuzzy' ou 'execute').
+    Par défaut, le choix est lu dans la variable d'environnement LEITNER_MATCHING.
+    """
+    mode = mode or os.environ.get("LEITNER_MATCHING", DEFAULT_MODE)
+    if mode not in MATCHERS:
+        raise ValueError(f"Mode de comparaison inconnu : {mode}")
+    return MATCHERS[mode]()
+
+
+def check_answer(matcher, card, answer):
+    """Vrai si `answer` correspond à la commande de la carte ; la forme canonique est gardée sur la carte."""
+    cached = getattr(card, 'answer_key', None)
+    if cached is not None and cached[0] == matcher.name:
+        key = cached[1]
+    else:
+        key = matcher.key(card.get('command') or "")
+        if hasattr(card, 'answer_key'):
+            card.answer_key = (matcher.name, key)
+    return matcher.matches(key, answer)
@@ -1,94 +1,489 @@
-import json
-import os
+import logging
+from contextlib import contextmanager
 from datetime import datetime
+from functools import partial
 
+from . import diagnostics
+from .algorithms import load_algorithm, save_algorithm
+from .card import Card
+from .categories import NUM_BOXES, CategoryRegistry
+from .duplicates import THRESHOLD, DuplicateIndex
+from .history import ReviewHistory
+from .matching import check_answer, make_matcher
+from .scheduler import ALL, REVISION_INTERVALS, ReviewScheduler
+from .search import SearchIndex
+from .storage import make_storage, new_card_id
+
+logger = logging.getLogger(__name__)
+
+@diagnostics.instrument("service")
 class LeitnerService:
-    def __init__(self):
-        self.cards = []
-        self.categories = []
-        self.file_path = "leitner_cards.json"  # Fichier pour stocker les cartes
-        self.categories_file = "categories.json"  # Fichier pour stocker les catégories
-        self.load_cards()  # Charger les cartes lors de l'initialisation
-        self.load_categories()  # Charger les catégories lors de l'initialisation
-
-    def load_categories(self):
-        """Charge les catégories à partir du fichier JSON, et ajoute une catégorie spéciale 'All'."""
-        if os.path.exists(self.categories_file):
-            with open(self.categories_file, 'r') as f:
-                self.categories = json.load(f)
-        else:
-            self.categories = []  # Si le fichier n'existe pas, initialise avec une liste vide
+    def __init__(self, storage=None, load=True, history=None):
+        self.storage = storage if storage is not None else make_storage()  # JSON + journal, SQLite, binaire ou par catégorie
+        # Journal des réponses, rangé dans le dossier du deck comme les autres fichiers annexes
+        self.history = history if history is not None else ReviewHistory(self.storage.sidecar_path("leitner_history.bin"))
+        self.listeners = []  # Fonctions appelées avec (événement, carte) après chaque modification
+        self.scheduler = ReviewScheduler()  # Échéances précalculées par (catégorie, boîte)
+        self.search_index = SearchIndex(self.get_all_cards)  # Trigrammes, construit par tranches à la demande
+        self.duplicate_index = DuplicateIndex(self.get_all_cards)  # MinHash et LSH, construit à la demande
+        # Cartes par catégorie et par boîte, enregistrées à côté du deck (categories.json)
+        self.registry = CategoryRegistry(self.storage.sidecar_path("categories.json"))
+        self.registry.listener = self._notify_categories
+        self.indexes = [self.scheduler, self.search_index, self.duplicate_index, self.registry]  # Index tenus à jour avant les listeners
+        self.storage.loaded_listener = self._cards_loaded  # Catégories chargées à la demande
+        self.loading = False  # Chargement progressif en cours (voir begin_loading)
+        self._batch = None  # Notifications retenues pendant une transaction (voir batch)
+        self.matcher = make_matcher()  # Comparaison des réponses (LEITNER_MATCHING, voir matching.py)
+        self.command_pool = None  # Exécution des réponses en mode 'execute' (sandbox.py), lancée à la demande
+        # Délai après chaque réponse (scheduling.json, choisi par `python -m src schedule`, voir algorithms.py)
+        self.algorithm = load_algorithm(self.storage.sidecar_path("scheduling.json"))
+        if diagnostics.ENABLED:
+            diagnostics.registry.gauge('deck_cards', lambda: sum(self.registry.counts(ALL)))
+        self.registry.load()  # Catégories créées sans carte et compteurs de la dernière sauvegarde
+        if load:
+            self.load_cards()  # Charger les cartes lors de l'initialisation
 
-        if "All" not in self.categories:
-            self.categories.insert(0, "All")  # Ajouter la catégorie spéciale "All" en première position
+    @property
+    def cards(self):
+        return self.storage.all_cards()
+
+    @property
+    def categories(self):
+        """Noms des catégories, sans la catégorie spéciale 'All'."""
+        return self.registry.names()
 
     def load_cards(self):
-        """Charge les cartes depuis un fichier JSON."""
+        """Charge les cartes depuis le moteur de stockage et reconstruit les index."""
+        self.storage.load()
+        cards = self.storage.loaded_cards()
+        self.scheduler.rebuild(cards)
+        self.registry.rebuild(cards, self._unloaded_counts())
+        self.search_index.reset()
+        self.duplicate_index.reset()
+
+    def begin_loading(self):
+        """
+        Commence un chargement progressif : le deck est vide, puis complété par load_batch()
+        avec les lots de storage.read_batches() (lus par exemple dans un thread), et enfin
+        finish_loading(). Le deck reste utilisable, et modifiable, pendant le chargement.
+        """
+        self.storage.begin_load()  # Deck déjà ouvert ailleurs (DeckInUseError) : rien n'est commencé
+        self.loading = True
+        self.scheduler.rebuild([])
+        self.registry.rebuild([], self._unloaded_counts())
+        self.search_index.reset()
+        self.duplicate_index.reset()
+
+    def load_batch(self, cards):
+        """Intègre un lot de cartes lues et met les index à jour ; renvoie les cartes ajoutées."""
+        cards = self.storage.load_batch(cards)
+        for card in cards:
+            for index in self.indexes:
+                index.on_change('added', card)
+        return cards
+
+    def _unloaded_counts(self):
+        return {category: counts for category, (counts, _) in self.storage.unloaded_stats().items()}
+
+    def _cards_loaded(self, category, cards):
+        """Une catégorie vient d'être chargée à la demande par le moteur de stockage : ses cartes sont indexées."""
+        for card in cards:
+            for index in self.indexes:
+                index.on_change('added', card)
+        self.registry.loaded(category)
+
+    def finish_loading(self):
+        """Termine le chargement : les modifications rejouées depuis le journal sont notifiées."""
+        changes = self.storage.finish_load()
+        self.loading = False
+        for event, card in changes:
+            self._notify(event, card)
+
+    def sync(self):
+        """
+        Intègre les modifications faites par d'autres processus sur le même deck (autre fenêtre,
+        ligne de commande) : elles sont notifiées comme des modifications locales. Les
+        modifications locales perdues face à une version plus récente sont journalisées et
+        transmises aux listeners par listener('conflicts', conflits) ; elles sont renvoyées.
+        """
+        if self.loading or self._batch is not None:
+            return []  # Le chargement progressif intègre lui-même le journal ; transaction : au commit
+        changes, conflicts = self.storage.sync()
+        for event, card in changes:
+            self._notify(event, card)
+        if conflicts:
+            for conflict in conflicts:
+                logger.warning("Modification de la carte %s écrasée par un autre processus", conflict.card_id)
+            for listener in list(self.listeners):
+                listener('conflicts', conflicts)
+        return conflicts
+
+    @contextmanager
+    def batch(self):
+        """
+        Transaction : `with service.batch(): ...` regroupe des modifications en une seule écriture
+        et ne notifie les index et les listeners qu'à la fin du bloc. Si le bloc lève une
+        exception, toutes ses modifications sont annulées. Une carte modifiée en place avant
+        update_card reprend l'état qu'elle avait à cet appel (avec SQLite, son état enregistré) :
+        dans une transaction, passez plutôt les modifications sous forme de dictionnaire.
+        Les transactions imbriquées font partie de la transaction englobante.
+        """
+        if self._batch is not None:
+            yield
+            return
+        self._batch = []
+        self.storage.begin_batch()
         try:
-            with open(self.file_path, "r") as file:
-                self.cards = json.load(file)
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.cards = []  # Si le fichier n'existe pas ou est corrompu, on initialise avec une liste vide
+            yield
+        except BaseException:
+            self._batch = None
+            self.storage.rollback_batch()
+            raise
+        pending, self._batch = self._batch, None
+        self.storage.commit_batch()
+        for notify in pending:
+            notify()
+
+    def compact(self):
+        """Réécrit le deck d'un bloc, par exemple après un import en masse (en arrière-plan)."""
+        self.storage.compact()
+
+    def flush(self):
+        """Attend que les modifications en attente soient écrites sur le disque."""
+        self.storage.flush()
+
+    def close(self):
+        """Écrit les modifications en attente et ferme le moteur de stockage."""
+        self.storage.close()
+        self.history.close()
+        if self.command_pool is not None:
+            self.command_pool.close()
+        if not self.loading:
+            self.registry.save()  # Compteurs d'un deck partiellement chargé : non enregistrés
+
+    def add_listener(self, listener):
+        """Abonne une fonction aux modifications : listener(event, card) avec event parmi
+        'added', 'updated', 'deleted' et 'moved', listener('added_many', cards) pour un lot
+        ajouté en une fois (import), listener('rescheduled', cards) quand l'échéance de tout le
+        deck est recalculée (voir set_algorithm), listener('conflicts', conflicts) (voir sync), ou
+        listener('categories', noms) quand une catégorie apparaît ou disparaît."""
+        self.listeners.append(listener)
 
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def _notify(self, event, card):
+        if self._batch is not None:
+            self._batch.append(partial(self._notify, event, card))
+            return
+        for index in self.indexes:
+            index.on_change(event, card)
+        for listener in list(self.listeners):
+            listener(event, card)
+
+    def _notify_categories(self, names):
+        for listener in list(self.listeners):
+            listener('categories', names)
+
+    def _notify_added_many(self, cards):
+        if self._batch is not None:
+            self._batch.append(partial(self._notify_added_many, cards))
+            return
+        for index in self.indexes:
+            for card in cards:
+                index.on_change('added', card)
+        for listener in list(self.listeners):
+            listener('added_many', cards)
+
+    def _notify_rescheduled(self, cards):
+        if self._batch is not None:
+            self._batch.append(partial(self._notify_rescheduled, cards))
+            return
+        # Seules les échéances ont changé : les files du planificateur sont reconstruites d'un
+        # bloc, les autres index (catégories, recherche) restent valables
+        self.scheduler.rebuild(self.storage.loaded_cards())
+        for listener in list(self.listeners):
+            listener('rescheduled', cards)
 
     def add_category(self, category):
-        if category not in self.categories:
-            self.categories.append(category)
+        """Crée une catégorie, avant qu'une carte ne la porte."""
+        if category not in self.registry:
+            self.registry.declare(category)
+            self.registry.save()
+
+    def rename_category(self, old, new):
+        """
+        Renomme la catégorie `old`, ou la fusionne dans `new` si celle-ci existe déjà. Seules les
+        cartes de la catégorie sont parcourues (index par boîte et catégorie) et elles sont
+        enregistrées en une fois. Renvoie le nombre de cartes modifiées.
+        """
+        if not new or new == old or ALL in (old, new):
+            return 0
+        cards = [card for box in range(NUM_BOXES) for card in self.storage.cards_by_box_and_category(box, old)]
+        self.update_cards([{'id': card.id, 'category': new} for card in cards])
+        if old in self.registry and not cards:
+            self.registry.declare(new)  # Catégorie vide : le nom seul change
+        self.registry.forget(old)
+        self.registry.save()
+        return len(cards)
 
     def add_card(self, card):
-        """Ajoute une nouvelle carte avec une date de révision initiale."""
-        card['last_revision'] = datetime.now().isoformat()  # On enregistre la date actuelle
-        self.cards.append(card)
-        self.save_cards()  # Sauvegarde après l'ajout
+        """
+        Ajoute une nouvelle carte avec un identifiant stable et une date de révision initiale.
+        Un dictionnaire est converti en Card ; la carte enregistrée est renvoyée.
+        """
+        card = Card.from_dict(card)
+        card.setdefault('id', new_card_id())
+        card.revised_at = datetime.now().timestamp()  # On enregistre la date actuelle
+        self.storage.add(card)
+        self._notify('added', card)
+        return card
+
+    def add_cards(self, cards):
+        """
+        Ajoute un lot de cartes en une seule écriture. Contrairement à add_card, une date de
+        dernière révision déjà présente (carte exportée) est conservée. Renvoie les cartes ajoutées.
+        """
+        now = datetime.now().timestamp()
+        cards = [Card.from_dict(card) for card in cards]
+        for card in cards:
+            if card.id is None:
+                card.id = new_card_id()
+            if card.revised_at is None:
+                card.revised_at = now
+        if cards:
+            self.storage.add_many(cards)
+            self._notify_added_many(cards)
+        return cards
 
     def get_all_categories(self):
-        """Retourne une liste de toutes les catégories."""
-        return list(set(card['category'] for card in self.cards if 'category' in card))
-    
+        """Retourne la liste des catégories, par ordre alphabétique (registre : sans parcourir le deck)."""
+        return self.registry.names()
+
     def get_cards_by_box_and_category(self, box, category):
         """
         Récupère les cartes qui sont dans la boîte spécifiée et correspondent à la catégorie donnée.
         Si la catégorie est 'All', retourne toutes les cartes de la boîte spécifiée, sans filtrer par catégorie.
         """
-        if category == "All":
-            # Si la catégorie est "All", ne pas filtrer par catégorie
-            return [card for card in self.cards if card.get('box') == box]
-        else:
-            # Filtrer à la fois par boîte et par catégorie
-            return [card for card in self.cards if card.get('box') == box and card.get('category') == category]
+        return self.storage.cards_by_box_and_category(box, category)
+
+    def get_due_cards(self, box, category, now=None, limit=None):
+        """Cartes de la boîte dont la révision est due, de la plus en retard à la plus récente."""
+        self.storage.require(category)
+        return [self.storage.get(card_id) for card_id in self.scheduler.due_cards(category, box, now, limit)]
+
+    def get_next_due(self, box, category):
+        """Prochaine échéance (datetime) d'une boîte, ou None si elle est vide."""
+        next_due = self.scheduler.next_due(category, box)
+        # Catégories pas encore chargées : échéances fournies par le moteur, sans les charger
+        for name, (_, due) in self.storage.unloaded_stats().items():
+            if category in (ALL, name) and due[box] is not None:
+                next_due = due[box] if next_due is None else min(next_due, due[box])
+        return datetime.fromtimestamp(next_due) if next_due is not None else None
+
+    def count_cards(self, box, category):
+        """Nombre de cartes d'une boîte, sans parcourir le deck."""
+        return self.registry.count(category, box)
 
     def update_card(self, updated_card):
-        """Met à jour une carte dans la liste."""
-        for card in self.cards:
-            if card['question'] == updated_card['question']:
-                card.update(updated_card)
-        self.save_cards()  # Sauvegarde après la mise à jour
+        """Met à jour une carte, retrouvée par son identifiant (la question peut avoir changé)."""
+        if 'id' not in updated_card:
+            existing = self.storage.find_by_question(updated_card['question'])
+            if existing is None:
+                return
+            updated_card['id'] = existing['id']
+        self.storage.update(updated_card)
+        card = self.storage.get(updated_card['id'])
+        if card is not None:
+            self._notify('updated', card)
+
+    # Opérations en masse (sélection multiple) : une transaction chacune, donc une seule écriture
+
+    def update_cards(self, changes):
+        """Applique des modifications : dictionnaires avec l'identifiant et les champs à changer."""
+        changes = [change for change in changes if self.storage.get(change['id']) is not None]
+        if not changes:
+            return
+        with self.batch():
+            self.storage.update_many(changes)
+            for change in changes:
+                card = self.storage.get(change['id'])
+                if card is not None:
+                    self._notify('updated', card)
+
+    def move_cards(self, card_ids, new_box):
+        """Déplace des cartes vers une boîte."""
+        with self.batch():
+            for card_id in card_ids:
+                self.move_card(card_id, new_box)
+
+    def delete_cards(self, card_ids):
+        """Supprime des cartes."""
+        with self.batch():
+            for card_id in card_ids:
+                self.delete_card(card_id)
+
+    def check_answer(self, card, answer):
+        """Vrai si la réponse tapée correspond à la commande de la carte, selon le mode de comparaison."""
+        return check_answer(self.matcher, card, answer)
+
+    def submit_answer(self, card, answer):
+        """
+        Vérifie une réponse sans bloquer : renvoie un concurrent.futures.Future du verdict. En mode
+        'execute', une réponse refusée par la comparaison du texte est exécutée avec la commande de
+        la carte (voir sandbox.CommandPool.check) ; sinon, le Future est déjà résolu.
+        """
+        from concurrent.futures import Future
+        correct = self.check_answer(card, answer)
+        if not correct and self.matcher.executes and card.get('command'):
+            return self._command_pool().check(card['command'], answer)
+        future = Future()
+        future.set_result(correct)
+        return future
+
+    def prepare_answers(self):
+        """
+        En mode 'execute', lance d'avance les processus d'exécution (début d'une révision). Aucune
+        commande n'y est exécutée : celle d'une carte ne l'est qu'à la vérification d'une réponse.
+        """
+        if self.matcher.executes:
+            self._command_pool().start()
+
+    def _command_pool(self):
+        if self.command_pool is None:
+            from .sandbox import CommandPool
+            self.command_pool = CommandPool()
+        return self.command_pool
+
+    def review_card(self, card, correct, latency=0.0):
+        """
+        Enregistre une réponse : la carte passe à la boîte suivante si elle est juste (jusqu'à la
+        dernière), revient à la précédente sinon, et sa date de révision devient maintenant.
+        Le délai avant la révision suivante est choisi par l'algorithme de planification.
+        La réponse est ajoutée à l'historique avec son temps de réponse `latency` (secondes).
+        """
+        box_before = card['box']
+        if correct:
+            box = min(box_before + 1, len(REVISION_INTERVALS) - 1)
+        else:
+            box = max(box_before - 1, 0)
+        now = datetime.now()
+        # Modifications passées au stockage plutôt qu'appliquées en place : annulables en transaction
+        change = {'id': card['id'], 'box': box, 'last_revision': now.isoformat()}
+        schedule = self.algorithm.review(card, correct, box, now.timestamp())
+        if schedule is not None or 'schedule' in card:
+            change['schedule'] = schedule
+        self.update_card(change)
+        if self.storage.get(card['id']) is not card:
+            card.update(change)  # Copie détenue par l'appelant
+        record = partial(self.history.record, card['id'], card.get('category'), box_before, card['box'], correct, latency)
+        if self._batch is not None:
+            self._batch.append(record)  # Une réponse annulée n'entre pas dans l'historique
+        else:
+            record()
+
+    def set_algorithm(self, algorithm, log=None):
+        """
+        Change d'algorithme de planification, ou de paramètres : l'état et l'échéance de toutes
+        les cartes sont recalculés d'une traite à partir de l'historique (optimizer.reschedule),
+        puis enregistrés en une seule écriture. Le choix est gardé pour le deck (scheduling.json).
+        `log` : historique déjà lu (optimizer.ReviewLog), sinon lu ici.
+        """
+        from . import optimizer  # NumPy : chargé seulement pour ce calcul
+        if log is None:
+            log = optimizer.ReviewLog.read(self.history)
+        cards = self.storage.all_cards()
+        schedules = optimizer.reschedule(algorithm, cards, log)
+        changed = [(card, schedule) for card, schedule in zip(cards, schedules)
+                   if schedule is not None or 'schedule' in card]
+        if changed:
+            with self.batch():
+                self.storage.update_many([{'id': card.id, 'schedule': schedule} for card, schedule in changed])
+                self._notify_rescheduled([card for card, _ in changed])
+        self.algorithm = algorithm
+        save_algorithm(self.storage.sidecar_path("scheduling.json"), algorithm)
+
+    def fit_algorithm(self, algorithm=None):
+        """
+        Ajuste les paramètres d'un algorithme (par défaut, celui du deck) à l'historique des
+        révisions, puis l'applique à toutes les cartes (set_algorithm). Renvoie optimizer.FitResult.
+        """
+        from . import optimizer
+        log = optimizer.ReviewLog.read(self.history)
+        result = optimizer.fit(algorithm or self.algorithm, log)
+        self.set_algorithm(result.algorithm, log)
+        return result
 
     def get_all_cards(self):
         """Retourne toutes les cartes."""
-        return self.cards
-    
+        return self.storage.all_cards()
+
+    def search_cards(self, text, category=None):
+        """
+        Cartes dont la question ou la commande contient `text` (sans tenir compte de la casse),
+        éventuellement limitées à une catégorie.
+        """
+        return [self.storage.get(card_id) for card_id in self.search_index.query(text, category)]
+
+    def find_similar(self, card, threshold=THRESHOLD):
+        """
+        Cartes du deck dont la question et la commande ressemblent à celles de `card`
+        (dictionnaire ou Card), de la plus proche à la moins proche : liste de (carte, similarité).
+        Voir duplicates.py ; similarité 1 pour une copie exacte.
+        """
+        return self._similar_cards(self.duplicate_index.query(card, threshold))
+
+    def find_similar_many(self, cards, threshold=THRESHOLD):
+        """
+        Recherche groupée (import) : pour chaque carte, (cartes semblables du deck, positions des
+        cartes semblables plus haut dans `cards`), les listes étant formées de (élément, similarité).
+        """
+        return [(self._similar_cards(matches), earlier)
+                for matches, earlier in self.duplicate_index.query_many(cards, threshold)]
+
+    def find_duplicates(self, threshold=THRESHOLD):
+        """
+        Groupes de cartes en double ou presque, les plus grands d'abord ; dans chaque groupe,
+        les cartes ressemblent à la première (voir DuplicateIndex.groups).
+        """
+        groups = [[self.storage.get(card_id) for card_id in group]
+                  for group in self.duplicate_index.groups(threshold)]
+        return [[card for card in group if card is not None] for group in groups]
+
+    def merge_cards(self, kept_id, card_ids):
+        """
+        Fusionne des doublons dans la carte `kept_id` : les autres cartes sont supprimées, en une
+        seule écriture. La carte gardée conserve sa boîte et son historique.
+        """
+        self.delete_cards([card_id for card_id in card_ids if card_id != kept_id])
+
+    def _similar_cards(self, matches):
+        cards = ((self.storage.get(card_id), similarity) for card_id, similarity in matches)
+        return [(card, similarity) for card, similarity in cards if card is not None]
+
+    def get_card(self, card_id):
+        """Récupère une carte par son identifiant."""
+        return self.storage.get(card_id)
+
     def get_card_by_question(self, question):
         """Récupère une carte spécifique par sa question."""
-        for card in self.cards:
-            if card['question'] == question:
-                return card
-        return None
-    
-    def delete_card(self, question):
+        return self.storage.find_by_question(question)
+
+    def delete_card(self, card_id):
         """Supprime une carte."""
-        self.cards = [card for card in self.cards if card['question'] != question]
-        self.save_cards()  # Sauvegarde après la suppression
+        card = self.storage.get(card_id)
+        if card is not None:
+            self.storage.delete(card_id)
+            self._notify('deleted', card)
 
-    def move_card(self, question, new_box):
+    def move_card(self, card_id, new_box):
         """Déplace une carte vers une nouvelle boîte."""
-        for card in self.cards:
-            if card['question'] == question:
-                card['box'] = new_box
-        self.save_cards()  # Sauvegarde après le déplacement
+        card = self.storage.get(card_id)
+        if card is not None:
+            self.storage.move(card_id, new_box)
+            self._notify('moved', card)
 
     def save_cards(self):
-        """Sauvegarde toutes les cartes dans un fichier JSON."""
-        with open(self.file_path, "w") as file:
-            json.dump(self.cards, file, indent=4)
-
+        """Force la sauvegarde complète des cartes."""
+        self.storage.save()
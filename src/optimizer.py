@@ -0,0 +1,357 @@
+"""
+Ajustement des algorithmes de planification à l'historique des révisions, calculé avec NumPy.
+
+Le journal (history.py) est lu d'un bloc en tableau structuré, puis rangé pour un rejeu
+vectorisé : les cartes sont classées de la plus révisée à la moins révisée, et les révisions
+par rang (1re révision de chaque carte, puis 2e, ...). Les cartes qui ont une k-ième révision
+forment ainsi le début du tableau des états : chaque rang est traité en une opération NumPy
+sur des tranches, pour toutes les cartes à la fois, avec les règles écrites une seule fois dans
+algorithms.py.
+
+Pour chaque révision (sauf la première de chaque carte, dont on ignore le délai écoulé), le
+délai prévu par l'algorithme donne une probabilité de s'en souvenir (algorithms.retrievability) ;
+la perte est l'entropie croisée avec les réponses. Ses dérivées par rapport aux paramètres sont
+calculées pendant le même rejeu, en mode direct (nombres duaux, Dual) : chaque valeur porte le
+tableau de ses dérivées partielles. L'ajustement (fit) est un Levenberg-Marquardt sur
+l'information de Fisher, qui converge en une dizaine de rejeux.
+
+Ce module importe NumPy : il n'est chargé que pour ajuster ou changer d'algorithme.
+"""
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from .algorithms import DAY, INTERVAL_DAYS, clamp_box, retrievability
+from .history import RECORD_SIZE, card_key
+
+# Même disposition que history.RECORD ; l'identifiant de carte est lu comme deux entiers de 64 bits
+RECORD_DTYPE = np.dtype([('timestamp', '<f8'), ('card', '<u8', (2,)), ('boxes', 'u1'), ('correct', '?'),
+                         ('category', '<u2'), ('latency', '<f4')])
+assert RECORD_DTYPE.itemsize == RECORD_SIZE
+
+EPSILON = 1e-6  # Probabilités bornées à [EPSILON, 1 - EPSILON] dans la perte
+MAX_ITERATIONS = 30
+TOLERANCE = 1e-4  # Gain relatif de perte sous lequel l'ajustement s'arrête
+
+FitResult = namedtuple("FitResult", "algorithm loss_before loss reviews iterations seconds")
+
+
+class Dual:
+    """
+    Nombre dual vectorisé : `value` (scalaire ou tableau de n valeurs) et `grad`, ses dérivées
+    par rapport aux P paramètres, de forme (P, n), (P, 1), ou 0.0 pour une constante.
+    """
+
+    __slots__ = ('value', 'grad')
+    __array_ufunc__ = None  # tableau * Dual : NumPy laisse la main à Dual.__rmul__
+
+    def __init__(self, value, grad=0.0):
+        self.value = value
+        self.grad = grad
+
+    def __getitem__(self, key):
+        """Tranche des n valeurs (et de leurs dérivées)."""
+        return Dual(self.value[key], self.grad[:, key] if np.ndim(self.grad) == 2 else self.grad)
+
+    def __add__(self, other):
+        return Dual(self.value + value(other), self.grad + grad(other))
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return Dual(self.value - value(other), self.grad - grad(other))
+
+    def __rsub__(self, other):
+        return Dual(other - self.value, -self.grad)
+
+    def __neg__(self):
+        return Dual(-self.value, -self.grad)
+
+    def __mul__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value * other.value, self.grad * other.value + other.grad * self.value)
+        return Dual(self.value * other, self.grad * other)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if isinstance(other, Dual):
+            quotient = self.value / other.value
+            return Dual(quotient, (self.grad - quotient * other.grad) / other.value)
+        return Dual(self.value / other, self.grad / other)
+
+    def __rtruediv__(self, other):
+        quotient = other / self.value
+        return Dual(quotient, -quotient * self.grad / self.value)
+
+    def __pow__(self, exponent):
+        if isinstance(exponent, Dual):
+            return (exponent * self.log()).exp()
+        return Dual(self.value ** exponent, exponent * self.value ** (exponent - 1) * self.grad)
+
+    def exp(self):
+        result = np.exp(self.value)
+        return Dual(result, result * self.grad)
+
+    def log(self):
+        return Dual(np.log(self.value), self.grad / self.value)
+
+
+def value(x):
+    return x.value if isinstance(x, Dual) else x
+
+
+def grad(x):
+    return x.grad if isinstance(x, Dual) else 0.0
+
+
+class VectorOps:
+    """Opérations de algorithms.ScalarOps sur des tableaux NumPy ou des Dual à `size` paramètres."""
+
+    def __init__(self, size=0):
+        self.size = size
+
+    @staticmethod
+    def exp(x):
+        return x.exp() if isinstance(x, Dual) else np.exp(x)
+
+    @staticmethod
+    def where(condition, if_true, if_false):
+        if isinstance(if_true, Dual) or isinstance(if_false, Dual):
+            return Dual(np.where(condition, value(if_true), value(if_false)),
+                        np.where(condition, grad(if_true), grad(if_false)))
+        return np.where(condition, if_true, if_false)
+
+    def minimum(self, a, b):
+        return self.where(value(a) <= value(b), a, b)
+
+    def maximum(self, a, b):
+        return self.where(value(a) >= value(b), a, b)
+
+    def take(self, values, index):
+        if not any(isinstance(x, Dual) for x in values):
+            return np.asarray(values, dtype=np.float64)[index]
+        grads = np.column_stack([np.broadcast_to(grad(x), (self.size, 1))[:, 0] for x in values])
+        return Dual(np.array([value(x) for x in values])[index], grads[:, index])
+
+    def full(self, x, n):
+        """
+        Copie de `x` étendue à n valeurs, modifiable en place (voir assign). Avec des dérivées,
+        un réel devient un Dual : il peut dépendre des paramètres après une révision.
+        """
+        if isinstance(x, Dual) or (self.size and np.asarray(x).dtype.kind == 'f'):
+            return Dual(np.array(np.broadcast_to(value(x), (n,)), dtype=np.float64),
+                        np.array(np.broadcast_to(grad(x), (self.size, n))))
+        return np.array(np.broadcast_to(x, (n,)))
+
+    @staticmethod
+    def copy(x):
+        return Dual(np.copy(x.value), np.copy(x.grad)) if isinstance(x, Dual) else np.copy(x)
+
+    @staticmethod
+    def assign(full, count, part):
+        """Remplace les `count` premières valeurs de `full` par `part`."""
+        if isinstance(full, Dual):
+            full.value[:count] = value(part)
+            full.grad[:, :count] = grad(part)
+        else:
+            full[:count] = part
+
+    def concatenate(self, parts):
+        if not any(isinstance(part, Dual) for part in parts):
+            return np.concatenate([np.broadcast_to(part, np.shape(value(part))) for part in parts])
+        return Dual(np.concatenate([value(part) for part in parts]),
+                    np.concatenate([np.broadcast_to(grad(part), (self.size, len(value(part)))) for part in parts],
+                                   axis=1))
+
+
+class ReviewLog:
+    """
+    Révisions du journal rangées pour le rejeu : `keys` (identifiant de 16 octets de chaque carte,
+    de la plus révisée à la moins révisée) et, par révision, dans l'ordre du rejeu, `correct`,
+    `box_before` et `elapsed` (jours depuis la révision précédente de la carte ; NaN pour la
+    première). Les `sizes[k]` révisions de rang k concernent les cartes 0 à sizes[k] - 1.
+    """
+
+    def __init__(self, records):
+        halves = records['card']
+        # Regroupement par carte, par un tri stable : les révisions d'une carte restent chronologiques
+        by_key = np.argsort(halves[:, 0], kind='stable')
+        keys = halves[by_key]
+        if np.any((keys[1:, 0] == keys[:-1, 0]) & (keys[1:, 1] != keys[:-1, 1])):
+            by_key = np.lexsort((halves[:, 1], halves[:, 0]))  # Identifiants de même début : tri complet
+            keys = halves[by_key]
+        new = np.ones(len(records), dtype=bool)
+        new[1:] = np.any(keys[1:] != keys[:-1], axis=1)
+        group_starts = np.flatnonzero(new)
+        counts = np.diff(np.append(group_starts, len(records)))
+        order = np.argsort(-counts, kind='stable')  # Cartes, de la plus révisée à la moins révisée
+        self.keys = [key.tobytes() for key in keys[group_starts[order]]]
+        counts = counts[order]
+        # Révisions rangées par carte : rang de chacune parmi celles de sa carte
+        rank = np.arange(len(records)) - np.repeat(np.cumsum(counts) - counts, counts)
+        by_card = by_key[np.repeat(group_starts[order], counts) + rank]
+        timestamps = records['timestamp'][by_card]
+        elapsed = np.where(rank > 0, timestamps - np.roll(timestamps, 1), np.nan) / DAY
+        # Ordre du rejeu : la révision de rang k de la carte p va en début du bloc k + p
+        self.sizes = np.bincount(rank)
+        destination = (np.cumsum(self.sizes) - self.sizes)[rank] + np.repeat(np.arange(len(counts)), counts)
+        replay = np.empty(len(records), dtype=np.int64)
+        replay[destination] = by_card
+        self.correct = records['correct'][replay]
+        self.box_before = np.minimum(records['boxes'][replay] >> 4, len(INTERVAL_DAYS) - 1).astype(np.int64)
+        self.elapsed = np.empty(len(records))
+        self.elapsed[destination] = elapsed
+
+    @classmethod
+    def read(cls, history):
+        """Lit tout le journal d'un ReviewHistory."""
+        count = len(history)
+        records = np.fromfile(history.path, dtype=RECORD_DTYPE, count=count) if count else \
+            np.zeros(0, dtype=RECORD_DTYPE)
+        return cls(records)
+
+    def __len__(self):
+        return len(self.correct)
+
+    @property
+    def cards(self):
+        return len(self.keys)
+
+    def blocks(self):
+        """(début, fin) des révisions de chaque rang, dans l'ordre du rejeu."""
+        stop = 0
+        for size in self.sizes.tolist():
+            yield stop, stop + size
+            stop += size
+
+
+def replay(algorithm, log, parameters, ops):
+    """
+    Rejoue le journal avec `algorithm` et les paramètres `parameters` (nombres ou Dual). Renvoie le
+    délai prévu (jours) avant chaque révision sauf la première de chaque carte, dans l'ordre du
+    rejeu, et l'état final de chaque carte (tableaux indexés comme log.keys).
+    """
+    state = tuple(ops.full(x, log.cards) for x in algorithm.initial(log.box_before[:log.cards], parameters, ops))
+    intervals = []
+    for rank, (start, stop) in enumerate(log.blocks()):
+        count = stop - start
+        current = tuple(x[:count] for x in state)
+        box = log.box_before[start:stop]
+        interval = algorithm.interval(current, box, parameters, ops)
+        if rank:
+            intervals.append(ops.copy(interval))  # `current` : vues sur les états, modifiés ensuite
+            elapsed = log.elapsed[start:stop]
+        else:
+            elapsed = interval  # Délai inconnu avant la première révision : supposée faite à temps
+        new = algorithm.update(current, log.correct[start:stop], elapsed, box, parameters, ops)
+        for full, part in zip(state, new):
+            ops.assign(full, count, part)
+    return (ops.concatenate(intervals) if intervals else None), state
+
+
+def recall(algorithm, log, parameters, ops):
+    """Probabilité prévue de se souvenir de la carte à chaque révision (sauf la première de chaque carte)."""
+    intervals, _ = replay(algorithm, log, parameters, ops)
+    return retrievability(log.elapsed[log.cards:], intervals) if intervals is not None else None
+
+
+def cross_entropy(p, answers):
+    return -np.mean(np.where(answers, np.log(p), np.log1p(-p)))
+
+
+def loss(algorithm, log, parameters):
+    """Perte moyenne (entropie croisée entre le souvenir prévu et les réponses) ; None sans révision à prévoir."""
+    with np.errstate(all='ignore'):
+        predicted = recall(algorithm, log, list(parameters), VectorOps())
+        if predicted is None:
+            return None
+        return cross_entropy(np.clip(predicted, EPSILON, 1 - EPSILON), log.correct[log.cards:])
+
+
+def evaluate(algorithm, log, parameters):
+    """
+    Perte moyenne, son gradient et l'information de Fisher par rapport aux paramètres, en un
+    seul rejeu ; None sans révision à prévoir.
+    """
+    size = len(parameters)
+    unit = np.eye(size)
+    weights = [Dual(float(x), unit[:, [index]]) for index, x in enumerate(parameters)]
+    with np.errstate(all='ignore'):
+        predicted = recall(algorithm, log, weights, VectorOps(size))
+        if predicted is None:
+            return None
+        answers = log.correct[log.cards:]
+        p = np.clip(predicted.value, EPSILON, 1 - EPSILON)
+        jacobian = np.broadcast_to(predicted.grad, (size, len(p)))
+        weight = 1 / (p * (1 - p))
+        gradient = jacobian @ ((p - answers) * weight) / len(p)
+        fisher = (jacobian * weight) @ jacobian.T / len(p)
+    return cross_entropy(p, answers), gradient, fisher
+
+
+def fit(algorithm, log, iterations=MAX_ITERATIONS, tolerance=TOLERANCE):
+    """
+    Paramètres de `algorithm` ajustés aux révisions de `log` (Levenberg-Marquardt, dans les bornes
+    BOUNDS). Chaque pas proposé est jugé sur la seule perte, sans dérivées ; les dérivées ne
+    sont recalculées qu'après un pas accepté. L'ajustement s'arrête quand un pas fait gagner
+    moins de `tolerance` (relativement à la perte). Renvoie un FitResult avec l'algorithme
+    ajusté ; sans révision à prévoir, l'algorithme est renvoyé tel quel.
+    """
+    started = time.perf_counter()
+    low, high = np.array(algorithm.BOUNDS, dtype=np.float64).T
+    parameters = np.clip(np.array(algorithm.parameters), low, high)
+    current = evaluate(algorithm, log, parameters)
+    if current is None:
+        return FitResult(algorithm, None, None, len(log), 0, time.perf_counter() - started)
+    loss_before, gradient, fisher = current
+    value = loss_before
+    damping = 1e-3
+    done = 0
+    while done < iterations:
+        done += 1
+        try:
+            step = np.linalg.solve(fisher + damping * np.diag(np.diag(fisher) + 1e-12), gradient)
+        except np.linalg.LinAlgError:
+            break
+        candidate = np.clip(parameters - step, low, high)
+        candidate_loss = loss(algorithm, log, candidate)
+        if candidate_loss is not None and candidate_loss < value:
+            parameters, improvement, value = candidate, value - candidate_loss, candidate_loss
+            if improvement < tolerance * value:
+                break
+            damping = max(damping / 3, 1e-9)
+            value, gradient, fisher = evaluate(algorithm, log, parameters)
+        else:
+            damping *= 10  # Pas refusé : on se rapproche de la descente de gradient
+            if damping > 1e8:
+                break
+    fitted = type(algorithm)(parameters.tolist())
+    return FitResult(fitted, float(loss_before), float(value), len(log), done, time.perf_counter() - started)
+
+
+def reschedule(algorithm, cards, log):
+    """
+    Nouveau champ 'schedule' de chaque carte de `cards` pour `algorithm`, en une passe pour tout
+    le deck : l'état des cartes présentes dans le journal est obtenu en rejouant leurs révisions,
+    les autres partent de l'état initial de leur boîte. None pour les cartes qui suivent
+    simplement les délais des boîtes.
+    """
+    if algorithm.box_intervals:
+        return [None] * len(cards)
+    ops = VectorOps()
+    parameters = algorithm.parameters
+    boxes = np.array([clamp_box(card.box) for card in cards], dtype=np.int64)
+    state = tuple(ops.full(x, len(cards)) for x in algorithm.initial(boxes, parameters, ops))
+    if len(log):
+        with np.errstate(all='ignore'):
+            _, replayed = replay(algorithm, log, parameters, ops)
+        positions = {key: position for position, key in enumerate(log.keys)}
+        rows = np.array([positions.get(card_key(card.id), -1) for card in cards], dtype=np.int64)
+        found = rows >= 0
+        for full, values in zip(state, replayed):
+            full[found] = values[rows[found]]
+    intervals = np.broadcast_to(algorithm.interval(state, boxes, parameters, ops), (len(cards),))
+    rows = zip(*[x.tolist() for x in state]) if state else [()] * len(cards)
+    return [algorithm.schedule(row, interval) for row, interval in zip(rows, intervals.tolist())]
@@ -0,0 +1,519 @@
+"""
+Exécution des commandes dans un bac à sable, pour le mode de comparaison 'execute' (voir
+matching.py) : une réponse qui diffère de la commande attendue est jugée juste si les deux
+commandes, exécutées, écrivent la même chose sur la sortie standard avec le même code de sortie.
+
+Les commandes sont exécutées par des processus ouvriers lancés d'avance (CommandPool), qui
+s'isolent une fois pour toutes au démarrage, avec les espaces de noms de Linux :
+
+- utilisateur : l'utilisateur devient SANDBOX_ID, sans aucun privilège pour les commandes ;
+- réseau : aucune interface active ;
+- processus : les commandes ne voient (/proc) ni ne peuvent signaler que leurs propres processus ;
+- montages : la racine est un système de fichiers en mémoire, en lecture seule, où seuls les
+  dossiers du système (ROOT_DIRECTORIES) sont montés, en lecture seule, avec quelques
+  périphériques (DEVICES). Le dossier personnel, /run (et ses sockets : docker.sock, D-Bus...)
+  et le reste du système de fichiers n'y existent pas ; seul /tmp, vide et borné à SCRATCH_SIZE,
+  est modifiable.
+
+Chaque commande est lancée par `/bin/sh -c` dans /tmp, sans entrée standard, avec un
+environnement minimal, une limite de temps (TIMEOUT) et des limites de ressources
+(resource.setrlimit : temps processeur, mémoire, taille des fichiers, fichiers ouverts) ; ses
+processus restants sont tués et /tmp vidé ensuite. Sans isolation possible (autre système,
+espaces de noms interdits), rien n'est exécuté : la réponse est jugée par la seule comparaison
+du texte.
+
+Les commandes ne sont exécutées qu'à la vérification d'une réponse refusée par la comparaison du
+texte, jamais d'avance : celles d'un deck importé ne s'exécutent pas à l'ouverture d'une
+révision. La sortie de la commande attendue est gardée, par empreinte de la commande. Les
+vérifications sont asynchrones (concurrent.futures.Future), pour que la fenêtre de révision ne
+se fige pas.
+
+Ce fichier est aussi le programme des processus ouvriers (python sandbox.py) : il n'importe
+que la bibliothèque standard.
+"""
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT = 2.0  # Secondes, par commande
+GRACE = 5.0  # Délai supplémentaire avant d'abandonner un processus ouvrier qui ne répond plus
+MAX_OUTPUT = 64 * 1024  # Octets de sortie comparés
+MEMORY = 512 * 1024 * 1024  # Espace d'adressage, en octets
+FILE_SIZE = 16 * 1024 * 1024  # Taille maximale d'un fichier écrit (sortie comprise)
+SCRATCH_SIZE = 64 * 1024 * 1024  # Taille de /tmp, seul dossier modifiable
+OPEN_FILES = 64
+POOL_SIZE = 2  # Processus ouvriers
+CACHE_SIZE = 1024  # Sorties de commandes attendues gardées
+SANDBOX_ID = 1000  # Utilisateur et groupe des commandes (jamais 0 : elles n'ont aucun privilège)
+SCRATCH = "/tmp"  # Dossier de travail des commandes, vidé après chacune
+ENVIRONMENT = {'PATH': "/usr/local/bin:/usr/bin:/bin", 'LANG': "C.UTF-8", 'LC_ALL': "C.UTF-8", 'TZ': "UTC",
+               'HOME': SCRATCH, 'TMPDIR': SCRATCH}
+# Dossiers du système visibles (en lecture seule) ; les liens symboliques (/bin -> usr/bin) sont recopiés
+ROOT_DIRECTORIES = ("usr", "bin", "sbin", "lib", "lib32", "lib64", "libx32", "etc", "opt")
+DEVICES = ("null", "zero", "full", "random", "urandom")
+DEVICE_LINKS = {'fd': "/proc/self/fd", 'stdin': "/proc/self/fd/0", 'stdout': "/proc/self/fd/1",
+                'stderr': "/proc/self/fd/2"}
+
+# Espaces de noms de Linux (sched.h)
+CLONE_NEWNS = 0x00020000
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWPID = 0x20000000
+CLONE_NEWNET = 0x40000000
+# Options de mount (sys/mount.h) et de prctl (sys/prctl.h)
+MS_RDONLY = 0x1
+MS_NOSUID = 0x2
+MS_NODEV = 0x4
+MS_NOEXEC = 0x8
+MS_REMOUNT = 0x20
+MS_BIND = 0x1000
+MS_REC = 0x4000
+MS_PRIVATE = 0x40000
+PR_SET_PDEATHSIG = 1
+PR_SET_NO_NEW_PRIVS = 38
+MOUNT_OPTIONS = {'nosuid': MS_NOSUID, 'nodev': MS_NODEV, 'noexec': MS_NOEXEC}  # À conserver au remontage
+OCTAL_ESCAPE = re.compile(r"\\([0-7]{3})")
+
+# Résultat d'une commande : code de sortie, sortie standard (tronquée à MAX_OUTPUT), délai dépassé
+Outcome = namedtuple('Outcome', 'exit_code stdout timed_out')
+
+
+class SandboxError(Exception):
+    """Exécution impossible : bac à sable indisponible ou processus ouvrier arrêté."""
+
+
+def equivalent(expected, answer):
+    """Vrai si deux exécutions ont le même code de sortie et la même sortie, aux espaces de fin de ligne près."""
+    if expected.timed_out or answer.timed_out:
+        return False
+    return expected.exit_code == answer.exit_code and normalize(expected.stdout) == normalize(answer.stdout)
+
+
+def normalize(output):
+    return "\n".join(line.rstrip() for line in output.rstrip().splitlines())
+
+
+def command_hash(command):
+    return hashlib.sha256(command.strip().encode("utf-8")).hexdigest()
+
+
+# --- Processus ouvrier -------------------------------------------------------------
+
+
+def load_libc():
+    import ctypes
+    libc = ctypes.CDLL(None, use_errno=True)
+    libc.mount.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_ulong, ctypes.c_char_p]
+    libc.prctl.argtypes = [ctypes.c_int, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_ulong]
+    return libc
+
+
+def isolate(libc):
+    """
+    Place le processus dans de nouveaux espaces de noms utilisateur, réseau, processus et
+    montages ; ceux qu'il lancera ensuite y seront (le premier devient le processus 1 de son
+    espace de noms de processus, voir serve). Renvoie False si le système l'interdit.
+    """
+    uid, gid = os.getuid(), os.getgid()
+    if libc.unshare(CLONE_NEWUSER | CLONE_NEWNET | CLONE_NEWPID | CLONE_NEWNS) != 0:
+        return False
+    try:  # Identifiants visibles indispensables pour créer des fichiers (/tmp) et monter
+        for name, content in (("setgroups", "deny"), ("uid_map", f"{SANDBOX_ID} {uid} 1"),
+                              ("gid_map", f"{SANDBOX_ID} {gid} 1")):
+            with open(f"/proc/self/{name}", "w") as file:
+                file.write(content)
+    except OSError:
+        return False
+    return True
+
+
+def confine(libc, root="/tmp"):
+    """
+    Construit la racine des commandes dans un système de fichiers en mémoire monté sur `root`
+    (dans le nouvel espace de noms de montages : le vrai `root` n'est pas touché), puis s'y
+    enferme (chroot). OSError si un montage échoue.
+    """
+    _mount(libc, None, "/", None, MS_REC | MS_PRIVATE)  # Rien ne se propage vers le système
+    _mount(libc, "tmpfs", root, "tmpfs", MS_NOSUID | MS_NODEV, "size=1m,mode=755")
+    for name in ROOT_DIRECTORIES:
+        source, target = "/" + name, os.path.join(root, name)
+        if os.path.islink(source):
+            os.symlink(os.readlink(source), target)
+        elif os.path.isdir(source):
+            os.mkdir(target)
+            _mount(libc, source, target, None, MS_BIND | MS_REC)
+            _read_only(libc, target, MS_NOSUID | MS_NODEV)
+    os.mkdir(os.path.join(root, "dev"))
+    for name in DEVICES:
+        source, target = "/dev/" + name, os.path.join(root, "dev", name)
+        if os.path.exists(source):
+            open(target, "w").close()
+            _mount(libc, source, target, None, MS_BIND)
+            _read_only(libc, target, MS_NOSUID)
+    for name, link in DEVICE_LINKS.items():
+        os.symlink(link, os.path.join(root, "dev", name))
+    os.mkdir(os.path.join(root, "proc"))
+    try:  # /proc de l'espace de noms de processus ; sans lui (conteneur qui l'interdit), /proc reste vide
+        _mount(libc, "proc", os.path.join(root, "proc"), "proc", MS_NOSUID | MS_NODEV | MS_NOEXEC)
+    except OSError:
+        pass
+    scratch = os.path.join(root, SCRATCH.lstrip("/"))
+    os.mkdir(scratch)
+    _mount(libc, "tmpfs", scratch, "tmpfs", MS_NOSUID | MS_NODEV, f"size={SCRATCH_SIZE},mode=1777")
+    _mount(libc, None, root, None, MS_REMOUNT | MS_BIND | MS_RDONLY | MS_NOSUID | MS_NODEV)
+    os.chroot(root)
+    os.chdir("/")
+    # Aucun programme setuid ne rendra de privilège aux commandes
+    if libc.prctl(PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0) != 0:
+        raise OSError("prctl(PR_SET_NO_NEW_PRIVS) impossible")
+
+
+def _mount(libc, source, target, fstype, flags, data=None):
+    encode = lambda text: text.encode() if text is not None else None
+    if libc.mount(encode(source), encode(target), encode(fstype), flags, encode(data)) != 0:
+        import ctypes
+        error = ctypes.get_errno()
+        raise OSError(error, f"mount {target} : {os.strerror(error)}")
+
+
+def _read_only(libc, target, flags):
+    """
+    Remonte en lecture seule `target` et les montages situés dessous (/etc/hosts d'un
+    conteneur...), en gardant les options qu'un espace de noms utilisateur ne peut pas retirer.
+    """
+    prefix = target.rstrip("/") + "/"
+    with open("/proc/self/mountinfo", encoding="utf-8") as file:
+        mounts = [line.split() for line in file]
+    for fields in mounts:
+        mount_point = _unescape(fields[4])
+        if mount_point != target and not mount_point.startswith(prefix):
+            continue
+        kept = sum(MOUNT_OPTIONS.get(option, 0) for option in fields[5].split(","))
+        _mount(libc, None, mount_point, None, MS_REMOUNT | MS_BIND | MS_RDONLY | flags | kept)
+
+
+def _unescape(path):
+    """Chemin de /proc/self/mountinfo, où espaces et barres obliques inverses sont écrits en octal (\\040)."""
+    return OCTAL_ESCAPE.sub(lambda match: chr(int(match.group(1), 8)), path)
+
+
+def limit_resources(timeout):
+    """Limites du processus de la commande, posées entre fork et exec (preexec_fn)."""
+    import resource
+    cpu = int(timeout) + 1
+    for limit, value in ((resource.RLIMIT_CPU, cpu), (resource.RLIMIT_AS, MEMORY),
+                         (resource.RLIMIT_FSIZE, FILE_SIZE), (resource.RLIMIT_NOFILE, OPEN_FILES),
+                         (resource.RLIMIT_CORE, 0)):
+        _, hard = resource.getrlimit(limit)
+        if hard != resource.RLIM_INFINITY:
+            value = min(value, hard)
+        resource.setrlimit(limit, (value, hard))
+
+
+def execute(command, timeout=TIMEOUT):
+    """
+    Exécute une commande dans SCRATCH et renvoie son Outcome. La sortie est écrite dans un
+    fichier anonyme (sans nom, invisible de la commande) : sa taille est bornée par FILE_SIZE
+    sans qu'aucun tampon ne grossisse dans ce processus. Ne s'appelle qu'une fois confiné.
+    """
+    try:
+        with tempfile.TemporaryFile(dir=SCRATCH) as output:
+            process = subprocess.Popen(
+                ["/bin/sh", "-c", command], cwd=SCRATCH, stdin=subprocess.DEVNULL, stdout=output,
+                stderr=subprocess.DEVNULL, env=ENVIRONMENT, start_new_session=True,
+                preexec_fn=lambda: limit_resources(timeout))
+            timed_out = False
+            try:
+                exit_code = process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                timed_out = True
+                exit_code = -signal.SIGKILL
+            _kill_all(process.pid)  # La commande et les processus qu'elle a laissés en arrière-plan
+            output.seek(0)
+            stdout = output.read(MAX_OUTPUT).decode("utf-8", "replace")
+        return Outcome(exit_code, stdout, timed_out)
+    finally:
+        _clear(SCRATCH)
+
+
+def _kill_all(pid):
+    """
+    Tue tous les processus de l'espace de noms de processus, sauf celui-ci (son processus 1),
+    et recueille leur code de sortie ; hors d'un tel espace, seulement le groupe de `pid`.
+    """
+    if os.getpid() != 1:
+        _kill_group(pid)
+        return
+    try:
+        os.kill(-1, signal.SIGKILL)
+    except ProcessLookupError:
+        pass  # Aucun autre processus
+    while True:
+        try:
+            os.waitpid(-1, 0)
+        except ChildProcessError:
+            break
+
+
+def _kill_group(pid):
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _clear(directory):
+    for entry in os.scandir(directory):
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path, ignore_errors=True)
+        else:
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                pass
+
+
+def serve(stdin=sys.stdin, stdout=sys.stdout):
+    """
+    Programme d'un processus ouvrier : s'isole (isolate), puis lance un processus qui devient
+    le processus 1 du nouvel espace de noms de processus, s'enferme (confine), annonce
+    {"isolated": ...} et répond à chaque ligne {"command", "timeout"} par l'Outcome de la
+    commande. Sans isolation, il s'arrête après l'annonce. Ce processus-ci attend la fin du
+    processus 1, qui meurt avec lui (PR_SET_PDEATHSIG).
+    """
+    import resource  # Chargés d'avance : une fois enfermé, les modules de Python sont hors de portée
+    try:
+        libc = load_libc()
+        isolated = isolate(libc)
+    except (OSError, AttributeError):
+        isolated = False
+    if isolated:
+        pid = os.fork()
+        if pid:
+            _, status = os.waitpid(pid, 0)
+            os._exit(os.waitstatus_to_exitcode(status))
+        # Processus 1 : seuls les signaux qu'il intercepte lui parviennent des commandes ; SIGINT
+        # (KeyboardInterrupt) est ignoré, mais retrouve son effet par défaut dans les commandes
+        signal.signal(signal.SIGINT, lambda *_: None)
+        try:
+            libc.prctl(PR_SET_PDEATHSIG, signal.SIGKILL, 0, 0, 0)  # Processus ouvrier tué : tout s'arrête
+            confine(libc)
+        except OSError as error:
+            stdout.write(json.dumps({'isolated': False, 'error': str(error)}) + "\n")
+            stdout.flush()
+            os._exit(1)
+    stdout.write(json.dumps({'isolated': isolated}) + "\n")
+    stdout.flush()
+    if not isolated:
+        return
+    for line in stdin:
+        request = json.loads(line)
+        try:
+            outcome = execute(request['command'], request.get('timeout', TIMEOUT))
+            response = outcome._asdict()
+        except OSError as error:
+            response = {'error': str(error)}
+        stdout.write(json.dumps(response) + "\n")
+        stdout.flush()
+    os._exit(0)
+
+
+# --- Côté application --------------------------------------------------------------
+
+
+class Worker:
+    """Processus ouvrier, lancé et isolé une fois, qui exécute les commandes une par une."""
+
+    def __init__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, "-I", os.path.abspath(__file__)], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, text=True, encoding="utf-8", bufsize=1)
+        hello = self.process.stdout.readline()
+        if not hello:
+            self.close()
+            raise SandboxError("Le processus d'exécution s'est arrêté au démarrage")
+        hello = json.loads(hello)
+        if not hello['isolated']:
+            self.close()
+            detail = f" ({hello['error']})" if 'error' in hello else ""
+            raise SandboxError(f"Isolation impossible{detail} : les commandes ne sont pas exécutées")
+
+    def run(self, command, timeout):
+        # Garde-fou : un processus ouvrier bloqué est tué, sa lecture renvoie alors une fin de fichier
+        guard = threading.Timer(timeout + GRACE, self.process.kill)
+        guard.start()
+        try:
+            self.process.stdin.write(json.dumps({'command': command, 'timeout': timeout}) + "\n")
+            self.process.stdin.flush()
+            line = self.process.stdout.readline()
+        except (OSError, ValueError):
+            line = ""
+        finally:
+            guard.cancel()
+        if not line:
+            raise SandboxError("Le processus d'exécution s'est arrêté")
+        response = json.loads(line)
+        if 'error' in response:
+            raise SandboxError(response['error'])
+        return Outcome(**response)
+
+    @property
+    def alive(self):
+        return self.process.poll() is None
+
+    def close(self):
+        try:
+            self.process.stdin.close()  # Fin de l'entrée : le processus ouvrier s'arrête
+            self.process.wait(1)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+
+
+class CommandPool:
+    """
+    Processus ouvriers et sorties des commandes attendues. Les processus sont lancés en
+    arrière-plan dès start() (ou à la première commande), chacun servi par un thread qui prend
+    les commandes dans une file commune ; un processus arrêté est relancé à la commande suivante.
+    La file ne reçoit que les deux commandes de chaque réponse à vérifier (check), exécutées en
+    même temps par deux processus : rien n'est exécuté d'avance, une vérification n'attend que
+    celles des réponses précédentes.
+    """
+
+    def __init__(self, size=POOL_SIZE, timeout=TIMEOUT, cache_size=CACHE_SIZE):
+        self.size = size
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.error = None  # Dernière SandboxError
+        self.unavailable = False  # Aucun processus ouvrier n'a pu démarrer : plus rien n'est exécuté
+        self._queue = queue.SimpleQueue()  # (commande, Future), None pour arrêter un thread
+        self._threads = []
+        self._lock = threading.Lock()
+        self._references = OrderedDict()  # Empreinte de la commande attendue -> Future de son Outcome
+
+    def start(self):
+        """Lance les processus ouvriers, en arrière-plan : ils sont prêts avant la première commande."""
+        with self._lock:
+            if self._threads:
+                return
+            for number in range(self.size):
+                thread = threading.Thread(target=self._serve, name=f"leitner-sandbox-{number}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def run(self, command):
+        """Exécute une commande ; renvoie un Future de son Outcome (SandboxError en cas d'échec)."""
+        future = Future()
+        if self.unavailable:
+            future.set_exception(self.error)
+            return future
+        self.start()
+        self._queue.put((command, future))
+        return future
+
+    def reference(self, command):
+        """Outcome de la commande attendue d'une carte, exécutée une seule fois tant qu'elle est gardée."""
+        key = command_hash(command)
+        with self._lock:
+            future = self._references.get(key)
+            if future is not None and not (future.done() and future.exception() is not None):
+                self._references.move_to_end(key)
+                return future
+        future = self.run(command)
+        with self._lock:
+            self._references[key] = future
+            while len(self._references) > self.cache_size:
+                self._references.popitem(last=False)
+        return future
+
+    def clear(self):
+        """Oublie les sorties gardées des commandes attendues."""
+        with self._lock:
+            self._references.clear()
+
+    def check(self, expected, answer):
+        """
+        Future du verdict : vrai si `answer` et `expected` sont équivalentes à l'exécution
+        (voir equivalent). Faux si l'une des deux n'a pas pu être exécutée ; l'erreur est
+        journalisée et gardée dans `error`.
+        """
+        result = Future()
+        futures = (self.reference(expected), self.run(answer))
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            try:
+                result.set_result(equivalent(futures[0].result(), futures[1].result()))
+            except SandboxError as error:
+                if self.error is not error:
+                    logger.warning("Réponse non exécutée : %s", error)
+                self.error = error
+                result.set_result(False)
+
+        for future in futures:
+            future.add_done_callback(done)
+        return result
+
+    def close(self):
+        """Arrête les threads et les processus ouvriers ; les commandes en attente échouent."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join(self.timeout + GRACE)
+
+    def _serve(self):
+        worker = self._start_worker()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                command, future = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                if worker is None or not worker.alive:
+                    worker = self._start_worker()  # Premier lancement échoué, ou arrêté par le garde-fou
+                    if worker is None:
+                        future.set_exception(self.error)
+                        continue
+                try:
+                    future.set_result(worker.run(command, self.timeout))
+                except SandboxError as error:
+                    future.set_exception(error)
+                except Exception as error:
+                    logger.exception("Échec de l'exécution d'une commande")
+                    future.set_exception(SandboxError(str(error)))
+        finally:
+            if worker is not None:
+                worker.close()
+
+    def _start_worker(self):
+        try:
+            return Worker()
+        except (SandboxError, OSError, ValueError) as error:
+            self.error = error if isinstance(error, SandboxError) else SandboxError(str(error))
+            self.unavailable = True
+            return None
+
+
+if __name__ == "__main__":
+    serve()
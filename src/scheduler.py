@@ -0,0 +1,159 @@
+import heapq
+import time
+from datetime import timedelta
+
+from .card import Card, to_epoch
+
+# Délais de révision en fonction de la boîte (en minutes, jours, semaines, mois)
+REVISION_INTERVALS = [
+    timedelta(minutes=10),   # Boîte 1 : 10 minutes
+    timedelta(days=1),       # Boîte 2 : 1 jour
+    timedelta(weeks=1),      # Boîte 3 : 1 semaine
+    timedelta(weeks=4),      # Boîte 4 : 1 mois (approximé à 4 semaines)
+    timedelta(weeks=24)      # Boîte 5 : 6 mois (approximé à 24 semaines)
+]
+
+# Mêmes délais en secondes, pour calculer les échéances directement en epoch ; table partagée
+# par le planificateur, la fenêtre de révision et la prévision (forecast.INTERVALS, en NumPy)
+INTERVAL_SECONDS = [interval.total_seconds() for interval in REVISION_INTERVALS]
+
+ALL = "All"  # Catégorie spéciale regroupant toutes les cartes d'une boîte
+
+
+def next_due_timestamp(card):
+    """
+    Calcule l'échéance (epoch) d'une carte à partir de sa dernière révision et de sa boîte, ou du
+    délai choisi par l'algorithme de planification ('schedule', voir algorithms.py).
+    """
+    if isinstance(card, Card):
+        revised_at, box = card.revised_at, card.box  # Déjà en epoch : pas d'analyse de date
+        schedule = card.extra and card.extra.get('schedule')
+    else:
+        revised_at, box = to_epoch(card.get('last_revision')), card.get('box')
+        schedule = card.get('schedule')
+    if revised_at is None:
+        return None
+    if schedule:
+        return revised_at + schedule['interval']
+    return revised_at + INTERVAL_SECONDS[min(max(int(box or 0), 0), len(INTERVAL_SECONDS) - 1)]
+
+
+class ReviewScheduler:
+    """
+    File de priorité des échéances de révision, par (catégorie, boîte).
+
+    Chaque carte est indexée avec son échéance précalculée dans un tas par (catégorie, boîte)
+    et dans celui de la catégorie 'All'. Les entrées périmées (carte modifiée ou supprimée)
+    sont ignorées à la lecture et purgées lorsque le tas en contient trop.
+    """
+
+    def __init__(self):
+        self._entries = {}  # id -> (catégorie, boîte, échéance, numéro d'entrée)
+        self._heaps = {}  # (catégorie, boîte) -> [(échéance, numéro d'entrée, id)]
+        self._counts = {}  # (catégorie, boîte) -> nombre de cartes
+        self._stale = {}  # (catégorie, boîte) -> nombre d'entrées périmées dans le tas
+        self._sequence = 0
+
+    def rebuild(self, cards):
+        """Reconstruit toutes les files à partir d'une liste de cartes."""
+        self._entries.clear()
+        self._heaps.clear()
+        self._counts.clear()
+        self._stale.clear()
+        for card in cards:
+            self._entries[card['id']] = entry = self._entry_for(card)
+            for key in self._keys(entry):
+                self._heaps.setdefault(key, []).append((entry[2], entry[3], card['id']))
+                self._counts[key] = self._counts.get(key, 0) + 1
+        for heap in self._heaps.values():
+            heapq.heapify(heap)
+
+    def _entry_for(self, card):
+        self._sequence += 1  # Distingue une entrée de celles, périmées, laissées par la même carte
+        return self._position(card) + (self._sequence,)
+
+    def _position(self, card):
+        due = next_due_timestamp(card)
+        return (card.category, card.box, due if due is not None else 0.0)
+
+    def _keys(self, entry):
+        category, box = entry[0], entry[1]
+        if category == ALL:
+            return ((ALL, box),)
+        return ((category, box), (ALL, box))
+
+    def on_change(self, event, card):
+        """Répercute une modification du deck (voir LeitnerService.add_listener)."""
+        if event == 'deleted':
+            self.remove(card['id'])
+        else:
+            self.track(card)
+
+    def track(self, card):
+        """Ajoute une carte ou met à jour son échéance."""
+        previous = self._entries.get(card['id'])
+        if previous is not None:
+            if previous[:3] == self._position(card):
+                return
+            self.remove(card['id'])
+        self._entries[card['id']] = entry = self._entry_for(card)
+        for key in self._keys(entry):
+            heapq.heappush(self._heaps.setdefault(key, []), (entry[2], entry[3], card['id']))
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def remove(self, card_id):
+        previous = self._entries.pop(card_id, None)
+        if previous is not None:
+            self._discard(previous)
+
+    def _discard(self, entry):
+        """Marque comme périmée l'entrée d'une carte dans ses tas."""
+        for key in self._keys(entry):
+            self._counts[key] -= 1
+            self._stale[key] = self._stale.get(key, 0) + 1
+            if self._stale[key] > self._counts[key]:
+                self._purge(key)
+
+    def _is_live(self, item):
+        entry = self._entries.get(item[2])
+        return entry is not None and entry[3] == item[1]
+
+    def _purge(self, key):
+        heap = [item for item in self._heaps.get(key, []) if self._is_live(item)]
+        heapq.heapify(heap)
+        self._heaps[key] = heap
+        self._stale[key] = 0
+
+    def count(self, category, box):
+        """Nombre de cartes dans une boîte pour une catégorie (ou 'All')."""
+        return self._counts.get((category, box), 0)
+
+    def next_due(self, category, box):
+        """Échéance la plus proche (epoch) dans une boîte, ou None si elle est vide."""
+        key = (category, box)
+        heap = self._heaps.get(key)
+        while heap and not self._is_live(heap[0]):
+            heapq.heappop(heap)
+            self._stale[key] -= 1
+        return heap[0][0] if heap else None
+
+    def due_cards(self, category, box, now=None, limit=None):
+        """
+        Identifiants des cartes dues à l'instant `now`, de la plus ancienne échéance à la plus récente.
+        Le tas est parcouru sans être modifié : seules les entrées échues sont visitées.
+        """
+        now = time.time() if now is None else now
+        key = (category, box)
+        heap = self._heaps.get(key, [])
+        due = []
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier and (limit is None or len(due) < limit):
+            item, index = heapq.heappop(frontier)
+            if item[0] > now:
+                break  # Les descendants d'une entrée non échue ne le sont pas non plus
+            if self._is_live(item):
+                due.append(item[2])
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+        return due
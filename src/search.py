@@ -0,0 +1,165 @@
+from collections import defaultdict
+from itertools import count, islice
+
+def trigrams(text):
+    """Ensemble des trigrammes d'un texte déjà normalisé."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """
+    Index de recherche plein texte sur la question et la commande des cartes.
+
+    Chaque carte est indexée par les trigrammes de son texte en minuscules ; une requête
+    intersecte les listes de trigrammes (et l'ensemble de la catégorie demandée) puis vérifie
+    la sous-chaîne sur les seuls candidats. Une requête qui prolonge la précédente
+    (un caractère de plus) ne vérifie que les résultats précédents.
+
+    La construction se fait par tranches (build_step) pour ne pas bloquer l'interface ;
+    tant qu'elle n'est pas terminée, les requêtes parcourent le deck. Les modifications
+    sont répercutées au fil de l'eau, y compris pendant la construction.
+    """
+
+    BUILD_BATCH = 2000  # Cartes indexées par appel à build_step
+
+    def __init__(self, load_cards):
+        self._load_cards = load_cards  # Fonction renvoyant toutes les cartes, appelée à la construction
+        self.reset()
+
+    def reset(self):
+        """Vide l'index ; il devra être reconstruit."""
+        self._built = False
+        self._pending = None  # Itérateur des cartes restant à indexer
+        self._removed = set()  # Cartes supprimées pendant la construction
+        self._texts = {}  # id -> texte normalisé
+        self._categories = {}  # id -> catégorie
+        self._order = {}  # id -> rang dans le deck, pour rendre les résultats dans l'ordre
+        self._postings = defaultdict(set)  # trigramme -> {id}
+        self._by_category = defaultdict(set)  # catégorie -> {id}
+        self._counter = count()
+        self._last_query = None  # (texte, catégorie, ids) de la dernière requête
+
+    @property
+    def built(self):
+        return self._built
+
+    @staticmethod
+    def normalize(card):
+        # Le séparateur empêche une correspondance à cheval sur la question et la commande
+        return card['question'].lower() + "\x00" + card.get('command', '').lower()
+
+    def build_step(self, limit=BUILD_BATCH):
+        """Indexe au plus `limit` cartes ; renvoie True lorsque l'index est complet."""
+        if self._built:
+            return True
+        if self._pending is None:
+            cards = list(self._load_cards())
+            self._order = {card['id']: rank for rank, card in enumerate(cards)}
+            self._counter = count(len(cards))
+            self._pending = iter(cards)
+
+        batch = list(islice(self._pending, limit))
+        for card in batch:
+            # Une carte déjà indexée ou supprimée entre-temps a été traitée par on_change
+            if card['id'] not in self._texts and card['id'] not in self._removed:
+                self._add(card)
+        if len(batch) < limit:
+            self._built = True
+            self._pending = None
+            self._removed.clear()
+        return self._built
+
+    def ensure_built(self):
+        """Termine la construction de l'index d'un seul coup."""
+        while not self.build_step():
+            pass
+
+    def on_change(self, event, card):
+        """Répercute une modification du deck (voir LeitnerService.add_listener)."""
+        if not self._built and self._pending is None:
+            return  # Construction pas encore commencée : rien à tenir à jour
+        self._last_query = None
+        card_id = card['id']
+        if event == 'deleted':
+            self._remove(card_id)
+            if not self._built:
+                self._removed.add(card_id)
+        elif card_id not in self._texts:
+            self._add(card)
+        elif self._texts[card_id] != self.normalize(card) or \
+                self._categories[card_id] != card.get('category'):
+            self._remove(card_id, keep_order=True)
+            self._add(card)
+
+    def _add(self, card):
+        card_id = card['id']
+        text = self.normalize(card)
+        category = card.get('category')
+        self._texts[card_id] = text
+        self._categories[card_id] = category
+        if card_id not in self._order:
+            self._order[card_id] = next(self._counter)
+        postings = self._postings
+        for gram in trigrams(text):
+            postings[gram].add(card_id)
+        self._by_category[category].add(card_id)
+
+    def _remove(self, card_id, keep_order=False):
+        text = self._texts.pop(card_id, None)
+        if text is None:
+            return
+        for gram in trigrams(text):
+            postings = self._postings[gram]
+            postings.discard(card_id)
+            if not postings:
+                del self._postings[gram]
+        category = self._categories.pop(card_id)
+        self._by_category[category].discard(card_id)
+        if not self._by_category[category]:
+            del self._by_category[category]
+        if not keep_order:
+            self._order.pop(card_id, None)
+
+    def query(self, text, category=None):
+        """
+        Identifiants des cartes dont la question ou la commande contient `text`
+        (insensible à la casse), limités à `category` si elle est fournie, dans l'ordre du deck.
+        """
+        text = text.lower()
+        if not self._built:
+            return self._scan(text, category)
+
+        last = self._last_query
+        if last is not None and last[1] == category and last[0] in text:
+            candidates = last[2]  # Requête affinée : on repart des résultats précédents
+        else:
+            candidates = self._candidates(text, category)
+
+        if text:
+            texts = self._texts
+            result = {card_id for card_id in candidates if text in texts[card_id]}
+        else:
+            result = set(candidates)
+        self._last_query = (text, category, result)
+        return sorted(result, key=self._order.__getitem__)
+
+    def _scan(self, text, category):
+        """Recherche linéaire, utilisée tant que l'index n'est pas construit."""
+        normalize = self.normalize
+        return [card['id'] for card in self._load_cards()
+                if (category is None or card.get('category') == category) and text in normalize(card)]
+
+    def _candidates(self, text, category):
+        sets = []
+        if category is not None:
+            sets.append(self._by_category.get(category, set()))
+        if len(text) >= 3:
+            for gram in trigrams(text):
+                postings = self._postings.get(gram)
+                if not postings:
+                    return set()
+                sets.append(postings)
+        if not sets:
+            return self._texts.keys()
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:])
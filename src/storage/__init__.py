@@ -0,0 +1,24 @@
+import os
+
+from .base import StorageBackend, new_card_id
+from .binary_storage import BinaryStorage, DeckInUseError
+from .json_storage import JsonStorage
+from .sharded_storage import ShardedStorage
+from .sqlite_storage import SqliteStorage
+
+
+def make_storage(kind=None):
+    """
+    Construit le moteur de stockage demandé ('json', 'sqlite', 'binary' ou 'sharded').
+    Par défaut, le choix est lu dans la variable d'environnement LEITNER_STORAGE.
+    """
+    kind = kind or os.environ.get("LEITNER_STORAGE", "json")
+    if kind == "sqlite":
+        return SqliteStorage()
+    if kind == "json":
+        return JsonStorage()
+    if kind == "binary":
+        return BinaryStorage()
+    if kind == "sharded":
+        return ShardedStorage()
+    raise ValueError(f"Moteur de stockage inconnu : {kind}")
@@ -0,0 +1,169 @@
+import os
+from collections import namedtuple
+
+# Modification locale perdue face à celle d'une autre instance : `local` est la carte telle que
+# modifiée ici (None si elle y avait été supprimée), `remote` celle qui a été gardée (None si
+# elle a été supprimée ailleurs). Les cartes sont des dictionnaires (format du deck).
+Conflict = namedtuple("Conflict", "card_id local remote")
+
+
+def new_card_id():
+    """Génère l'identifiant stable d'une carte (indépendant de sa question) : 128 bits aléatoires en hexadécimal."""
+    return os.urandom(16).hex()  # Même format que uuid4().hex, sans le coût de construction d'un UUID
+
+
+class StorageBackend:
+    """
+    Interface commune des moteurs de stockage utilisés par LeitnerService.
+
+    Les cartes sont des Card (voir src/card.py), identifiées par leur clé 'id' ; une carte
+    renvoyée par le moteur peut être modifiée en place puis passée à update().
+    """
+
+    LOAD_BATCH = 2000  # Cartes par lot lors d'un chargement progressif
+    path = None  # Fichier principal du deck
+
+    def sidecar_path(self, name):
+        """Chemin d'un fichier annexe (registre des catégories...) rangé dans le dossier du deck."""
+        return os.path.join(os.path.dirname(self.path), name) if self.path else name
+
+    def load(self):
+        """Ouvre le stockage et charge (ou indexe) les cartes, en attribuant un id aux cartes qui n'en ont pas."""
+        self.begin_load()
+        for cards, _, _ in self.read_batches():
+            self.load_batch(cards)
+        self.finish_load()
+
+    # Chargement progressif : begin_load(), puis load_batch() pour chaque lot produit par
+    # read_batches() (qui peut tourner dans un autre thread), puis finish_load().
+
+    def begin_load(self):
+        """Ouvre le stockage, vide ; les cartes arrivent ensuite par lots."""
+        raise NotImplementedError
+
+    def read_batches(self, batch_size=LOAD_BATCH):
+        """
+        Générateur des cartes stockées, par lots : (cartes, avancement, total), l'avancement
+        étant exprimé dans une unité propre au moteur (octets, lignes). Ne modifie pas le
+        stockage : peut être parcouru dans un thread de chargement.
+        """
+        raise NotImplementedError
+
+    def load_batch(self, cards):
+        """Intègre un lot de cartes lues ; renvoie celles qui ne l'étaient pas déjà."""
+        raise NotImplementedError
+
+    def finish_load(self):
+        """
+        Termine le chargement ; renvoie les modifications appliquées après coup
+        (journal rejoué) sous forme de paires (événement, carte).
+        """
+        return []
+
+    def all_cards(self):
+        """Retourne toutes les cartes."""
+        raise NotImplementedError
+
+    def get(self, card_id):
+        """Retourne la carte portant cet identifiant, ou None."""
+        raise NotImplementedError
+
+    def find_by_question(self, question):
+        """Retourne la première carte portant cette question, ou None."""
+        raise NotImplementedError
+
+    def cards_by_box_and_category(self, box, category):
+        """Retourne les cartes d'une boîte, filtrées par catégorie sauf si elle vaut 'All'."""
+        raise NotImplementedError
+
+    def categories(self):
+        """Retourne les catégories distinctes présentes dans les cartes."""
+        raise NotImplementedError
+
+    def add(self, card):
+        raise NotImplementedError
+
+    def add_many(self, cards):
+        """Ajoute un lot de cartes, enregistré en une seule écriture si le moteur le permet."""
+        for card in cards:
+            self.add(card)
+
+    def update(self, card):
+        raise NotImplementedError
+
+    # Transactions : entre begin_batch() et commit_batch(), les modifications sont appliquées en
+    # mémoire mais enregistrées d'un bloc au commit ; rollback_batch() les annule toutes. Une carte
+    # reprend l'état qu'elle avait à sa première modification dans la transaction.
+
+    def begin_batch(self):
+        raise NotImplementedError
+
+    def commit_batch(self):
+        raise NotImplementedError
+
+    def rollback_batch(self):
+        raise NotImplementedError
+
+    def update_many(self, cards):
+        """Met à jour un lot de cartes, enregistré en une seule écriture si le moteur le permet."""
+        for card in cards:
+            self.update(card)
+
+    def delete(self, card_id):
+        raise NotImplementedError
+
+    def move(self, card_id, new_box):
+        raise NotImplementedError
+
+    def save(self):
+        """Force l'écriture complète des cartes."""
+        raise NotImplementedError
+
+    # Plusieurs instances (fenêtres de deux processus, ligne de commande) peuvent partager le
+    # même deck : chaque modification incrémente card.version, et une modification faite à
+    # partir d'une version dépassée est refusée plutôt que d'écraser l'autre.
+
+    def watched_paths(self):
+        """Fichiers dont la modification par un autre processus doit déclencher sync()."""
+        return []
+
+    def sync(self):
+        """
+        Intègre les modifications enregistrées par d'autres processus depuis le dernier appel,
+        sans tout relire : renvoie (modifications, conflits), les modifications étant des paires
+        (événement, carte) et les conflits des Conflict. Rapide si rien n'a changé.
+        """
+        return [], []
+
+    # Chargement à la demande : un moteur peut ne garder en mémoire que les catégories demandées.
+    # all_cards(), get() ou find_by_question() chargent alors ce qui manque, et chaque partie
+    # chargée est signalée à loaded_listener(catégorie, cartes) pour que les index la prennent en compte.
+
+    loaded_listener = None
+
+    def require(self, category):
+        """Charge les cartes d'une catégorie ('All' : de toutes) si elles ne sont pas déjà en mémoire."""
+        pass
+
+    def loaded_cards(self):
+        """Cartes en mémoire, sans rien charger."""
+        return self.all_cards()
+
+    def unloaded_stats(self):
+        """
+        {catégorie: (cartes par boîte, prochaine échéance par boîte)} pour les catégories pas
+        encore chargées, l'échéance (epoch) valant None pour une boîte vide.
+        """
+        return {}
+
+    def compact(self):
+        """Réorganise le stockage après de nombreuses modifications (repli du journal)."""
+        pass
+
+    def flush(self):
+        """Attend que les écritures différées soient terminées."""
+        pass
+
+    def close(self):
+        """Libère les ressources (fichiers, connexions, threads)."""
+        pass
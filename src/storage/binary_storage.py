@@ -0,0 +1,722 @@
+"""
+Deck binaire projeté en mémoire (mmap), autre format possible que leitner_cards.json.
+
+Disposition du fichier (petit-boutiste) :
+
+- en-tête de HEADER_SIZE octets : signature, version du format, nombre d'enregistrements,
+  capacité, position et taille de la table des catégories dans le tas, taille du tas, et
+  CRC32 de l'en-tête et de la table des catégories ;
+- `capacité` enregistrements de taille fixe (RECORD) : dernière révision (epoch, NaN si
+  absente), id (16 octets), version, numéro de catégorie, boîte, drapeaux, puis position et
+  longueur de la question, de la commande et des champs supplémentaires (JSON) dans le tas.
+  Les enregistrements au-delà du nombre annoncé sont réservés aux ajouts ;
+- le tas, où les textes (UTF-8) et la table des catégories (liste JSON) sont ajoutés à la suite.
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+from datetime import datetime
+
+from .. import diagnostics
+from ..card import Card
+from .base import StorageBackend, new_card_id
+from .json_storage import JsonStorage
+from .writer import atomic_write, fcntl
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"LTNB"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHIIIIQ")  # Signature, version, réservé, enregistrements, capacité, table (position, taille), tas
+CHECKSUM = struct.Struct("<I")
+HEADER_SIZE = 64  # En-tête complété de zéros, CRC32 dans les 4 derniers octets
+RECORD = struct.Struct("<d16sIHBB6I")
+# Position des colonnes fixes dans un enregistrement
+REVISED, ID, VERSION, CATEGORY, BOX, FLAGS, TEXTS_AT = 0, 8, 24, 28, 30, 31, 32
+# Drapeaux
+DELETED = 1  # Enregistrement libéré, retiré à la prochaine réécriture
+NO_COMMAND = 2
+NO_BOX = 4
+TEXT_ID = 8  # Identifiant qui n'est pas un hexadécimal de 128 bits : rangé dans les champs supplémentaires
+NO_CATEGORY = 0xFFFF
+NAN = float("nan")
+TEXTS = ('question', 'command', 'extra')  # Dans l'ordre des (position, longueur) de l'enregistrement
+MIN_CAPACITY = 1024
+# Colonnes lues en place avec memoryview.cast, qui suit l'ordre des octets de la machine
+NATIVE = sys.byteorder == "little"
+
+
+class DeckInUseError(RuntimeError):
+    """Deck binaire déjà ouvert par une autre instance de l'application."""
+
+
+def record_position(index):
+    return HEADER_SIZE + index * RECORD.size
+
+
+def capacity_for(count):
+    """Enregistrements réservés pour un deck de `count` cartes : de quoi en ajouter la moitié."""
+    return max(MIN_CAPACITY, count * 3 // 2)
+
+
+def id_bytes(card_id):
+    """Les 16 octets d'un identifiant au format de new_card_id(), ou None pour un autre identifiant."""
+    if isinstance(card_id, str) and len(card_id) == 32:
+        try:
+            raw = bytes.fromhex(card_id)
+        except ValueError:
+            return None
+        if raw.hex() == card_id:
+            return raw
+    return None
+
+
+def encode_text(card, name):
+    """Octets d'un texte de la carte dans le tas (vide pour une commande ou des champs absents)."""
+    if name == 'question':
+        return (card.question or "").encode()
+    if name == 'command':
+        return card.command.encode() if card.command is not None else b""
+    extra = dict(card.extra or {})
+    if card.id is not None and id_bytes(card.id) is None:
+        extra['id'] = card.id
+    return json.dumps(extra, ensure_ascii=False).encode() if extra else b""
+
+
+def is_loaded(card, name):
+    """Faux si le texte d'une LazyCard n'a pas encore été lu dans le fichier."""
+    try:
+        getattr(Card, name).__get__(card, Card)
+    except AttributeError:
+        return False
+    return True
+
+
+def pack_header(count, capacity, table_offset, table, heap_size):
+    data = HEADER.pack(MAGIC, FORMAT_VERSION, 0, count, capacity, table_offset, len(table), heap_size)
+    data = data.ljust(HEADER_SIZE - CHECKSUM.size, b"\0")
+    return data + CHECKSUM.pack(zlib.crc32(table, zlib.crc32(data)))
+
+
+def _lazy(name):
+    slot = getattr(Card, name)  # Emplacement de Card, masqué par la propriété
+
+    def get(card):
+        try:
+            return slot.__get__(card, Card)
+        except AttributeError:
+            value = card._store._read_text(card, name)
+            slot.__set__(card, value)
+            return value
+
+    return property(get, slot.__set__, slot.__delete__)
+
+
+class LazyCard(Card):
+    """
+    Carte lue dans un deck binaire : les colonnes fixes sont chargées tout de suite, la question,
+    la commande et les champs supplémentaires seulement à leur première lecture.
+    """
+
+    __slots__ = ('_store', '_ref')  # Moteur d'origine et enregistrement lu au chargement
+    question = _lazy('question')
+    command = _lazy('command')
+    extra = _lazy('extra')
+
+
+class DeckWriter:
+    """Construit un deck binaire complet en mémoire (migration, réécriture)."""
+
+    def __init__(self, categories=()):
+        self.records = bytearray()
+        self.heap = bytearray()
+        self.count = 0
+        self.categories = list(categories)
+        self._category_ids = {name: index for index, name in enumerate(self.categories)}
+
+    def add_record(self, fields, texts):
+        """Ajoute un enregistrement : ses colonnes fixes (révision à drapeaux) et ses trois textes."""
+        offsets = []
+        for data in texts:
+            offsets += (len(self.heap), len(data))
+            self.heap += data
+        self.records += RECORD.pack(*fields, *offsets)
+        self.count += 1
+
+    def add_card(self, card):
+        category = NO_CATEGORY
+        if card.category is not None:
+            category = self._category_ids.setdefault(card.category, len(self.categories))
+            if category == len(self.categories):
+                self.categories.append(card.category)
+        raw_id = id_bytes(card.id)
+        flags = (TEXT_ID if raw_id is None else 0) | (NO_BOX if card.box is None else 0) | \
+            (NO_COMMAND if card.command is None else 0)
+        self.add_record((card.revised_at if card.revised_at is not None else NAN, raw_id or bytes(16),
+                         card.version or 0, category, card.box or 0, flags),
+                        [encode_text(card, name) for name in TEXTS])
+
+    def getvalue(self, capacity=None):
+        capacity = capacity or capacity_for(self.count)
+        table = json.dumps(self.categories, ensure_ascii=False).encode()
+        table_offset = len(self.heap)
+        return b"".join([pack_header(self.count, capacity, table_offset, table, len(self.heap) + len(table)),
+                         self.records, bytes((capacity - self.count) * RECORD.size), self.heap, table])
+
+
+def write_deck(path, cards):
+    """Écrit des cartes dans un nouveau deck binaire ; renvoie sa taille en octets."""
+    writer = DeckWriter()
+    for card in cards:
+        writer.add_card(Card.from_dict(card))
+    return atomic_write(path, writer.getvalue())
+
+
+class BinaryStorage(StorageBackend):
+    """
+    Deck binaire projeté en mémoire. Le chargement ne lit que les colonnes fixes (boîte,
+    catégorie, date de révision, version), en place : les cartes sont des LazyCard dont les
+    textes ne sont décodés que lorsqu'elles sont affichées.
+
+    Un déplacement ou une révision ne réécrit que l'enregistrement de la carte ; un texte
+    modifié est ajouté au tas et l'ancien devient inutilisé. Les ajouts occupent les
+    enregistrements réservés : quand il n'en reste plus, le fichier est réécrit avec une
+    capacité plus grande, sans les enregistrements supprimés ni les textes inutilisés
+    (de même à la fermeture s'ils occupent trop de place).
+
+    Le fichier n'est pas partagé entre processus (pas de sync()) : une seule instance à la fois.
+    Un verrou exclusif (flock, sur file_path + ".lock" : le deck lui-même est remplacé à chaque
+    réécriture) est pris à l'ouverture et gardé jusqu'à la fermeture ; une deuxième instance
+    échoue avec DeckInUseError au lieu d'écrire par-dessus les cartes de la première.
+    """
+
+    def __init__(self, file_path="leitner_cards.bin", json_path="leitner_cards.json"):
+        self.file_path = file_path
+        self.json_path = json_path  # Deck JSON importé si le fichier binaire n'existe pas encore
+        self.lock_path = file_path + ".lock"
+        self._lock_file = None  # Ouvert et verrouillé de l'ouverture à la fermeture du deck
+        self._lock = threading.RLock()  # Protège la projection : le chargement la lit depuis un autre thread
+        self._map = None
+        self._count = 0  # Enregistrements utilisés (y compris supprimés)
+        self._capacity = 0
+        self._heap = 0  # Début du tas dans le fichier
+        self._heap_size = 0
+        self._table = (0, b"")  # Table des catégories : position dans le tas, octets
+        self._category_names = []  # Numéro de catégorie -> nom
+        self._category_ids = {}
+        self._header_dirty = False
+        self._garbage = 0  # Octets du tas qui ne sont plus référencés
+        self._dead = 0  # Enregistrements supprimés
+        self._loading = False
+        self._to_load = 0  # Enregistrements présents à l'ouverture, lus par read_batches()
+        # Transaction en cours : id -> (carte, enregistrement, ses octets) à la première
+        # modification, et état du fichier à l'ouverture de la transaction
+        self._batch = None
+        self._batch_state = None
+        self._reset_indexes()
+
+    def _reset_indexes(self):
+        self._by_id = {}  # id -> carte, dans l'ordre des enregistrements
+        self._rows = {}  # id -> numéro d'enregistrement
+        self._by_box_category = {}  # (boîte, catégorie) -> {id: carte}
+        self._by_box = {}  # boîte -> {id: carte}, pour la catégorie spéciale 'All'
+        self._keys = {}  # id -> (boîte, catégorie) sous lesquels la carte est indexée
+
+    @property
+    def path(self):
+        return self.file_path
+
+    # --- Fichier -----------------------------------------------------------
+
+    def migrate_from_json(self):
+        """Crée le deck binaire, à partir du deck JSON s'il existe (instantané et journal)."""
+        source = JsonStorage(self.json_path)
+        cards = []
+        if os.path.exists(source.file_path) or os.path.exists(source.journal_path):
+            source.load()
+            cards = source.all_cards()
+            source.close()
+        write_deck(self.file_path, cards)
+
+    def _open(self):
+        """Projette le fichier en mémoire et lit son en-tête ; ValueError si le fichier est abîmé."""
+        with open(self.file_path, "r+b") as file:
+            self._map = mmap.mmap(file.fileno(), 0)  # Vide : ValueError
+        magic, version, _, count, capacity, table_offset, table_length, heap_size = \
+            HEADER.unpack_from(self._map) if len(self._map) >= HEADER_SIZE else (None,) + (0,) * 7
+        if magic != MAGIC:
+            raise ValueError("signature absente")
+        if version > FORMAT_VERSION:
+            raise RuntimeError(f"{self.file_path} : format {version}, plus récent que cette version de l'application")
+        heap = record_position(capacity)
+        if count > capacity or heap + heap_size > len(self._map) or table_offset + table_length > heap_size:
+            raise ValueError("tailles incohérentes")
+        table = self._map[heap + table_offset:heap + table_offset + table_length]
+        (checksum,) = CHECKSUM.unpack_from(self._map, HEADER_SIZE - CHECKSUM.size)
+        if zlib.crc32(table, zlib.crc32(self._map[:HEADER_SIZE - CHECKSUM.size])) != checksum:
+            raise ValueError("somme de contrôle incorrecte")
+        self._count, self._capacity, self._heap, self._heap_size = count, capacity, heap, heap_size
+        self._table = (table_offset, table)
+        self._category_names = [sys.intern(name) for name in json.loads(table)]
+        self._category_ids = {name: index for index, name in enumerate(self._category_names)}
+
+    def _acquire(self):
+        """Prend le verrou exclusif du deck ; DeckInUseError s'il est tenu par un autre processus."""
+        if self._lock_file is not None:
+            return
+        file = open(self.lock_path, "a")
+        if fcntl is not None:
+            try:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                file.close()
+                raise DeckInUseError(f"{self.file_path} est déjà ouvert par une autre instance de l'application") from None
+        self._lock_file = file
+
+    def _release(self):
+        if self._lock_file is not None:
+            self._lock_file.close()  # Libère le verrou
+            self._lock_file = None
+
+    def _close_map(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def _quarantine(self, error):
+        """Met de côté un deck illisible et repart d'un deck vide."""
+        self._close_map()
+        corrupt_path = f"{self.file_path}.corrupt-{datetime.now():%Y%m%d-%H%M%S}"
+        os.replace(self.file_path, corrupt_path)
+        logger.warning("Deck binaire illisible (%s), conservé dans %s ; nouveau deck vide.", error, corrupt_path)
+        write_deck(self.file_path, [])
+        self._open()
+
+    def _write_header(self):
+        if self._header_dirty:
+            offset, table = self._table
+            self._map[:HEADER_SIZE] = pack_header(self._count, self._capacity, offset, table, self._heap_size)
+            self._header_dirty = False
+
+    def _append(self, data):
+        """Ajoute des octets à la fin du tas (le fichier grandit au besoin) ; renvoie leur position."""
+        offset = self._heap_size
+        end = self._heap + offset + len(data)
+        if end > len(self._map):
+            self._map.resize(max(end, len(self._map) + len(self._map) // 4))
+        self._map[end - len(data):end] = data
+        self._heap_size += len(data)
+        self._header_dirty = True
+        return offset
+
+    def _heap_bytes(self, offset, length):
+        start = self._heap + offset
+        return self._map[start:start + length]
+
+    def _category_id(self, category):
+        if category is None:
+            return NO_CATEGORY
+        index = self._category_ids.get(category)
+        if index is None:
+            index = len(self._category_names)
+            if index >= NO_CATEGORY:
+                raise ValueError("Trop de catégories pour le format binaire")
+            self._category_names.append(category)
+            self._category_ids[category] = index
+            table = json.dumps(self._category_names, ensure_ascii=False).encode()
+            self._garbage += len(self._table[1])
+            self._table = (self._append(table), table)
+        return index
+
+    def _rewrite(self, drop=True):
+        """
+        Réécrit le fichier avec une capacité adaptée ; avec `drop`, sans les enregistrements
+        supprimés ni les textes inutilisés (les numéros d'enregistrement changent alors).
+        """
+        if drop:
+            writer = DeckWriter(self._category_names)  # Numéros de catégorie inchangés
+            moved = {}
+            for index in range(self._count):
+                fields = RECORD.unpack_from(self._map, record_position(index))
+                if fields[5] & DELETED:
+                    continue
+                moved[index] = writer.count
+                writer.add_record(fields[:6], [self._heap_bytes(*fields[6 + 2 * field:8 + 2 * field])
+                                               for field in range(len(TEXTS))])
+            data = writer.getvalue()
+        else:
+            # Enregistrements et tas recopiés tels quels : les positions restent valables
+            capacity = capacity_for(self._count + 1)
+            offset, table = self._table
+            data = b"".join([pack_header(self._count, capacity, offset, table, self._heap_size),
+                             self._map[HEADER_SIZE:record_position(self._count)],
+                             bytes((capacity - self._count) * RECORD.size),
+                             self._heap_bytes(0, self._heap_size)])
+        self._close_map()
+        diagnostics.record_write('deck', atomic_write(self.file_path, data))
+        self._open()
+        if drop:
+            self._rows = {card_id: moved[index] for card_id, index in self._rows.items()}
+            self._garbage = self._dead = 0
+
+    def _wasteful(self):
+        """Vrai si les textes inutilisés ou les enregistrements supprimés occupent trop de place."""
+        return self._garbage > max(self._heap_size // 2, 1 << 16) or self._dead > max(self._count // 2, MIN_CAPACITY)
+
+    # --- Chargement --------------------------------------------------------
+
+    def begin_load(self):
+        """Ouvre le deck (créé au premier lancement) ; les cartes sont produites par read_batches()."""
+        with self._lock:
+            self._close_map()
+            self._acquire()
+            if not os.path.exists(self.file_path):
+                self.migrate_from_json()
+            try:
+                self._open()
+            except ValueError as error:
+                self._quarantine(error)
+            self._reset_indexes()
+            self._garbage = self._dead = 0
+            self._loading = True
+            self._to_load = self._count  # Les cartes ajoutées pendant le chargement sont déjà en mémoire
+
+    def read_batches(self, batch_size=StorageBackend.LOAD_BATCH):
+        """Construit les cartes à partir des colonnes fixes ; l'avancement est en enregistrements."""
+        total = self._to_load
+        for start in range(0, total, batch_size):
+            stop = min(start + batch_size, total)
+            with self._lock:
+                cards = self._read_cards(start, stop)
+            yield cards, stop, total
+
+    def _read_cards(self, start, stop):
+        size = RECORD.size
+        with memoryview(self._map) as view, view[record_position(start):record_position(stop)] as region:
+            if NATIVE:
+                # Colonnes lues en place : une vue par colonne, avec le pas d'un enregistrement
+                revised = region.cast('d')[REVISED // 8::size // 8].tolist()
+                versions = region.cast('I')[VERSION // 4::size // 4].tolist()
+                categories = region.cast('H')[CATEGORY // 2::size // 2].tolist()
+                extra_lengths = region.cast('I')[TEXTS_AT // 4 + 5::size // 4].tolist()
+                boxes = region[BOX::size].tolist()
+                flags = region[FLAGS::size].tolist()
+            else:
+                rows = list(RECORD.iter_unpack(region))
+                revised, versions, categories, boxes, flags, extra_lengths = \
+                    ([row[field] for row in rows] for field in (0, 2, 3, 4, 5, 11))
+            ids = [region[offset:offset + 16].hex() for offset in range(ID, len(region), size)]
+        names = self._category_names
+        new = LazyCard.__new__
+        cards = []
+        for index in range(stop - start):
+            flag = flags[index]
+            if flag & DELETED:
+                continue
+            card = new(LazyCard)
+            card._store = self
+            card._ref = start + index
+            card.id = ids[index]
+            card.box = None if flag & NO_BOX else boxes[index]
+            category = categories[index]
+            card.category = names[category] if category != NO_CATEGORY else None
+            value = revised[index]
+            card.revised_at = value if value == value else None  # NaN : jamais révisée
+            card.version = versions[index] or None
+            card.answer_key = None
+            if flag & NO_COMMAND:
+                card.command = None
+            if not extra_lengths[index]:
+                card.extra = None
+            elif flag & TEXT_ID:
+                card.id = self._decode(start + index, 'extra', keep_id=True).pop('id')
+            cards.append(card)
+        return cards
+
+    def load_batch(self, cards):
+        loaded = []
+        with self._lock:
+            for card in cards:
+                if card.id in self._by_id:
+                    continue
+                self._rows[card.id] = card._ref
+                self._by_id[card.id] = card
+                self._index(card)
+                loaded.append(card)
+        return loaded
+
+    def finish_load(self):
+        with self._lock:
+            self._loading = False
+        return []
+
+    # --- Textes ------------------------------------------------------------
+
+    def _decode(self, index, name, keep_id=False):
+        """Texte d'un enregistrement, décodé."""
+        fields = RECORD.unpack_from(self._map, record_position(index))
+        field = 6 + 2 * TEXTS.index(name)
+        if name == 'command' and fields[5] & NO_COMMAND:
+            return None
+        data = self._heap_bytes(fields[field], fields[field + 1])
+        if name != 'extra':
+            return data.decode()
+        extra = json.loads(data) if data else {}
+        if not keep_id:
+            extra.pop('id', None)
+        return extra or None
+
+    def _read_text(self, card, name):
+        """Lecture différée d'un texte de LazyCard (voir _lazy)."""
+        with self._lock:
+            return self._decode(self._rows.get(card.id, card._ref), name)
+
+    def _fill(self, card, index):
+        """Remet une carte dans l'état de son enregistrement (annulation d'une transaction)."""
+        revised, _, version, category, box, flags = RECORD.unpack_from(self._map, record_position(index))[:6]
+        card.revised_at = revised if revised == revised else None
+        card.version = version or None
+        card.box = None if flags & NO_BOX else box
+        card.category = self._category_names[category] if category != NO_CATEGORY else None
+        for name in TEXTS:
+            setattr(card, name, self._decode(index, name))
+        card.answer_key = None
+
+    # --- Index -------------------------------------------------------------
+
+    def _index(self, card):
+        card_id = card.id
+        box, category = key = (card.box, card.category)
+        self._keys[card_id] = key
+        self._by_box_category.setdefault(key, {})[card_id] = card
+        self._by_box.setdefault(box, {})[card_id] = card
+
+    def _unindex(self, card_id):
+        box, category = key = self._keys.pop(card_id)
+        for index, key in ((self._by_box_category, key), (self._by_box, box)):
+            bucket = index[key]
+            del bucket[card_id]
+            if not bucket:
+                del index[key]
+
+    def _reindex(self, card):
+        if self._keys.get(card.id) != (card.box, card.category):
+            self._unindex(card.id)
+            self._index(card)
+
+    def _remove(self, card_id):
+        if self._by_id.pop(card_id, None) is not None:
+            del self._rows[card_id]
+            self._unindex(card_id)
+
+    # --- Requêtes ----------------------------------------------------------
+
+    def all_cards(self):
+        return list(self._by_id.values())
+
+    def get(self, card_id):
+        return self._by_id.get(card_id)
+
+    def find_by_question(self, question):
+        # Pas d'index des questions, qui obligerait à toutes les décoder : parcours (rare)
+        return next((card for card in self._by_id.values() if card.question == question), None)
+
+    def cards_by_box_and_category(self, box, category):
+        if category == "All":
+            return list(self._by_box.get(box, {}).values())
+        return list(self._by_box_category.get((box, category), {}).values())
+
+    def categories(self):
+        return list(set(category for _, category in self._by_box_category if category is not None))
+
+    # --- Modifications -----------------------------------------------------
+
+    def _pack(self, card, index, new=False):
+        """
+        Écrit l'enregistrement `index` d'une carte. Les textes jamais lus (LazyCard) ou inchangés
+        gardent leur place dans le tas ; les autres y sont ajoutés.
+        """
+        position = record_position(index)
+        old = None if new else RECORD.unpack_from(self._map, position)
+        raw_id = id_bytes(card.id)
+        flags = (TEXT_ID if raw_id is None else 0) | (NO_BOX if card.box is None else 0)
+        offsets = []
+        for field, name in enumerate(TEXTS):
+            stored = None if old is None else old[6 + 2 * field:8 + 2 * field]
+            if stored is not None and not is_loaded(card, name):
+                offsets += stored
+                if name == 'command':
+                    flags |= old[5] & NO_COMMAND
+                continue
+            if name == 'command' and card.command is None:
+                flags |= NO_COMMAND
+            data = encode_text(card, name)
+            if stored is not None:
+                if self._heap_bytes(*stored) == data:
+                    offsets += stored
+                    continue
+                self._garbage += stored[1]
+            offsets += (self._append(data), len(data))
+        RECORD.pack_into(self._map, position, card.revised_at if card.revised_at is not None else NAN,
+                         raw_id or bytes(16), card.version or 0, self._category_id(card.category),
+                         card.box or 0, flags, *offsets)
+        diagnostics.record_write('record', RECORD.size)
+
+    def _touch(self, card_id, added=False):
+        """Note l'état d'une carte avant sa première modification dans la transaction en cours."""
+        if self._batch is not None and card_id not in self._batch:
+            if added:
+                self._batch[card_id] = (None, None, None)
+            else:
+                index = self._rows[card_id]
+                position = record_position(index)
+                self._batch[card_id] = (self._by_id[card_id], index, self._map[position:position + RECORD.size])
+
+    def _insert(self, card):
+        card = Card.from_dict(card)
+        if card.id is None:
+            card.id = new_card_id()
+        if self._count == self._capacity:
+            self._rewrite(drop=not self._loading and self._batch is None)
+        self._touch(card.id, added=True)
+        index = self._count
+        self._pack(card, index, new=True)
+        self._count += 1
+        self._header_dirty = True
+        self._rows[card.id] = index
+        self._by_id[card.id] = card
+        self._index(card)
+
+    def add(self, card):
+        with self._lock:
+            self._insert(card)
+            self._write_header()
+
+    def add_many(self, cards):
+        with self._lock:
+            for card in cards:
+                self._insert(card)
+            self._write_header()
+
+    def _update(self, updated_card):
+        card = self._by_id.get(updated_card['id'])
+        if card is None:
+            return
+        self._touch(card.id)
+        if card is not updated_card:
+            card.update(updated_card)
+        card.version = (card.version or 0) + 1
+        self._pack(card, self._rows[card.id])
+        self._reindex(card)
+
+    def update(self, updated_card):
+        with self._lock:
+            self._update(updated_card)
+            self._write_header()
+
+    def update_many(self, cards):
+        with self._lock:
+            for card in cards:
+                self._update(card)
+            self._write_header()
+
+    def delete(self, card_id):
+        with self._lock:
+            card = self._by_id.get(card_id)
+            if card is None:
+                return
+            self._touch(card_id)
+            for name in TEXTS:
+                getattr(card, name)  # Textes lus avant de libérer l'enregistrement : la carte reste lisible
+            position = record_position(self._rows[card_id])
+            self._map[position + FLAGS] |= DELETED
+            fields = RECORD.unpack_from(self._map, position)
+            self._garbage += fields[7] + fields[9] + fields[11]
+            self._dead += 1
+            self._remove(card_id)
+
+    def move(self, card_id, new_box):
+        """Ne réécrit que la boîte, les drapeaux et la version de l'enregistrement."""
+        with self._lock:
+            card = self._by_id.get(card_id)
+            if card is None:
+                return
+            self._touch(card_id)
+            card['box'] = new_box
+            card.version = (card.version or 0) + 1
+            position = record_position(self._rows[card_id])
+            struct.pack_into("<I", self._map, position + VERSION, card.version)
+            self._map[position + BOX] = card.box or 0
+            if card.box is None:
+                self._map[position + FLAGS] |= NO_BOX
+            else:
+                self._map[position + FLAGS] &= ~NO_BOX
+            self._reindex(card)
+
+    # --- Transactions ------------------------------------------------------
+
+    # Les modifications vont directement dans le fichier : l'annulation y remet les octets
+    # d'origine des enregistrements touchés, et l'en-tête d'avant la transaction.
+
+    def begin_batch(self):
+        with self._lock:
+            self._batch = {}
+            self._batch_state = (self._count, self._heap_size, self._table, len(self._category_names),
+                                 self._garbage, self._dead)
+
+    def commit_batch(self):
+        with self._lock:
+            self._batch = self._batch_state = None
+
+    def rollback_batch(self):
+        with self._lock:
+            undo, self._batch = self._batch, None
+            self._count, self._heap_size, self._table, categories, self._garbage, self._dead = self._batch_state
+            self._batch_state = None
+            for name in self._category_names[categories:]:
+                del self._category_ids[name]
+            del self._category_names[categories:]
+            for card_id, (card, index, data) in undo.items():
+                self._remove(card_id)
+                if card is not None:
+                    position = record_position(index)
+                    self._map[position:position + RECORD.size] = data
+                    self._fill(card, index)
+                    self._rows[card_id] = index
+                    self._by_id[card_id] = card
+                    self._index(card)
+            self._header_dirty = True
+            self._write_header()
+
+    # --- Persistance -------------------------------------------------------
+
+    def save(self):
+        """Les modifications sont déjà dans le fichier : il suffit de les rendre durables."""
+        self.flush()
+
+    def compact(self):
+        """Réécrit le fichier sans les enregistrements supprimés ni les textes inutilisés."""
+        with self._lock:
+            if self._map is not None and not self._loading and self._batch is None and (self._garbage or self._dead):
+                self._rewrite()
+
+    def flush(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.flush()
+
+    def close(self):
+        with self._lock:
+            if self._map is None:
+                self._release()
+                return
+            if not self._loading and self._batch is None and self._wasteful():
+                self._rewrite()
+            self._map.flush()
+            self._close_map()
+            self._release()
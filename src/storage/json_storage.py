@@ -0,0 +1,752 @@
+import codecs
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+
+from .. import diagnostics
+from ..card import Card
+from .base import Conflict, StorageBackend, new_card_id
+from .writer import FileLock, WriteBehindWorker, atomic_write
+
+logger = logging.getLogger(__name__)
+
+APPLY, APPLIED = "apply", "applied"  # Verdicts de _accepts
+READ_CHUNK = 1 << 16  # Octets lus à la fois lors du chargement en flux
+encode_record = json.JSONEncoder(separators=(',', ':')).encode  # Encodeur partagé : json.dumps(separators=...) en recrée un à chaque appel
+WHITESPACE = re.compile(r"\s*")
+SEPARATORS = re.compile(r"[\s,\]]*")
+
+
+def file_stat(file):
+    """(inode, taille, date de modification en ns) d'un fichier (chemin ou descripteur), ou None s'il n'existe pas."""
+    try:
+        stat = os.stat(file)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def iter_json_array(file, batch_size, chunk_size=READ_CHUNK):
+    """
+    Parcourt un tableau JSON d'objets, lu par morceaux dans un fichier binaire, sans le charger
+    en entier : produit des lots (éléments, octets lus). Lève JSONDecodeError si le fichier
+    est illisible ou tronqué.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer, pos, consumed = "", 0, 0
+    batch = []
+    started = eof = False
+    while True:
+        if not started:
+            pos = WHITESPACE.match(buffer, pos).end()
+            if buffer.startswith("[", pos):
+                started = True
+                pos += 1
+        pos = SEPARATORS.match(buffer, pos).end()  # Entre les éléments
+        if pos < len(buffer):
+            if not started:
+                raise json.JSONDecodeError("Tableau JSON attendu", buffer, pos)
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                end = None  # Élément incomplet : il faut lire la suite
+            if end is not None:
+                batch.append(item)
+                pos = end
+                if len(batch) >= batch_size:
+                    yield batch, consumed
+                    batch = []
+                continue
+        elif eof:
+            break
+        chunk = file.read(chunk_size)
+        consumed += len(chunk)
+        eof = not chunk
+        buffer = buffer[pos:] + utf8.decode(chunk, final=eof)
+        pos = 0
+    if not started:
+        raise json.JSONDecodeError("Tableau JSON attendu", buffer, 0)
+    if batch:
+        yield batch, consumed
+
+
+class JsonStorage(StorageBackend):
+    """
+    Stockage en mémoire, persisté dans un instantané JSON complété par un journal de modifications.
+
+    Les cartes sont indexées par id, par question et par (boîte, catégorie) ; les index sont
+    mis à jour à chaque modification, si bien que recherches, éditions et déplacements sont en O(1).
+
+    Les écritures sont confiées à un thread (WriteBehindWorker) : une modification ne fait
+    qu'ajouter une ligne en attente et rend la main ; les rafales sont écrites en une fois.
+
+    Plusieurs processus peuvent partager le deck. Les ajouts au journal et les compactions se
+    font sous un verrou de fichier (FileLock) ; chaque enregistrement porte l'instance qui l'a
+    écrit ('writer') et la version de la carte sur laquelle il s'appuie ('base'). Au rejeu, un
+    enregistrement n'est appliqué que si sa base est la version courante de la carte : de deux
+    modifications concurrentes, la première écrite gagne, partout. sync() lit la fin du journal
+    écrite par les autres et signale les modifications locales perdues (Conflict).
+    """
+
+    # Seuils au-delà desquels le journal est replié dans un nouvel instantané
+    JOURNAL_MAX_RECORDS = 1000
+    JOURNAL_MAX_BYTES = 1024 * 1024
+
+    def __init__(self, file_path="leitner_cards.json", journal=True):
+        self.file_path = file_path  # Fichier pour stocker les cartes
+        self.journal_path = os.path.splitext(file_path)[0] + ".journal"  # Modifications depuis le dernier instantané
+        self.journal_enabled = journal
+        self._journal_records = 0
+        self._journal_bytes = 0
+        self._lock = threading.Lock()  # Protège les index et les écritures en attente face au thread d'écriture
+        self._pending = []  # (enregistrement, ligne) du journal pas encore écrits
+        self._snapshot_requested = False
+        self._writer = None
+        self._loading = False  # Chargement progressif en cours : aucun instantané ne doit être écrit
+        self._journal_size = 0  # Taille du journal à rejouer en fin de chargement
+        self.lock_path = os.path.splitext(file_path)[0] + ".lock"
+        self._file_lock = FileLock(self.lock_path)  # Exclusion entre processus
+        self._writer_id = os.urandom(4).hex()  # Identifie les enregistrements de cette instance
+        self._journal_ino = None  # Journal lu (inode) et octets déjà intégrés
+        self._journal_offset = 0
+        self._snapshot_stat = None  # Instantané chargé ou écrit par cette instance
+        # id -> [version confirmée par le journal (None : absente), carte supprimée localement]
+        # pour les cartes modifiées ici dont les enregistrements ne sont pas encore confirmés
+        self._unconfirmed = {}
+        self._conflicts = []  # Conflits détectés au chargement, renvoyés par le prochain sync()
+        # Transaction en cours (begin_batch) : id -> (carte, son état, entrée de _unconfirmed) à
+        # la première modification, et enregistrements retenus jusqu'au commit
+        self._batch = None
+        self._batch_records = []
+        self._reset_indexes()
+
+    def _reset_indexes(self):
+        self._by_id = {}  # id -> carte, dans l'ordre d'insertion
+        self._by_question = {}  # question -> {id: carte}
+        self._by_box_category = {}  # (boîte, catégorie) -> {id: carte}
+        self._by_box = {}  # boîte -> {id: carte}, pour la catégorie spéciale 'All'
+        self._keys = {}  # id -> (question, boîte, catégorie) sous lesquels la carte est indexée
+        self._missing_ids = False
+
+    @property
+    def cards(self):
+        return list(self._by_id.values())
+
+    def begin_load(self):
+        """Vide les index et prépare le thread d'écriture ; l'instantané est lu par read_batches()."""
+        if self._writer is not None:
+            self._writer.close()
+        self._writer = WriteBehindWorker(self._persist)
+        with self._lock:
+            self._reset_indexes()
+            self._loading = True
+            self._journal_records = 0
+            self._journal_bytes = 0
+            self._unconfirmed.clear()
+            self._snapshot_stat = None
+        # Seules les modifications antérieures au chargement sont à rejouer ; celles faites
+        # pendant le chargement sont déjà en mémoire et s'ajoutent à la suite du journal.
+        with self._file_lock:
+            self._journal_ino, self._journal_size = self._journal_state()
+
+    def read_batches(self, batch_size=StorageBackend.LOAD_BATCH):
+        """Lit l'instantané JSON en flux, par lots de cartes ; l'avancement est en octets."""
+        try:
+            with open(self.file_path, "rb") as file:
+                self._snapshot_stat = stat = file_stat(file.fileno())
+                total = stat[1]
+                for items, done in iter_json_array(file, batch_size):
+                    yield [Card.from_dict(item) for item in items], done, total
+        except FileNotFoundError:
+            return  # Pas encore de deck : on part d'une liste vide
+        except json.JSONDecodeError:
+            # Les cartes déjà lues sont gardées et seront réenregistrées dans un nouvel instantané
+            self._quarantine()
+            self._missing_ids = True
+            self._snapshot_stat = None
+
+    def load_batch(self, cards):
+        loaded = []
+        with self._lock:
+            for card in cards:
+                if card.id is not None and card.id in self._by_id:
+                    continue  # Déjà présente (ajoutée pendant le chargement)
+                loaded.append(self._insert(card))
+        return loaded
+
+    def finish_load(self):
+        """Rejoue le journal par-dessus l'instantané et renvoie les cartes qu'il a modifiées."""
+        touched = {}  # id -> [carte, présente avant le journal]
+        with self._lock:
+            if self.journal_enabled:
+                # Une compaction interrompue laisse un journal renommé : on ne le rejoue
+                # que si l'instantané n'a pas eu le temps d'être remplacé.
+                compacting_path = self._compacting_path()
+                if os.path.exists(compacting_path):
+                    if not os.path.exists(self.file_path) or \
+                       os.path.getmtime(self.file_path) <= os.path.getmtime(compacting_path):
+                        self._replay_journal(compacting_path, touched)
+                    else:
+                        os.remove(compacting_path)
+                self._replay_journal(self.journal_path, touched, self._journal_size, self._conflicts)
+            self._journal_offset = self._journal_size
+            self._loading = False
+
+        changes = self._changes(touched)
+
+        if self._missing_ids:
+            # Ancien deck sans identifiants, ou instantané illisible : on le réenregistre une fois
+            self._missing_ids = False
+            self.compact()
+        elif self._snapshot_requested:
+            self._writer.mark_dirty()  # Compaction demandée pendant le chargement
+        return changes
+
+    def _changes(self, touched):
+        """Paires (événement, carte) décrivant les cartes notées dans `touched` (voir _apply_record)."""
+        changes = []
+        for card_id, (card, existed) in touched.items():
+            current = self._by_id.get(card_id)
+            if current is not None:
+                changes.append(('updated' if existed else 'added', current))
+            elif existed:
+                changes.append(('deleted', card))
+        return changes
+
+    def _quarantine(self):
+        """Met de côté un instantané illisible au lieu de l'écraser à la prochaine sauvegarde."""
+        corrupt_path = f"{self.file_path}.corrupt-{datetime.now():%Y%m%d-%H%M%S}"
+        os.replace(self.file_path, corrupt_path)
+        logger.warning("Deck illisible, conservé dans %s ; chargement du journal seul.", corrupt_path)
+
+    # --- Index -------------------------------------------------------------
+
+    def _insert(self, card):
+        card = Card.from_dict(card)
+        if card.id is None:
+            card.id = new_card_id()
+            self._missing_ids = True
+        self._by_id[card.id] = card
+        self._index(card)
+        return card
+
+    def _index(self, card):
+        card_id = card.id
+        question, box, category = key = (card.question, card.box, card.category)
+        self._keys[card_id] = key
+        self._by_question.setdefault(question, {})[card_id] = card
+        self._by_box_category.setdefault((box, category), {})[card_id] = card
+        self._by_box.setdefault(box, {})[card_id] = card
+
+    def _unindex(self, card_id):
+        question, box, category = self._keys.pop(card_id)
+        for index, key in ((self._by_question, question),
+                           (self._by_box_category, (box, category)),
+                           (self._by_box, box)):
+            bucket = index[key]
+            del bucket[card_id]
+            if not bucket:
+                del index[key]
+
+    def _reindex(self, card):
+        """Met à jour les index si la question, la boîte ou la catégorie ont changé."""
+        if self._keys.get(card.id) != (card.question, card.box, card.category):
+            self._unindex(card.id)
+            self._index(card)
+
+    def _remove(self, card_id):
+        if self._by_id.pop(card_id, None) is not None:
+            self._unindex(card_id)
+
+    # --- Journal -----------------------------------------------------------
+
+    def _compacting_path(self):
+        return self.journal_path + ".compacting"
+
+    def _journal_state(self):
+        """(inode, taille) du journal, ou (None, 0) s'il n'existe pas."""
+        try:
+            stat = os.stat(self.journal_path)
+        except FileNotFoundError:
+            return None, 0
+        return stat.st_ino, stat.st_size
+
+    def _replay_journal(self, path, touched, limit=None, conflicts=None):
+        """
+        Applique les enregistrements d'un journal (ses `limit` premiers octets) sur les cartes
+        chargées, en notant dans `touched` les cartes concernées ; renvoie les octets lus.
+        """
+        size = 0
+        try:
+            with open(path, "rb") as file:
+                for line in file:
+                    if limit is not None and size + len(line) > limit:
+                        break
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # Dernière ligne tronquée par un arrêt brutal
+                    size += len(line)
+                    self._apply_record(record, touched, conflicts)
+                    self._journal_records += 1
+                    self._journal_bytes += len(line)
+        except FileNotFoundError:
+            pass
+        return size
+
+    def _record_targets(self, record):
+        """Cartes visées par un enregistrement (par id, ou par position/question pour les anciens journaux)."""
+        if 'id' in record:
+            card = self._by_id.get(record['id'])
+            return [card] if card is not None else []
+        if 'index' in record:
+            cards = list(self._by_id.values())
+            return [cards[record['index']]] if record['index'] < len(cards) else []
+        return list(self._by_question.get(record['question'], {}).values())
+
+    def _confirmed_version(self, card_id):
+        """Version de la carte d'après le journal, sans les modifications locales non confirmées (None : absente)."""
+        entry = self._unconfirmed.get(card_id)
+        if entry is not None:
+            return entry[0]
+        card = self._by_id.get(card_id)
+        return None if card is None else card.version or 0
+
+    def _accepts(self, record, versions=None):
+        """
+        APPLY si l'enregistrement s'appuie sur la version confirmée de la carte, APPLIED s'il
+        est déjà pris en compte (instantané écrit après la modification), None s'il est refusé :
+        une autre instance a modifié la carte entre-temps. `versions` remplace les versions
+        confirmées pour les cartes qu'il contient (enregistrements pas encore écrits).
+        """
+        op = record['op']
+        card = record.get('card')
+        card_id = card.get('id') if op == 'add' else record['id']
+        if versions is not None and card_id in versions:
+            confirmed = versions[card_id]
+        else:
+            confirmed = self._confirmed_version(card_id)
+        if op == 'add':
+            if confirmed is None:
+                return APPLY
+        elif confirmed is not None and record['base'] == confirmed:
+            return APPLY
+        if op == 'delete':
+            return APPLIED if confirmed is None else None
+        current = self._by_id.get(card_id)
+        if confirmed == (card.get('version') or 0) and current is not None and \
+           card_id not in self._unconfirmed and current.to_dict() == card:
+            return APPLIED
+        return None
+
+    def _confirm(self, record):
+        """Un enregistrement de cette instance est accepté : la carte n'a plus de modification en suspens s'il était le dernier."""
+        card_id = record['card'].get('id') if record['op'] == 'add' else record['id']
+        entry = self._unconfirmed.get(card_id)
+        if entry is None:
+            return
+        current = self._by_id.get(card_id)
+        if record['op'] == 'delete':
+            del self._unconfirmed[card_id]
+        elif current is not None and (current.version or 0) == (record['card'].get('version') or 0):
+            del self._unconfirmed[card_id]
+        else:
+            entry[0] = record['card'].get('version') or 0
+
+    def _apply_record(self, record, touched, conflicts=None):
+        """
+        Rejoue une modification du journal (même logique que les méthodes publiques). Une
+        modification d'une autre instance qui l'emporte sur une modification locale en suspens
+        remplace celle-ci ; le conflit est ajouté à `conflicts` (ou gardé pour sync()).
+        """
+        if 'writer' in record:
+            self._apply_versioned(record, touched, conflicts)
+            return
+        # Journal écrit avant les versions : enregistrement appliqué sans condition
+        op = record['op']
+        if op == 'add':
+            card_id = record['card'].get('id')
+            existing = self._by_id.get(card_id) if card_id is not None else None
+            if existing is not None:
+                self._remove(card_id)  # Déjà présente : l'ajout la remplace
+            card = self._insert(record['card'])
+            touched.setdefault(card.id, [existing or card, existing is not None])
+            return
+        for card in self._record_targets(record):
+            touched.setdefault(card.id, [card, True])
+            if op == 'update':
+                card.update(record['card'])
+                self._reindex(card)
+            elif op == 'delete':
+                self._remove(card['id'])
+            elif op == 'move':
+                card['box'] = record['box']
+                self._reindex(card)
+
+    def _apply_versioned(self, record, touched, conflicts):
+        verdict = self._accepts(record)
+        if verdict is None:
+            return  # Perdu face à une modification concurrente : son auteur en est averti
+        if record['writer'] == self._writer_id:
+            self._confirm(record)  # Déjà appliqué en mémoire
+            return
+        if verdict == APPLIED:
+            return
+        op = record['op']
+        card_id = record['card'].get('id') if op == 'add' else record['id']
+        self._replace(card_id, None if op == 'delete' else record['card'], touched,
+                      conflicts if conflicts is not None else self._conflicts)
+
+    def _log(self, *records, compact=True):
+        """
+        Met des modifications en attente d'écriture et rend la main immédiatement.
+        Avec compact=False (import en masse), le journal n'est pas replié même s'il dépasse les
+        seuils : l'appelant demande une seule compaction à la fin (compact()).
+        """
+        if self._batch is not None:
+            self._batch_records.extend(records)  # Écrits d'un bloc par commit_batch()
+            return
+        if self.journal_enabled:
+            pending = []
+            for record in records:
+                record['writer'] = self._writer_id
+                pending.append((record, encode_record(record) + "\n"))
+        with self._lock:
+            if not self.journal_enabled:
+                self._snapshot_requested = True  # Sans journal, tout le fichier sera réécrit
+            else:
+                self._pending.extend(pending)
+                self._journal_records += len(pending)
+                self._journal_bytes += sum(len(line) for _, line in pending)
+                # Un instantané coûte autant que le deck : on attend que le journal soit du même
+                # ordre pour que les imports en masse ne réécrivent pas le deck à chaque lot.
+                if compact and (self._journal_records >= max(self.JOURNAL_MAX_RECORDS, len(self._by_id) // 2) or
+                                self._journal_bytes >= self.JOURNAL_MAX_BYTES * max(1, len(self._by_id) // 10000)):
+                    self._request_compaction()
+        self._writer.mark_dirty()
+
+    def _local_change(self, card_id, version, removed=None):
+        """
+        Note une modification locale de la carte (version avant modification) : sa version
+        confirmée est gardée jusqu'à ce que le journal confirme l'enregistrement. Renvoie la base.
+        """
+        entry = self._unconfirmed.setdefault(card_id, [version, None])
+        if removed is not None:
+            entry[1] = removed
+        return version
+
+    def _touch(self, card_id, added=False):
+        """Note l'état d'une carte avant sa première modification dans la transaction en cours."""
+        if self._batch is not None and card_id not in self._batch:
+            card = self._by_id.get(card_id) if not added else None
+            entry = self._unconfirmed.get(card_id)
+            self._batch[card_id] = (card, card.to_dict() if card is not None else None,
+                                    list(entry) if entry is not None else None)
+
+    def begin_batch(self):
+        with self._lock:
+            self._batch = {}
+            self._batch_records = []
+
+    def commit_batch(self):
+        with self._lock:
+            records, self._batch_records = self._batch_records, []
+            self._batch = None
+        if records:
+            self._log(*records)
+        else:
+            self._writer.mark_dirty()  # Instantané éventuellement retardé par la transaction
+
+    def rollback_batch(self):
+        with self._lock:
+            undo, self._batch = self._batch, None
+            self._batch_records = []
+            for card_id, (card, data, entry) in undo.items():
+                if card_id in self._by_id:
+                    self._remove(card_id)
+                if card is not None:
+                    card.update(Card.from_dict(data))
+                    self._by_id[card_id] = card
+                    self._index(card)
+                if entry is None:
+                    self._unconfirmed.pop(card_id, None)
+                else:
+                    self._unconfirmed[card_id] = entry
+
+    def _request_compaction(self):
+        self._snapshot_requested = True
+        self._journal_records = 0
+        self._journal_bytes = 0
+
+    def compact(self):
+        """Demande le repli du journal dans un nouvel instantané, écrit en arrière-plan."""
+        with self._lock:
+            self._request_compaction()
+        self._writer.mark_dirty()
+
+    def _persist(self):
+        """Écrit les modifications en attente (appelé dans le thread d'écriture)."""
+        with self._file_lock:
+            journal_state = self._journal_state()
+            snapshot_stat = file_stat(self.file_path)
+            with self._lock:
+                pending, self._pending = self._pending, []
+                # À jour : le journal et l'instantané n'ont changé que par cette instance. Les
+                # enregistrements refusés (modification perdue, déjà signalée) ne sont pas écrits
+                # et ceux écrits sont confirmés aussitôt. Sinon sync() lira d'abord ceux des
+                # autres : on ajoute les nôtres à la suite, ils seront départagés à la lecture.
+                up_to_date = not self._loading and snapshot_stat == self._snapshot_stat and \
+                    journal_state == ((self._journal_ino, self._journal_offset) if self._journal_ino is not None
+                                      else (None, 0))
+                if up_to_date:
+                    versions = {}
+                    accepted = []
+                    for record, line in pending:
+                        if self._accepts(record, versions) is not None:
+                            accepted.append((record, line))
+                            card_id = record['card'].get('id') if record['op'] == 'add' else record['id']
+                            versions[card_id] = None if record['op'] == 'delete' else record['card'].get('version') or 0
+                    pending = accepted
+                # Pendant un chargement le deck est incomplet, et pendant une transaction il
+                # contient des modifications qui peuvent être annulées : l'instantané attendra
+                snapshot = None
+                if self._snapshot_requested and up_to_date and self._batch is None:
+                    snapshot = list(self._by_id.values())
+                    self._snapshot_requested = False
+
+            try:
+                if pending:
+                    with open(self.journal_path, "a") as journal:
+                        start = journal.tell()
+                        journal.write("".join(line for _, line in pending))
+                        journal.flush()
+                        os.fsync(journal.fileno())
+                        diagnostics.record_write('journal', journal.tell() - start)
+                        if up_to_date:
+                            with self._lock:
+                                self._journal_ino, self._journal_offset = file_stat(journal.fileno())[:2]
+                                for record, _ in pending:
+                                    self._confirm(record)
+                if snapshot is not None:
+                    # Le journal écrit jusqu'ici est renommé puis replié dans l'instantané
+                    if os.path.exists(self.journal_path):
+                        os.replace(self.journal_path, self._compacting_path())
+                    # Les cartes sont sérialisées hors du verrou : une carte modifiée entre-temps
+                    # a sa ligne dans le nouveau journal, dont le rejeu donne le même état.
+                    # Une carte par ligne, avec l'encodeur C (indent le désactive).
+                    size = atomic_write(self.file_path,
+                                        "[\n" + ",\n".join(encode_record(card.to_dict()) for card in snapshot) + "\n]\n")
+                    diagnostics.record_write('snapshot', size)
+                    if os.path.exists(self._compacting_path()):
+                        os.remove(self._compacting_path())
+                    with self._lock:
+                        self._snapshot_stat = file_stat(self.file_path)
+                        self._journal_ino, self._journal_offset = None, 0
+            except Exception:
+                # On remet le travail en attente pour la prochaine tentative
+                with self._lock:
+                    if pending:
+                        self._pending[:0] = pending
+                    if snapshot is not None:
+                        self._snapshot_requested = True
+                raise
+
+    @property
+    def path(self):
+        return self.file_path
+
+    def watched_paths(self):
+        return [self.file_path, self.journal_path]
+
+    def sync(self):
+        """
+        Lit la fin du journal écrite par d'autres processus ; si l'un d'eux a écrit un nouvel
+        instantané, celui-ci est relu et fusionné carte par carte, d'après les versions.
+        """
+        touched = {}
+        with self._file_lock:
+            snapshot_stat = file_stat(self.file_path)
+            journal_ino, journal_size = self._journal_state()
+            with self._lock:
+                conflicts, self._conflicts = self._conflicts, []
+                if self._loading:
+                    return [], conflicts
+                replaced = snapshot_stat != self._snapshot_stat or \
+                    (self._journal_ino is not None and journal_ino != self._journal_ino)
+                if replaced and snapshot_stat is not None:
+                    self._merge_snapshot(touched, conflicts)
+                    self._journal_ino, self._journal_offset = None, 0
+                if journal_ino is not None and journal_size > (self._journal_offset if journal_ino == self._journal_ino else 0):
+                    if journal_ino != self._journal_ino:
+                        self._journal_ino, self._journal_offset = journal_ino, 0
+                    self._read_journal(touched, conflicts)
+                changes = self._changes(touched)
+                retry = self._snapshot_requested or bool(self._pending)
+        if retry and self._writer is not None:
+            self._writer.mark_dirty()  # Compaction ou écriture remise faute d'être à jour
+        return changes, conflicts
+
+    def _read_journal(self, touched, conflicts):
+        """Applique les lignes complètes du journal écrites depuis la dernière lecture."""
+        with open(self.journal_path, "rb") as journal:
+            journal.seek(self._journal_offset)
+            data = journal.read()
+        end = data.rfind(b"\n") + 1  # Une ligne en cours d'écriture attendra la prochaine lecture
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            self._apply_record(record, touched, conflicts)
+            self._journal_records += 1
+            self._journal_bytes += len(line) + 1
+        self._journal_offset += end
+
+    def _merge_snapshot(self, touched, conflicts):
+        """
+        Fusionne l'instantané écrit par un autre processus : les cartes dont la version diffère
+        sont remplacées (conflit si elles avaient une modification locale en suspens), celles
+        qui n'y figurent plus sont retirées. Le deck n'est relu qu'à ce moment-là.
+        """
+        with open(self.file_path, "rb") as file:
+            self._snapshot_stat = file_stat(file.fileno())
+            seen = set()
+            for items, _ in iter_json_array(file, self.LOAD_BATCH):
+                for remote in items:
+                    card_id = remote.get('id')
+                    seen.add(card_id)
+                    current = self._by_id.get(card_id)
+                    entry = self._unconfirmed.get(card_id)
+                    version = remote.get('version') or 0
+                    if entry is None:
+                        if current is not None and (current.version or 0) == version:
+                            continue  # Inchangée
+                    elif entry[0] is None:
+                        entry[0] = version  # Ajoutée ici, et déjà repliée dans l'instantané
+                        continue
+                    elif current is not None and current.to_dict() == remote:
+                        del self._unconfirmed[card_id]  # Modification locale repliée : confirmée
+                        continue
+                    elif entry[0] == version:
+                        continue  # Pas modifiée ailleurs : la modification locale reste en suspens
+                    self._replace(card_id, remote, touched, conflicts)
+        for card_id in [card_id for card_id in self._by_id if card_id not in seen]:
+            entry = self._unconfirmed.get(card_id)
+            if entry is not None and entry[0] is None:
+                continue  # Ajoutée ici, pas encore écrite
+            self._replace(card_id, None, touched, conflicts)
+
+    def _replace(self, card_id, remote, touched, conflicts):
+        """Remplace (ou retire, si remote est None) une carte par la version d'un autre processus."""
+        entry = self._unconfirmed.pop(card_id, None)
+        current = self._by_id.get(card_id)
+        if entry is not None and (current is not None or remote is not None):
+            conflicts.append(Conflict(card_id, current.to_dict() if current is not None else None, remote))
+        touched.setdefault(card_id, [current if current is not None else entry and entry[1], current is not None])
+        if remote is None:
+            self._remove(card_id)
+        elif current is not None:
+            current.update(Card.from_dict(remote))
+            self._reindex(current)
+        else:
+            self._insert(dict(remote))
+
+    def flush(self):
+        """Attend que toutes les modifications soient écrites sur le disque."""
+        if self._writer is not None:
+            self._writer.flush()
+
+    def close(self):
+        """Écrit les modifications en attente et arrête le thread d'écriture."""
+        if self._writer is not None:
+            self._writer.close()
+
+    # --- Requêtes ----------------------------------------------------------
+
+    def all_cards(self):
+        return list(self._by_id.values())
+
+    def get(self, card_id):
+        return self._by_id.get(card_id)
+
+    def find_by_question(self, question):
+        bucket = self._by_question.get(question)
+        return next(iter(bucket.values())) if bucket else None
+
+    def cards_by_box_and_category(self, box, category):
+        if category == "All":
+            # Si la catégorie est "All", ne pas filtrer par catégorie
+            return list(self._by_box.get(box, {}).values())
+        return list(self._by_box_category.get((box, category), {}).values())
+
+    def categories(self):
+        return list(set(category for _, category in self._by_box_category if category is not None))
+
+    # --- Modifications -----------------------------------------------------
+
+    # Chaque modification incrémente la version de la carte et note la version d'origine ('base').
+    # Un déplacement est enregistré comme une mise à jour complète : en cas de conflit, la carte
+    # entière de l'autre instance remplace la version locale.
+
+    def add(self, card):
+        with self._lock:
+            card = self._insert(card)
+            self._touch(card.id, added=True)
+            self._local_change(card.id, None)
+        self._log({'op': 'add', 'card': card.to_dict()})
+
+    def add_many(self, cards):
+        with self._lock:
+            cards = [self._insert(card) for card in cards]
+            for card in cards:
+                self._touch(card.id, added=True)
+                self._local_change(card.id, None)
+        self._log(*({'op': 'add', 'card': card.to_dict()} for card in cards), compact=False)
+
+    def update(self, updated_card):
+        with self._lock:
+            card = self._by_id.get(updated_card['id'])
+            if card is None:
+                return
+            self._touch(card.id)
+            base = self._local_change(card.id, card.version or 0)
+            if card is not updated_card:
+                card.update(updated_card)
+            card.version = base + 1
+            self._reindex(card)
+        self._log({'op': 'update', 'id': card.id, 'base': base, 'card': card.to_dict()})
+
+    def delete(self, card_id):
+        with self._lock:
+            card = self._by_id.get(card_id)
+            if card is None:
+                return
+            self._touch(card_id)
+            base = self._local_change(card_id, card.version or 0, removed=card)
+            self._remove(card_id)
+        self._log({'op': 'delete', 'id': card_id, 'base': base})
+
+    def move(self, card_id, new_box):
+        with self._lock:
+            card = self._by_id.get(card_id)
+            if card is None:
+                return
+            self._touch(card_id)
+            base = self._local_change(card_id, card.version or 0)
+            card['box'] = new_box
+            card.version = base + 1
+            self._reindex(card)
+        self._log({'op': 'update', 'id': card_id, 'base': base, 'card': card.to_dict()})
+
+    def save(self):
+        """Sauvegarde toutes les cartes dans un nouvel instantané, vide le journal et attend la fin de l'écriture."""
+        with self._lock:
+            self._request_compaction()
+        self._writer.mark_dirty()
+        self._writer.flush()
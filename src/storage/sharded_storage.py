@@ -0,0 +1,395 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+
+from ..card import Card
+from ..scheduler import ALL, REVISION_INTERVALS, next_due_timestamp
+from .base import StorageBackend
+from .json_storage import JsonStorage, encode_record, file_stat
+from .writer import atomic_write
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+SHARD_SUFFIX = ".cards.json"
+JOURNAL_SUFFIX = ".cards.journal"  # Journal d'une catégorie (JsonStorage), seul fichier jusqu'au premier instantané
+NUM_BOXES = len(REVISION_INTERVALS)
+
+
+def shard_file(category):
+    """Nom du fichier d'une catégorie : lisible, et rendu unique par une empreinte du nom."""
+    if category is None:
+        return "_sans_categorie" + SHARD_SUFFIX
+    slug = re.sub(r"[^\w-]+", "_", category).strip("_")[:40] or "categorie"
+    return f"{slug}-{hashlib.sha1(category.encode()).hexdigest()[:8]}{SHARD_SUFFIX}"
+
+
+def shard_stats(cards):
+    """(cartes par boîte, prochaine échéance par boîte) d'une catégorie, comme les compte LeitnerService."""
+    counts = [0] * NUM_BOXES
+    due = [None] * NUM_BOXES
+    for card in cards:
+        box = min(max(int(card.box or 0), 0), NUM_BOXES - 1)
+        counts[box] += 1
+        timestamp = next_due_timestamp(card)
+        timestamp = timestamp if timestamp is not None else 0.0  # Jamais révisée : due tout de suite
+        if due[box] is None or timestamp < due[box]:
+            due[box] = timestamp
+    return counts, due
+
+
+class ShardedStorage(StorageBackend):
+    """
+    Deck découpé par catégorie : un dossier avec un deck JSON (JsonStorage : instantané et
+    journal) par catégorie, et un manifeste donnant pour chacune le nombre de cartes et la
+    prochaine échéance par boîte.
+
+    Au démarrage, seul le manifeste est lu : les nombres de cartes et les échéances des boîtes
+    s'affichent sans rien charger. Une catégorie est chargée quand ses cartes sont demandées
+    (cartes d'une boîte, cartes dues), toutes pour 'All' ou all_cards(). Une modification
+    n'écrit que dans la catégorie de la carte ; changer la catégorie d'une carte la retire de
+    l'une et l'ajoute à l'autre.
+
+    Une catégorie dont les fichiers ont changé depuis l'écriture du manifeste (arrêt brutal,
+    autre processus), ou absente du manifeste, est chargée dès l'ouverture.
+    """
+
+    def __init__(self, directory="leitner_shards", json_path="leitner_cards.json"):
+        self.directory = directory
+        self.json_path = json_path  # Deck JSON découpé au premier lancement
+        self.manifest_path = os.path.join(directory, MANIFEST)
+        self._entries = {}  # catégorie -> entrée du manifeste (fichier, compteurs, échéances, état des fichiers)
+        self._shards = {}  # catégorie -> JsonStorage des catégories chargées
+        self._changed = set()  # Catégories modifiées depuis l'écriture du manifeste
+        self._stale = []  # Fichiers à charger dès l'ouverture
+        self._batch = False
+
+    @property
+    def path(self):
+        return self.manifest_path
+
+    # --- Manifeste ---------------------------------------------------------
+
+    def _shard_path(self, entry):
+        return os.path.join(self.directory, entry['file'])
+
+    def _files_state(self, entry):
+        """État (taille, date) de l'instantané et du journal d'une catégorie, pour détecter les changements."""
+        storage = JsonStorage(self._shard_path(entry))
+        return [list(stat[1:]) if stat is not None else None
+                for stat in (file_stat(storage.file_path), file_stat(storage.journal_path))]
+
+    def migrate_from_json(self):
+        """Crée le dossier du deck, en découpant le deck JSON s'il existe (instantané et journal)."""
+        os.makedirs(self.directory, exist_ok=True)
+        source = JsonStorage(self.json_path)
+        by_category = {}
+        if os.path.exists(source.file_path) or os.path.exists(source.journal_path):
+            source.load()
+            for card in source.all_cards():
+                by_category.setdefault(card.category, []).append(card)
+            source.close()
+        for category, cards in by_category.items():
+            entry = {'category': category, 'file': shard_file(category)}
+            # Même format que l'instantané de JsonStorage : une carte par ligne
+            atomic_write(self._shard_path(entry),
+                         "[\n" + ",\n".join(encode_record(card.to_dict()) for card in cards) + "\n]\n")
+            entry['counts'], entry['next_due'] = shard_stats(cards)
+            entry['files'] = self._files_state(entry)
+            self._entries[category] = entry
+        self._write_manifest()
+
+    def _read_manifest(self):
+        self._entries = {}
+        try:
+            with open(self.manifest_path, encoding="utf-8") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            data = {'shards': []}
+        except ValueError:
+            logger.warning("Manifeste illisible : toutes les catégories seront chargées.")
+            data = {'shards': []}
+        known = set()
+        for entry in data['shards']:
+            known.add(entry['file'])
+            if entry.get('files') != self._files_state(entry):
+                self._stale.append(entry['file'])  # Nombres et échéances périmés
+            else:
+                self._entries[entry['category']] = entry
+        # Catégories absentes du manifeste (écrit à la fermeture) : arrêt brutal ou autre processus.
+        # Une catégorie récente n'a parfois encore que son journal.
+        pattern = os.path.join(glob.escape(self.directory), "*")
+        names = {os.path.basename(path) for path in glob.glob(pattern + SHARD_SUFFIX)}
+        names.update(os.path.basename(path)[:-len(JOURNAL_SUFFIX)] + SHARD_SUFFIX
+                     for path in glob.glob(pattern + JOURNAL_SUFFIX))
+        self._stale.extend(sorted(names - known))
+
+    def _write_manifest(self, update=True):
+        """
+        Met à jour les nombres et les échéances des catégories chargées, puis écrit le manifeste.
+        Avec update=False, le manifeste est écrit tel quel : une catégorie chargée dont l'entrée n'a
+        pas été recalculée (files None) sera relue à la prochaine ouverture.
+        """
+        if update:
+            for category, storage in self._shards.items():
+                entry = self._entries[category]
+                if category in self._changed or entry.get('files') is None:
+                    entry['counts'], entry['next_due'] = shard_stats(storage.all_cards())
+                entry['files'] = self._files_state(entry)
+            self._changed.clear()
+        atomic_write(self.manifest_path, json.dumps({'version': 1, 'shards': list(self._entries.values())},
+                                                    ensure_ascii=False))
+
+    # --- Chargement --------------------------------------------------------
+
+    def begin_load(self):
+        """Lit le manifeste ; aucune catégorie n'est chargée (voir finish_load)."""
+        self.close()
+        self._shards = {}
+        self._changed = set()
+        self._stale = []
+        if not os.path.exists(self.directory):
+            self.migrate_from_json()
+        self._read_manifest()
+
+    def read_batches(self, batch_size=StorageBackend.LOAD_BATCH):
+        return iter(())  # Les catégories sont chargées à la demande
+
+    def load_batch(self, cards):
+        return []
+
+    def finish_load(self):
+        """Charge les catégories dont le manifeste n'est plus à jour."""
+        stale, self._stale = self._stale, []
+        for name in stale:
+            storage = JsonStorage(os.path.join(self.directory, name))
+            storage.load()
+            cards = storage.all_cards()
+            storage.close()
+            categories = {card.category for card in cards}
+            if len(categories) > 1 or (categories and shard_file(next(iter(categories))) != name):
+                logger.warning("%s contient des cartes d'autres catégories : elles sont déplacées.", name)
+            for category in categories:
+                if category not in self._entries:
+                    self._entries[category] = {'category': category, 'file': shard_file(category),
+                                               'files': None}
+            # Fichier relu tel quel par le JsonStorage de sa catégorie ; sinon, cartes redistribuées
+            if len(categories) == 1 and shard_file(next(iter(categories))) == name:
+                self._load(next(iter(categories)))
+                continue
+            self._remove_files(name)
+            for card in cards:
+                self._shard(card.category).add(card)
+            self._changed.update(categories)
+        return []
+
+    def _load(self, category):
+        """Charge une catégorie connue du manifeste et signale ses cartes à loaded_listener."""
+        entry = self._entries[category]
+        storage = JsonStorage(self._shard_path(entry))
+        storage.load()
+        self._shards[category] = storage
+        if self._batch:
+            storage.begin_batch()
+        entry.pop('counts', None)
+        entry.pop('next_due', None)
+        entry['files'] = None  # Recalculés à l'écriture du manifeste
+        if self.loaded_listener is not None:
+            self.loaded_listener(category, storage.all_cards())
+        return storage
+
+    def _shard(self, category):
+        """JsonStorage d'une catégorie, chargé ou créé au besoin."""
+        storage = self._shards.get(category)
+        if storage is not None:
+            return storage
+        if category in self._entries:
+            return self._load(category)
+        self._entries[category] = {'category': category, 'file': shard_file(category), 'files': None}
+        storage = self._load(category)
+        # Nouvelle catégorie inscrite tout de suite au manifeste, sans attendre la fermeture
+        self._write_manifest(update=False)
+        return storage
+
+    def require(self, category):
+        if category == ALL:
+            for name in [name for name in self._entries if name not in self._shards]:
+                self._load(name)
+        elif category in self._entries and category not in self._shards:
+            self._load(category)
+
+    def loaded_cards(self):
+        return [card for storage in self._shards.values() for card in storage.all_cards()]
+
+    def unloaded_stats(self):
+        return {category: (entry['counts'], entry['next_due'])
+                for category, entry in self._entries.items() if category not in self._shards}
+
+    def _remove_files(self, name):
+        storage = JsonStorage(os.path.join(self.directory, name))
+        for path in (storage.file_path, storage.journal_path, storage.lock_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    # --- Requêtes ----------------------------------------------------------
+
+    def _owner(self, card_id):
+        """
+        (catégorie, JsonStorage) qui contient la carte, en chargeant les autres catégories s'il
+        le faut ; None si la carte n'existe pas.
+        """
+        for category, storage in self._shards.items():
+            if storage.get(card_id) is not None:
+                return category, storage
+        if len(self._shards) < len(self._entries):
+            self.require(ALL)
+            return self._owner(card_id)
+        return None
+
+    def all_cards(self):
+        self.require(ALL)
+        return self.loaded_cards()
+
+    def get(self, card_id):
+        owner = self._owner(card_id)
+        return owner[1].get(card_id) if owner is not None else None
+
+    def find_by_question(self, question):
+        for storage in self._shards.values():
+            card = storage.find_by_question(question)
+            if card is not None:
+                return card
+        if len(self._shards) < len(self._entries):
+            self.require(ALL)
+            return self.find_by_question(question)
+        return None
+
+    def cards_by_box_and_category(self, box, category):
+        self.require(category)
+        if category == ALL:
+            return [card for storage in self._shards.values() for card in storage.cards_by_box_and_category(box, ALL)]
+        storage = self._shards.get(category)
+        return storage.cards_by_box_and_category(box, category) if storage is not None else []
+
+    def categories(self):
+        return [category for category in self._entries if category is not None]
+
+    # --- Modifications -----------------------------------------------------
+
+    def add(self, card):
+        card = Card.from_dict(card)
+        self._shard(card.category).add(card)
+        self._changed.add(card.category)
+
+    def add_many(self, cards):
+        by_category = {}
+        for card in cards:
+            card = Card.from_dict(card)
+            by_category.setdefault(card.category, []).append(card)
+        for category, group in by_category.items():
+            self._shard(category).add_many(group)
+            self._changed.add(category)
+
+    def update(self, updated_card):
+        owner = self._owner(updated_card['id'])
+        if owner is None:
+            return
+        source, storage = owner
+        card = storage.get(updated_card['id'])
+        category = updated_card.get('category') if isinstance(updated_card, Card) or 'category' in updated_card \
+            else card.category
+        self._changed.add(source)
+        if category == source:
+            storage.update(updated_card)
+            return
+        # Changement de catégorie : retirée de l'une, ajoutée à l'autre, avec la version suivante
+        version = (card.version or 0) + 1
+        storage.delete(card.id)
+        if card is not updated_card:
+            card.update(updated_card)
+        card.version = version
+        self._shard(card.category).add(card)
+        self._changed.add(card.category)
+
+    def delete(self, card_id):
+        owner = self._owner(card_id)
+        if owner is not None:
+            owner[1].delete(card_id)
+            self._changed.add(owner[0])
+
+    def move(self, card_id, new_box):
+        owner = self._owner(card_id)
+        if owner is not None:
+            owner[1].move(card_id, new_box)
+            self._changed.add(owner[0])
+
+    # --- Transactions ------------------------------------------------------
+
+    # Chaque catégorie chargée ouvre sa transaction ; une catégorie chargée pendant la
+    # transaction en ouvre une dès son chargement (voir _load).
+
+    def begin_batch(self):
+        self._batch = True
+        for storage in self._shards.values():
+            storage.begin_batch()
+
+    def commit_batch(self):
+        self._batch = False
+        for storage in self._shards.values():
+            storage.commit_batch()
+
+    def rollback_batch(self):
+        self._batch = False
+        for storage in self._shards.values():
+            storage.rollback_batch()
+
+    # --- Persistance -------------------------------------------------------
+
+    def watched_paths(self):
+        return [path for storage in self._shards.values() for path in storage.watched_paths()]
+
+    def sync(self):
+        changes, conflicts = [], []
+        for category, storage in self._shards.items():
+            shard_changes, shard_conflicts = storage.sync()
+            if shard_changes:
+                self._changed.add(category)
+            changes.extend(shard_changes)
+            conflicts.extend(shard_conflicts)
+        return changes, conflicts
+
+    def save(self):
+        """Réécrit les catégories modifiées (et elles seules), puis le manifeste."""
+        for category in self._changed:
+            storage = self._shards.get(category)
+            if storage is not None:
+                storage.save()
+        self.flush()
+        self._write_manifest()
+
+    def compact(self):
+        for category in self._changed:
+            storage = self._shards.get(category)
+            if storage is not None:
+                storage.compact()
+
+    def flush(self):
+        for storage in self._shards.values():
+            storage.flush()
+
+    def close(self):
+        """Termine les écritures, retire les catégories devenues vides et écrit le manifeste."""
+        if not self._shards and not self._changed:
+            return
+        for storage in self._shards.values():
+            storage.close()
+        for category, storage in list(self._shards.items()):
+            if not storage.all_cards():
+                del self._shards[category]
+                self._remove_files(self._entries.pop(category)['file'])
+                self._changed.discard(category)
+        self._write_manifest()
+        self._shards = {}
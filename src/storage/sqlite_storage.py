@@ -0,0 +1,369 @@
+import json
+import sqlite3
+from contextlib import contextmanager
+
+from ..card import Card, to_epoch
+from ..scheduler import next_due_timestamp
+from .base import Conflict, StorageBackend, new_card_id
+from .json_storage import JsonStorage
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cards (
+    id TEXT,
+    question TEXT NOT NULL,
+    command TEXT,
+    box INTEGER,
+    category TEXT,
+    last_revision TEXT,
+    next_due REAL,
+    extra TEXT,
+    version INTEGER NOT NULL DEFAULT 0,
+    seq INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_cards_box_category_due ON cards (box, category, next_due);
+CREATE INDEX IF NOT EXISTS idx_cards_box_due ON cards (box, next_due);
+CREATE INDEX IF NOT EXISTS idx_cards_category ON cards (category);
+CREATE INDEX IF NOT EXISTS idx_cards_question ON cards (question);
+CREATE INDEX IF NOT EXISTS idx_cards_last_revision ON cards (last_revision);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS tombstones (
+    id TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('seq', 0);
+"""
+
+# Champs stockés dans des colonnes dédiées ; les autres vont dans la colonne JSON "extra"
+COLUMNS = ('id', 'question', 'command', 'box', 'category', 'last_revision', 'version')
+
+SELECT = "SELECT id, question, command, box, category, last_revision, extra, version FROM cards "
+INSERT = ("INSERT INTO cards (id, question, command, box, category, last_revision, next_due, extra, version, seq) "
+          "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+# La ligne n'est modifiée que si sa version est celle sur laquelle s'appuie la modification
+UPDATE = ("UPDATE cards SET question = ?, command = ?, box = ?, category = ?, "
+          "last_revision = ?, next_due = ?, extra = ?, version = ?, seq = ? WHERE id = ? AND version = ?")
+
+
+class SqliteStorage(StorageBackend):
+    """
+    Stockage SQLite : requêtes indexées et écritures ligne par ligne.
+
+    Plusieurs processus peuvent partager la base : chaque écriture prend un numéro d'ordre
+    (meta 'seq') enregistré sur la ligne modifiée, ou dans `tombstones` pour une suppression ;
+    sync() relit les lignes écrites depuis, et seulement si `PRAGMA data_version` a changé.
+    Une modification ne s'applique que si la ligne a encore la version de la carte en mémoire :
+    sinon la carte reprend la version de la base et le conflit est signalé par sync().
+    """
+
+    def __init__(self, db_path="leitner_cards.db", json_path="leitner_cards.json"):
+        self.db_path = db_path
+        self.json_path = json_path  # Ancien deck JSON importé au premier lancement
+        self.conn = None
+        self._cards = {}  # id -> carte déjà renvoyée, pour toujours rendre le même objet
+        self._deleted = None  # Cartes supprimées pendant un chargement progressif, à ne pas réintégrer
+        self._seq = 0  # Dernière écriture (meta 'seq') déjà intégrée
+        self._data_version = None
+        self._changes = []  # (événement, carte) et conflits constatés à l'écriture, renvoyés par sync()
+        self._conflicts = []
+        self._batch = None  # Transaction en cours : id -> carte en cache à sa première modification
+
+    def load(self):
+        # Les cartes sont lues à la demande, requête par requête
+        self.begin_load()
+        self.finish_load()
+
+    def begin_load(self):
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._migrate_ids()
+        self._cards.clear()
+        self._deleted = set()
+        self.migrate_from_json()
+        self._seq = self._current_seq()
+        self._data_version = self._read_data_version()
+
+    def _migrate_ids(self):
+        """Ajoute la colonne id aux bases créées avant les identifiants stables et la remplit."""
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(cards)")]
+        with self.conn:
+            if 'id' not in columns:
+                self.conn.execute("ALTER TABLE cards ADD COLUMN id TEXT")
+            # Versions et numéros d'ordre, pour les bases créées avant le partage entre processus
+            for column in ('version', 'seq'):
+                if column not in columns:
+                    self.conn.execute(f"ALTER TABLE cards ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+            self.conn.execute("UPDATE cards SET id = lower(hex(randomblob(16))) WHERE id IS NULL")
+            self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_cards_id ON cards (id)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_cards_seq ON cards (seq)")
+
+    def migrate_from_json(self):
+        """Importe une seule fois le deck JSON existant (instantané et journal) dans la base."""
+        if self.conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_from_json'").fetchone():
+            return
+
+        # Le deck JSON peut n'exister que sous forme de journal : JsonStorage gère les deux cas
+        source = JsonStorage(self.json_path)
+        source.load()
+        rows = [self._to_row(card, 0) for card in source.all_cards()]
+        source.close()
+
+        with self.conn:
+            self.conn.executemany(INSERT, rows)
+            self.conn.execute("INSERT INTO meta (key, value) VALUES ('migrated_from_json', ?)",
+                              (self.json_path,))
+
+    def _to_row(self, card, seq):
+        extra = {key: value for key, value in card.items() if key not in COLUMNS}
+        return (card['id'], card['question'], card.get('command'), card.get('box'), card.get('category'),
+                card.get('last_revision'), next_due_timestamp(card),
+                json.dumps(extra) if extra else None, card.get('version') or 0, seq)
+
+    def read_batches(self, batch_size=StorageBackend.LOAD_BATCH):
+        """Parcourt la table par lots, sur une connexion propre au thread appelant ; l'avancement est en lignes."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            total = conn.execute("SELECT COUNT(*) FROM cards").fetchone()[0]
+            cursor = conn.execute(SELECT + "ORDER BY rowid")
+            done = 0
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                done += len(rows)
+                yield [self._row_to_card(row) for row in rows], done, total
+        finally:
+            conn.close()
+
+    def finish_load(self):
+        self._deleted = None
+        return []
+
+    def load_batch(self, cards):
+        loaded = []
+        for card in cards:
+            # Une carte déjà renvoyée par une requête garde son objet ; une carte supprimée entre-temps est ignorée
+            if card.id not in self._cards and card.id not in self._deleted:
+                self._cards[card.id] = card
+                loaded.append(card)
+        return loaded
+
+    @staticmethod
+    def _row_to_card(row):
+        return Card(*row[:5], revised_at=to_epoch(row[5]), extra=json.loads(row[6]) if row[6] else None,
+                    version=row[7] or None)
+
+    def _to_card(self, row):
+        """Construit (ou réutilise) la carte associée à une ligne (colonnes..., extra)."""
+        card = self._cards.get(row[0])
+        if card is None:
+            card = self._cards[row[0]] = self._row_to_card(row)
+        return card
+
+    def _select(self, where="", params=()):
+        return [self._to_card(row) for row in self.conn.execute(SELECT + where, params)]
+
+    def all_cards(self):
+        return self._select("ORDER BY rowid")
+
+    def get(self, card_id):
+        if card_id in self._cards:
+            return self._cards[card_id]
+        cards = self._select("WHERE id = ?", (card_id,))
+        return cards[0] if cards else None
+
+    def find_by_question(self, question):
+        cards = self._select("WHERE question = ? ORDER BY rowid LIMIT 1", (question,))
+        return cards[0] if cards else None
+
+    def cards_by_box_and_category(self, box, category):
+        if category == "All":
+            return self._select("WHERE box = ? ORDER BY rowid", (box,))
+        return self._select("WHERE box = ? AND category = ? ORDER BY rowid", (box, category))
+
+    def categories(self):
+        rows = self.conn.execute("SELECT DISTINCT category FROM cards WHERE category IS NOT NULL")
+        return [row[0] for row in rows]
+
+    def _next_seq(self):
+        """Numéro d'ordre de l'écriture en cours (à appeler dans sa transaction)."""
+        self.conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'seq'")
+        return self._current_seq()
+
+    def _current_seq(self):
+        return int(self.conn.execute("SELECT value FROM meta WHERE key = 'seq'").fetchone()[0])
+
+    def _read_data_version(self):
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    @contextmanager
+    def _transaction(self):
+        """Transaction d'une modification, ou celle de begin_batch() qui l'englobe."""
+        if self._batch is not None:
+            yield
+        else:
+            with self.conn:
+                yield
+
+    def _touch(self, card_id):
+        if self._batch is not None and card_id not in self._batch:
+            self._batch[card_id] = self._cards.get(card_id)
+
+    def begin_batch(self):
+        self._batch = {}
+
+    def commit_batch(self):
+        self._batch = None
+        self.conn.commit()
+
+    def rollback_batch(self):
+        """Annule la transaction et rend aux cartes en cache leur état enregistré."""
+        touched, self._batch = self._batch, None
+        self.conn.rollback()
+        for card_id, card in touched.items():
+            rows = self.conn.execute(SELECT + "WHERE id = ?", (card_id,)).fetchall()
+            if rows and card is not None:
+                card.update(self._row_to_card(rows[0]))
+                self._cards[card_id] = card
+                if self._deleted is not None:
+                    self._deleted.discard(card_id)
+            else:
+                self._cards.pop(card_id, None)
+
+    def add(self, card):
+        if 'id' not in card:
+            card['id'] = new_card_id()
+        self._touch(card['id'])
+        with self._transaction():
+            self.conn.execute(INSERT, self._to_row(card, self._next_seq()))
+        self._cards[card['id']] = card
+
+    def add_many(self, cards):
+        for card in cards:
+            if 'id' not in card:
+                card['id'] = new_card_id()
+            self._touch(card['id'])
+        with self._transaction():  # Une seule transaction pour tout le lot
+            seq = self._next_seq()
+            self.conn.executemany(INSERT, [self._to_row(card, seq) for card in cards])
+        for card in cards:
+            self._cards[card['id']] = card
+
+    def update(self, updated_card):
+        self.update_many([updated_card])
+
+    def update_many(self, cards):
+        lost = []
+        with self._transaction():  # Une seule transaction pour tout le lot
+            seq = self._next_seq()
+            for updated_card in cards:
+                card = self.get(updated_card['id'])
+                if card is None:
+                    continue
+                self._touch(card.id)
+                base = card.version or 0
+                if card is not updated_card:
+                    card.update(updated_card)
+                card.version = base + 1
+                row = self._to_row(card, seq)
+                if not self.conn.execute(UPDATE, row[1:] + (card['id'], base)).rowcount:
+                    lost.append(card)
+        for card in lost:
+            self._lost(card, card.to_dict())
+
+    def delete(self, card_id):
+        card = self.get(card_id)
+        base = card.version or 0 if card is not None else 0
+        self._touch(card_id)
+        with self._transaction():
+            seq = self._next_seq()
+            written = self.conn.execute("DELETE FROM cards WHERE id = ? AND version = ?", (card_id, base)).rowcount
+            if written:
+                self.conn.execute("INSERT OR REPLACE INTO tombstones (id, seq) VALUES (?, ?)", (card_id, seq))
+        self._cards.pop(card_id, None)
+        if self._deleted is not None:
+            self._deleted.add(card_id)
+        if not written and card is not None:
+            self._lost(card, None)
+
+    def move(self, card_id, new_box):
+        card = self.get(card_id)
+        if card is None:
+            return
+        self._touch(card_id)
+        base = card.version or 0
+        card['box'] = new_box
+        card.version = base + 1
+        with self._transaction():
+            written = self.conn.execute(
+                "UPDATE cards SET box = ?, next_due = ?, version = ?, seq = ? WHERE id = ? AND version = ?",
+                (new_box, next_due_timestamp(card), card.version, self._next_seq(), card_id, base)).rowcount
+        if not written:
+            self._lost(card, card.to_dict())
+
+    def _lost(self, card, local):
+        """
+        La base n'avait plus la version de la carte connue ici : une autre instance l'a modifiée
+        ou supprimée. La carte reprend l'état de la base ; le conflit est rendu par sync().
+        `local` est la modification perdue (None pour une suppression).
+        """
+        rows = self.conn.execute(SELECT + "WHERE id = ?", (card.id,)).fetchall()
+        if rows:
+            remote = self._row_to_card(rows[0])
+            card.update(remote)
+            self._cards[card.id] = card
+            if self._deleted is not None:
+                self._deleted.discard(card.id)
+            self._changes.append(('updated' if local is not None else 'added', card))
+            self._conflicts.append(Conflict(card.id, local, remote.to_dict()))
+        else:
+            self._cards.pop(card.id, None)
+            self._changes.append(('deleted', card))
+            self._conflicts.append(Conflict(card.id, local, None))
+
+    @property
+    def path(self):
+        return self.db_path
+
+    def watched_paths(self):
+        return [self.db_path, self.db_path + "-wal"]
+
+    def sync(self):
+        """Relit les lignes écrites par d'autres connexions depuis le dernier appel (seq croissant)."""
+        changes, self._changes = self._changes, []
+        conflicts, self._conflicts = self._conflicts, []
+        if self.conn is None:
+            return changes, conflicts
+        data_version = self._read_data_version()
+        if data_version == self._data_version:
+            return changes, conflicts  # Aucune écriture d'une autre connexion
+        self._data_version = data_version
+        seq = self._seq
+        self._seq = self._current_seq()
+        for row in self.conn.execute(SELECT + "WHERE seq > ? AND seq <= ?", (seq, self._seq)):
+            card = self._cards.get(row[0])
+            if card is None:
+                if self._deleted is None or row[0] not in self._deleted:
+                    card = self._cards[row[0]] = self._row_to_card(row)
+                    changes.append(('added', card))
+            elif (card.version or 0) != row[7]:
+                card.update(self._row_to_card(row))
+                changes.append(('updated', card))
+        for (card_id,) in self.conn.execute("SELECT id FROM tombstones WHERE seq > ? AND seq <= ?", (seq, self._seq)):
+            card = self._cards.pop(card_id, None)
+            if card is not None:
+                changes.append(('deleted', card))
+        return changes, conflicts
+
+    def save(self):
+        # Chaque modification est déjà validée dans sa propre transaction
+        self.conn.commit()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
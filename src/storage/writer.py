@@ -0,0 +1,146 @@
+import atexit
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou entre processus
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def atomic_write(path, data):
+    """
+    Écrit `data` (str, ou octets) dans `path` sans jamais laisser de fichier à moitié écrit :
+    fichier temporaire, fsync, puis renommage atomique. Renvoie la taille écrite, en octets.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w" if isinstance(data, str) else "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+        size = os.fstat(file.fileno()).st_size
+    os.replace(tmp_path, path)
+    fsync_directory(path)
+    return size
+
+
+def fsync_directory(path):
+    """Rend durable un renommage en synchronisant le répertoire parent (POSIX uniquement)."""
+    if os.name != "posix":
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class FileLock:
+    """
+    Verrou exclusif entre processus (flock) sur un fichier annexe, à utiliser avec `with`.
+    Chaque `with` ouvre son propre descripteur : deux threads d'un même processus s'excluent aussi.
+    Sans fcntl (Windows), le verrou ne fait rien.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._files = threading.local()
+
+    def __enter__(self):
+        file = open(self.path, "a")
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        self._files.file = file
+        return self
+
+    def __exit__(self, *exc_info):
+        file = self._files.file
+        self._files.file = None
+        file.close()  # Libère le verrou
+
+
+class WriteBehindWorker:
+    """
+    Thread d'écriture différée.
+
+    Les modifications marquent le stockage comme « sale » et rendent la main aussitôt ;
+    le thread attend un court délai pour regrouper une rafale de modifications, puis
+    appelle `write` une seule fois. flush() attend que tout soit écrit ; close() est
+    aussi appelé à la sortie du programme.
+    """
+
+    def __init__(self, write, delay=0.2, name="leitner-writer"):
+        self._write = write  # Appelé dans le thread d'écriture, sans argument
+        self.delay = delay  # Fenêtre de regroupement, en secondes
+        self._name = name
+        self._cond = threading.Condition()
+        self._dirty = False
+        self._writing = False
+        self._urgent = False  # flush() demandé : inutile d'attendre la fin de la rafale
+        self._closed = False
+        self._thread = None
+        self.error = None  # Dernière erreur d'écriture, relancée par flush()
+
+    def mark_dirty(self):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Le stockage est fermé.")
+            self._dirty = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._dirty and not self._closed:
+                    self._cond.wait()
+                if not self._dirty:
+                    return  # Fermé et plus rien à écrire
+                deadline = time.monotonic() + self.delay
+                while not self._closed and not self._urgent:  # Laisse la rafale se terminer
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                self._dirty = False
+                self._urgent = False
+                self._writing = True
+            try:
+                self._write()
+                self.error = None
+            except Exception as error:
+                logger.exception("Échec de l'écriture différée du deck")
+                self.error = error
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+    def flush(self):
+        """Attend que toutes les modifications en attente soient écrites."""
+        with self._cond:
+            if self._thread is not None:
+                self._urgent = self._dirty
+                self._cond.notify_all()
+                while self._dirty or self._writing:
+                    self._cond.wait()
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        """Écrit ce qui reste puis arrête le thread."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+            atexit.unregister(self.close)
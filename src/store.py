@@ -0,0 +1,154 @@
+import os
+
+from PySide6.QtCore import QFileSystemWatcher, QObject, QTimer, Signal # type: ignore
+from .loader import DeckLoader
+from .model import LeitnerService
+from .storage import DeckInUseError
+
+class CardStore(QObject):
+    """
+    Deck partagé par toutes les fenêtres de l'application.
+
+    Un seul LeitnerService est chargé au démarrage ; chaque modification est relayée
+    sous forme de signal Qt pour que les fenêtres ouvertes se mettent à jour sans
+    relire le fichier. Les modifications faites par un autre processus (autre instance de
+    l'application, ligne de commande) sont intégrées par service.sync() dès qu'un fichier du
+    deck change, et au plus tard toutes les SYNC_POLL_MS.
+    """
+
+    cardAdded = Signal(object)
+    cardUpdated = Signal(object)
+    cardDeleted = Signal(object)
+    cardMoved = Signal(object)
+    cardsAdded = Signal(object)  # Lot de cartes ajouté en une fois (import)
+    cardsRescheduled = Signal(object)  # Échéances recalculées (changement d'algorithme de planification)
+    cardsLoaded = Signal(object)  # Lot de cartes arrivé pendant un chargement progressif
+    loadProgress = Signal(int)  # Pourcentage du deck lu
+    loadFinished = Signal()
+    loadFailed = Signal(str)
+    conflictsDetected = Signal(object)  # Modifications locales perdues (liste de Conflict)
+    categoriesChanged = Signal(object)  # Liste des catégories, quand une catégorie apparaît ou disparaît
+
+    LOAD_POLL_MS = 10  # Intervalle de consultation des lots pendant le chargement
+    SYNC_DELAY_MS = 100  # Une rafale d'écritures d'un autre processus ne déclenche qu'un sync
+    SYNC_POLL_MS = 2000  # Filet de sécurité si la surveillance des fichiers manque un changement
+
+    def __init__(self, service=None, parent=None):
+        super().__init__(parent)
+        self.service = service if service is not None else LeitnerService()
+        self._loader = None
+        self._load_started = False
+        self._signals = {
+            'added': self.cardAdded,
+            'updated': self.cardUpdated,
+            'deleted': self.cardDeleted,
+            'moved': self.cardMoved,
+            'added_many': self.cardsAdded,
+            'rescheduled': self.cardsRescheduled,
+            'conflicts': self.conflictsDetected,
+            'categories': self.categoriesChanged,
+        }
+        self.service.add_listener(self._relay)
+        self._sync_timer = QTimer(self)
+        self._sync_timer.setSingleShot(True)
+        self._sync_timer.timeout.connect(self.sync)
+        self._poll_timer = QTimer(self)
+        self._poll_timer.setInterval(self.SYNC_POLL_MS)
+        self._poll_timer.timeout.connect(self.sync)
+        self._watcher = None
+
+    def _relay(self, event, card):
+        self._signals[event].emit(card)
+
+    def connect_all(self, slot):
+        """Connecte un même slot à tous les signaux de modification d'une carte."""
+        for event, signal in self._signals.items():
+            if event not in ('added_many', 'rescheduled', 'conflicts', 'categories'):
+                signal.connect(slot)
+
+    @property
+    def loading(self):
+        return self.service.loading
+
+    def start_loading(self):
+        """
+        Charge le deck dans un thread : les fenêtres reçoivent les cartes par lots (cardsLoaded)
+        et peuvent s'afficher sans attendre la fin de la lecture (loadFinished).
+        """
+        self._load_started = True
+        try:
+            self.service.begin_loading()
+        except DeckInUseError as error:  # Deck binaire ouvert par une autre instance : rien n'est chargé
+            self.loadFailed.emit(str(error))
+            return
+        self._loader = DeckLoader(self.service.storage.read_batches())
+        # Les lots sont intégrés par le thread de l'interface, un par passage de la boucle d'événements
+        self._load_timer = QTimer(self)
+        self._load_timer.setInterval(self.LOAD_POLL_MS)
+        self._load_timer.timeout.connect(self._integrate_batch)
+        self._loader.start()
+        self._load_timer.start()
+
+    def ensure_loading(self):
+        """Lance le chargement du deck s'il n'a pas encore été demandé (première fenêtre qui en a besoin)."""
+        if not self._load_started:
+            self.start_loading()
+
+    def cancel_loading(self):
+        """Interrompt la lecture en cours ; le deck reste partiel et aucun instantané n'est écrit."""
+        if self._loader is not None:
+            self._load_timer.stop()
+            self._loader.cancel()
+            self._loader = None
+
+    def _integrate_batch(self):
+        item = self._loader.poll()
+        if item is not None:
+            cards, percent = item
+            self.cardsLoaded.emit(self.service.load_batch(cards))
+            self.loadProgress.emit(percent)
+            self._load_timer.setInterval(0)  # D'autres lots sont sans doute déjà prêts
+            return
+        self._load_timer.setInterval(self.LOAD_POLL_MS)
+        if not self._loader.finished:
+            return
+
+        loader, self._loader = self._loader, None
+        self._load_timer.stop()
+        if loader.error is not None:
+            self.loadFailed.emit(str(loader.error))
+            return
+        self.service.finish_loading()
+        self.loadFinished.emit()
+        self.watch()
+
+    def watch(self):
+        """Surveille les fichiers du deck (et leurs dossiers, pour les fichiers remplacés ou créés)."""
+        paths = self.service.storage.watched_paths()
+        if not paths:
+            return
+        self._watcher = QFileSystemWatcher(self)
+        directories = {os.path.dirname(os.path.abspath(path)) for path in paths}
+        self._watcher.addPaths([path for path in paths if os.path.exists(path)] + sorted(directories))
+        self._watcher.fileChanged.connect(self._schedule_sync)
+        self._watcher.directoryChanged.connect(self._schedule_sync)
+        self._poll_timer.start()
+
+    def _schedule_sync(self, path):
+        if self._watcher is not None and path not in self._watcher.files() and os.path.isfile(path):
+            self._watcher.addPath(path)  # Fichier remplacé (écriture atomique) : surveillé à nouveau
+        self._sync_timer.start(self.SYNC_DELAY_MS)
+
+    def sync(self):
+        """Intègre les modifications des autres processus (voir LeitnerService.sync)."""
+        if not self.loading:
+            self.service.sync()
+
+    def close(self):
+        """Ferme le stockage sous-jacent (à appeler à la fermeture de l'application)."""
+        self.cancel_loading()
+        self._poll_timer.stop()
+        self._sync_timer.stop()
+        self._watcher = None
+        self.service.remove_listener(self._relay)
+        self.service.close()
@@ -0,0 +1,333 @@
+"""
+Import et export des cartes en masse : CSV, JSON Lines et texte tabulé façon Anki.
+
+Les fichiers sont lus et écrits en flux (générateurs), et les cartes ajoutées par lots
+(LeitnerService.add_cards) : un import ne garde en mémoire que le lot en cours.
+
+Les questions déjà présentes sont ignorées ; les cartes qui ressemblent à une carte du deck ou du
+fichier (quasi-doublons, voir duplicates.py) sont signalées dans le rapport, ou ignorées avec
+near_duplicates='skip'.
+
+Utilisation en ligne de commande :
+    python -m src.transfer import cartes.csv [--format csv] [--category git] [--near-duplicates skip]
+    python -m src.transfer export cartes.jsonl [--category git]
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from itertools import islice
+
+from .card import to_epoch
+from .model import LeitnerService
+from .storage import DeckInUseError
+
+IMPORT_BATCH = 5000  # Cartes ajoutées par écriture
+NEAR_DUPLICATES = ('keep', 'skip')  # Quasi-doublons importés (et signalés) ou ignorés
+MAX_REPORTED_ERRORS = 20  # Lignes invalides détaillées dans le rapport
+NUM_BOXES = 5
+
+# Colonnes exportées, dans l'ordre ; l'identifiant n'est pas exporté (propre à chaque deck)
+EXPORT_FIELDS = ('question', 'command', 'category', 'box', 'last_revision')
+
+
+class ImportReport:
+    """Bilan d'un import, mis à jour après chaque lot."""
+
+    def __init__(self):
+        self.added = 0
+        self.duplicates = 0  # Questions déjà présentes dans le deck ou dans le fichier
+        self.similar = 0  # Quasi-doublons d'une carte du deck ou du fichier (importés ou ignorés)
+        self.similar_skipped = False
+        self.examples = []  # (numéro de ligne, question, question semblable), limité à MAX_REPORTED_ERRORS
+        self.invalid = 0
+        self.errors = []  # (numéro de ligne, message), limité à MAX_REPORTED_ERRORS
+        self.progress = 0  # Pourcentage du fichier lu
+
+    def add_error(self, line, message):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def __str__(self):
+        lines = [f"{self.added} carte(s) importée(s), {self.duplicates} doublon(s) ignoré(s), "
+                 f"{self.invalid} ligne(s) invalide(s)."]
+        lines += [f"  ligne {line} : {message}" for line, message in self.errors]
+        if self.invalid > len(self.errors):
+            lines.append(f"  ... et {self.invalid - len(self.errors)} autre(s)")
+        if self.similar:
+            lines.append(f"{self.similar} quasi-doublon(s) {'ignoré(s)' if self.similar_skipped else 'importé(s)'} :")
+            lines += [f"  ligne {line} : « {question} » ressemble à « {other} »" for line, question, other in self.examples]
+            if self.similar > len(self.examples):
+                lines.append(f"  ... et {self.similar - len(self.examples)} autre(s)")
+        return "\n".join(lines)
+
+    def add_similar(self, line, question, other):
+        self.similar += 1
+        if len(self.examples) < MAX_REPORTED_ERRORS:
+            self.examples.append((line, question, other))
+
+
+# --- Lecture -----------------------------------------------------------------
+
+class _ByteCounter:
+    """Fichier texte lu en flux, dont on peut connaître la part déjà lue (en octets)."""
+
+    def __init__(self, path):
+        self.raw = open(path, "rb")
+        self.size = os.path.getsize(path)
+        self.text = io.TextIOWrapper(self.raw, encoding="utf-8-sig", newline="")
+
+    @property
+    def progress(self):
+        return min(100, self.raw.tell() * 100 // self.size) if self.size else 100
+
+    def close(self):
+        self.text.close()
+
+
+def read_csv(file):
+    """Lignes d'un CSV avec en-tête (question, command, category, box, last_revision)."""
+    reader = csv.DictReader(file)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_jsonl(file):
+    """Un objet JSON par ligne ; les lignes vides sont ignorées."""
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as error:
+            yield number, ValueError(f"JSON invalide ({error.msg})")
+            continue
+        yield number, row if isinstance(row, dict) else ValueError("objet JSON attendu")
+
+
+def read_anki(file):
+    """
+    Texte tabulé exporté par Anki (« Notes en texte brut ») : recto, verso et, en option,
+    les étiquettes, dont la première sert de catégorie. Les lignes d'en-tête « # » sont ignorées.
+    """
+    for number, line in enumerate(file, 1):
+        line = line.rstrip("\r\n")
+        if not line or line.startswith("#"):
+            continue
+        fields = line.split("\t")
+        row = {'question': fields[0], 'command': fields[1] if len(fields) > 1 else ""}
+        if len(fields) > 2 and fields[2].split():
+            row['category'] = fields[2].split()[0]
+        yield number, row
+
+
+# --- Écriture ----------------------------------------------------------------
+
+def write_csv(file, cards):
+    writer = csv.DictWriter(file, fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    for card in cards:
+        writer.writerow(_export_row(card))
+
+
+def write_jsonl(file, cards):
+    for card in cards:
+        file.write(json.dumps(_export_row(card), ensure_ascii=False) + "\n")
+
+
+def write_anki(file, cards):
+    file.write("#separator:tab\n#html:false\n#tags column:3\n")
+    for card in cards:
+        fields = (card['question'], card.get('command', ''), (card.get('category') or '').replace(' ', '_'))
+        file.write("\t".join(field.replace("\t", " ").replace("\n", " ") for field in fields) + "\n")
+
+
+def _export_row(card):
+    return {field: card[field] for field in EXPORT_FIELDS if field in card}
+
+
+FORMATS = {
+    'csv': (read_csv, write_csv),
+    'jsonl': (read_jsonl, write_jsonl),
+    'anki': (read_anki, write_anki),
+}
+EXTENSIONS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.tsv': 'anki', '.txt': 'anki'}
+
+
+def guess_format(path):
+    """Format déduit de l'extension du fichier."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in EXTENSIONS:
+        raise ValueError(f"Format inconnu pour {path} (extensions reconnues : {', '.join(EXTENSIONS)})")
+    return EXTENSIONS[extension]
+
+
+# --- Import ------------------------------------------------------------------
+
+def validate(row, default_category=None):
+    """Carte (dictionnaire) construite à partir d'une ligne lue ; lève ValueError si elle est invalide."""
+    if isinstance(row, Exception):
+        raise row
+    question = (row.get('question') or '').strip()
+    command = (row.get('command') or '').strip()
+    if not question:
+        raise ValueError("question manquante")
+    if not command:
+        raise ValueError("réponse (command) manquante")
+    card = {'question': question, 'command': command, 'box': 0}
+    box = row.get('box')
+    if box not in (None, ''):
+        try:
+            card['box'] = int(box)
+        except (TypeError, ValueError):
+            raise ValueError(f"boîte invalide : {box!r}")
+        if not 0 <= card['box'] < NUM_BOXES:
+            raise ValueError(f"boîte hors limites : {box!r}")
+    category = (row.get('category') or '').strip() or default_category
+    if category:
+        card['category'] = category
+    last_revision = row.get('last_revision')
+    if last_revision:
+        try:
+            card['last_revision'] = to_epoch(last_revision)
+        except (TypeError, ValueError):
+            raise ValueError(f"date de révision invalide : {last_revision!r}")
+    return card
+
+
+def iter_import(service, path, format=None, default_category=None, batch_size=IMPORT_BATCH,
+                near_duplicates='keep'):
+    """
+    Importe un fichier par lots ; produit le rapport (ImportReport) après chaque lot, ce qui
+    permet d'afficher l'avancement ou d'interrompre l'import entre deux lots.
+    Les questions déjà présentes dans le deck, ou plus haut dans le fichier, sont ignorées.
+    Les quasi-doublons (LeitnerService.find_similar_many, un lot à la fois) sont importés et
+    signalés avec near_duplicates='keep', ignorés avec 'skip'.
+    """
+    if near_duplicates not in NEAR_DUPLICATES:
+        raise ValueError(f"Traitement des quasi-doublons inconnu : {near_duplicates}")
+    read = FORMATS[format or guess_format(path)][0]
+    report = ImportReport()
+    report.similar_skipped = near_duplicates == 'skip'
+    source = _ByteCounter(path)
+    try:
+        rows = read(source.text)
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                break
+            batch, numbers = [], []
+            seen = set()  # Questions du lot ; celles des lots précédents sont déjà dans le deck
+            for number, row in chunk:
+                try:
+                    card = validate(row, default_category)
+                except ValueError as error:
+                    report.add_error(number, str(error))
+                    continue
+                if card['question'] in seen or service.get_card_by_question(card['question']) is not None:
+                    report.duplicates += 1
+                    continue
+                seen.add(card['question'])
+                batch.append(card)
+                numbers.append(number)
+            batch = _check_similar(service, batch, numbers, report)
+            report.added += len(service.add_cards(batch))
+            report.progress = source.progress
+            yield report
+    finally:
+        source.close()
+        if report.added:
+            service.compact()  # Un seul instantané pour tout l'import
+
+
+def _check_similar(service, batch, numbers, report):
+    """Signale les quasi-doublons du lot ; renvoie les cartes à ajouter."""
+    kept = []
+    kept_positions = set()  # Cartes du lot conservées : un quasi-doublon ignoré ne compte pas
+    for position, (matches, earlier) in enumerate(service.find_similar_many(batch)):
+        earlier = [(other, similarity) for other, similarity in earlier if other in kept_positions]
+        if matches or earlier:
+            other = matches[0][0]['question'] if matches else batch[earlier[0][0]]['question']
+            report.add_similar(numbers[position], batch[position]['question'], other)
+            if report.similar_skipped:
+                continue
+        kept.append(batch[position])
+        kept_positions.add(position)
+    return kept
+
+
+def import_cards(service, path, format=None, default_category=None, batch_size=IMPORT_BATCH,
+                 near_duplicates='keep'):
+    """Importe un fichier en entier et renvoie le rapport."""
+    report = ImportReport()
+    for report in iter_import(service, path, format, default_category, batch_size, near_duplicates):
+        pass
+    return report
+
+
+# --- Export ------------------------------------------------------------------
+
+def export_cards(service, path, format=None, category=None):
+    """Écrit les cartes (d'une catégorie, ou toutes) dans un fichier ; renvoie le nombre de cartes écrites."""
+    write = FORMATS[format or guess_format(path)][1]
+    cards = service.get_all_cards()
+    if category is not None:
+        cards = [card for card in cards if card.get('category') == category]
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as file:
+        write(file, cards)
+    os.replace(tmp_path, path)
+    return len(cards)
+
+
+# --- Ligne de commande -------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.transfer", description="Import et export des cartes en masse.")
+    parser.add_argument("action", choices=("import", "export"))
+    parser.add_argument("path", help="fichier à importer ou à écrire")
+    parser.add_argument("--format", choices=sorted(FORMATS), help="par défaut, déduit de l'extension")
+    parser.add_argument("--category", help="import : catégorie des cartes qui n'en ont pas ; export : catégorie à exporter")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH)
+    parser.add_argument("--near-duplicates", choices=NEAR_DUPLICATES, default='keep',
+                        help="import : quasi-doublons importés et signalés (keep) ou ignorés (skip)")
+    args = parser.parse_args(argv)
+
+    try:
+        format = args.format or guess_format(args.path)
+    except ValueError as error:
+        parser.error(str(error))
+
+    try:
+        service = LeitnerService()
+    except DeckInUseError as error:  # Deck binaire ouvert par l'application
+        print(error, file=sys.stderr)
+        return 1
+    try:
+        if args.action == "import":
+            report = ImportReport()
+            try:
+                for report in iter_import(service, args.path, format, args.category, args.batch_size,
+                                          args.near_duplicates):
+                    print(f"\r{report.progress:3d} % - {report.added} carte(s) importée(s)", end="", file=sys.stderr)
+            except (OSError, ValueError) as error:  # Fichier illisible, mal encodé (UnicodeDecodeError)...
+                # Comme dans la fenêtre d'import : les lots déjà importés sont conservés
+                print(file=sys.stderr)
+                print(f"Import interrompu : {error}", file=sys.stderr)
+                print(report, file=sys.stderr)
+                return 1
+            print(file=sys.stderr)
+            print(report)
+        else:
+            count = export_cards(service, args.path, format, args.category)
+            print(f"{count} carte(s) exportée(s) dans {args.path}.")
+    finally:
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,21 @@
 from PySide6.QtWidgets import QVBoxLayout, QPushButton, QLineEdit, QTextEdit, QComboBox, QWidget, QMessageBox # type: ignore
-from PySide6.QtCore import Qt, QEvent # type: ignore
-from src.model import LeitnerService
+from PySide6.QtCore import Qt, QEvent, QTimer # type: ignore
+from .category_combo import fill_categories
 
 class AddCardView(QWidget):
-    def __init__(self):
+    def __init__(self, store):
         super().__init__()
-        self.leitner_service = LeitnerService()  # Vous pourriez vouloir passer le service comme argument
+        self.setAttribute(Qt.WA_DeleteOnClose)  # Libère la fenêtre (et ses connexions) à la fermeture
+        self.store = store
+        self.leitner_service = store.service  # Deck partagé : aucune lecture de fichier à l'ouverture
         self.init_add_card_view()
 
+        # L'index des doublons est construit par tranches pendant la saisie de la question
+        self.index_timer = QTimer(self)
+        self.index_timer.timeout.connect(self.build_duplicate_index)
+        if not self.leitner_service.duplicate_index.built:
+            self.index_timer.start(0)
+
     def init_add_card_view(self):
         """Interface pour ajouter une nouvelle fiche."""
         layout = QVBoxLayout()
@@ -28,7 +36,7 @@ class AddCardView(QWidget):
         self.category_input = QComboBox()
         self.category_input.addItem("All")  # Ajouter "All" comme option par défaut
         self.category_input.addItem("Sélectionnez ou ajoutez une catégorie")
-        self.category_input.addItems(self.leitner_service.categories)  # Charger les catégories existantes
+        self.category_input.addItems(self.leitner_service.get_all_categories())  # Charger les catégories existantes
         self.category_input.setEditable(True)  # Permettre à l'utilisateur d'ajouter une nouvelle catégorie
         self.category_input.setStyleSheet("font-size: 16px; padding: 8px;")
 
@@ -54,6 +62,19 @@ class AddCardView(QWidget):
 
         self.setLayout(layout)
 
+        # Les catégories créées ou supprimées depuis une autre fenêtre sont reportées dans le menu
+        self.store.categoriesChanged.connect(self.on_categories_changed)
+
+    MAX_SHOWN_DUPLICATES = 5  # Cartes semblables citées dans l'avertissement
+
+    def build_duplicate_index(self):
+        """Indexe une tranche de cartes ; s'arrête une fois l'index complet."""
+        if self.leitner_service.duplicate_index.build_step():
+            self.index_timer.stop()
+
+    def on_categories_changed(self, names):
+        fill_categories(self.category_input, names, fixed=2)
+
     def eventFilter(self, source, event):
             """Intercepte les événements clavier pour activer la soumission avec Ctrl + Entrée."""
             if source == self.command_input and event.type() == QEvent.KeyPress:
@@ -73,15 +94,40 @@ class AddCardView(QWidget):
         category = self.category_input.currentText()
 
         if question and command:
-            if category and category not in self.leitner_service.get_all_categories():
-                self.leitner_service.add_category(category)
-
             card = {
                 'question': question,
                 'command': command,
                 'box': 0,
                 'category': category
             }
+            similar = self.leitner_service.find_similar(card)
+            if similar:
+                choice = self.ask_duplicate(similar)
+                if choice == QMessageBox.Cancel:
+                    return
+                if choice == QMessageBox.Save:
+                    # Fusion : la carte existante prend la nouvelle formulation et garde sa progression
+                    existing = similar[0][0]
+                    self.leitner_service.update_card({'id': existing['id'], 'question': question,
+                                                      'command': command, 'category': category})
+                    QMessageBox.information(self, "Enregistré", f"La carte '{question}' a été mise à jour.")
+                    self.close()
+                    return
             self.leitner_service.add_card(card)
             QMessageBox.information(self, "Enregistré", f"La carte '{question}' a été ajoutée.")
             self.close()
+
+    def ask_duplicate(self, similar):
+        """Signale des cartes semblables ; renvoie Save (fusionner), Ignore (ajouter quand même) ou Cancel."""
+        lines = [f"• {card['question']}  ({card.get('command', '')}) : {similarity:.0%}"
+                 for card, similarity in similar[:self.MAX_SHOWN_DUPLICATES]]
+        box = QMessageBox(self)
+        box.setIcon(QMessageBox.Warning)
+        box.setWindowTitle("Doublon possible")
+        box.setText("Cette carte ressemble à des cartes du deck :\n\n" + "\n".join(lines))
+        box.setStandardButtons(QMessageBox.Save | QMessageBox.Ignore | QMessageBox.Cancel)
+        box.button(QMessageBox.Save).setText("Mettre à jour la plus proche")
+        box.button(QMessageBox.Ignore).setText("Ajouter quand même")
+        box.setDefaultButton(QMessageBox.Cancel)
+        box.exec()
+        return box.standardButton(box.clickedButton())
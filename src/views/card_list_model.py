@@ -0,0 +1,138 @@
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QSize # type: ignore
+from PySide6.QtGui import QColor, QFont # type: ignore
+from PySide6.QtWidgets import QStyledItemDelegate, QStyle # type: ignore
+
+class CardListModel(QAbstractListModel):
+    """
+    Modèle de liste des cartes affichées dans la gestion des fiches.
+
+    Seules les lignes visibles sont dessinées par la vue ; une modification de carte
+    n'émet que le signal de sa ligne (dataChanged, rowsInserted ou rowsRemoved).
+    """
+
+    CardRole = Qt.UserRole + 1
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._cards = []
+        self._rows = {}  # id -> ligne, reconstruit paresseusement après une suppression
+        self._rows_dirty = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._cards)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        card = self._cards[index.row()]
+        if role == self.CardRole:
+            return card
+        if role == Qt.DisplayRole:
+            return f"📋 {card['question']} (Boîte {card['box'] + 1})"
+        if role == Qt.ToolTipRole:
+            return card.get('command', '')
+        return None
+
+    def set_cards(self, cards):
+        """Remplace toutes les lignes (nouveau filtre)."""
+        self.beginResetModel()
+        self._cards = list(cards)
+        self._rows = {card['id']: row for row, card in enumerate(self._cards)}
+        self._rows_dirty = False
+        self.endResetModel()
+
+    def card_at(self, row):
+        return self._cards[row] if 0 <= row < len(self._cards) else None
+
+    def row_of(self, card_id):
+        if self._rows_dirty:
+            self._rows = {card['id']: row for row, card in enumerate(self._cards)}
+            self._rows_dirty = False
+        return self._rows.get(card_id)
+
+    def append_card(self, card):
+        self.append_cards([card])
+
+    def append_cards(self, cards):
+        """Ajoute des lignes en fin de liste, avec un seul signal rowsInserted."""
+        if not cards:
+            return
+        first = len(self._cards)
+        self.beginInsertRows(QModelIndex(), first, first + len(cards) - 1)
+        self._cards.extend(cards)
+        for row, card in enumerate(cards, first):
+            self._rows[card['id']] = row
+        self.endInsertRows()
+
+    def refresh_card(self, card):
+        """Signale la modification d'une carte déjà affichée."""
+        row = self.row_of(card['id'])
+        if row is not None:
+            self._cards[row] = card
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+    def remove_card(self, card_id):
+        row = self.row_of(card_id)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._cards[row]
+        del self._rows[card_id]
+        self._rows_dirty = row < len(self._cards)  # Les lignes suivantes ont été décalées
+        self.endRemoveRows()
+
+    def remove_cards(self, card_ids):
+        """Retire plusieurs lignes : un signal rowsRemoved par plage de lignes consécutives."""
+        rows = sorted((row for row in map(self.row_of, card_ids) if row is not None), reverse=True)
+        position = 0
+        while position < len(rows):
+            last = first = rows[position]
+            position += 1
+            while position < len(rows) and rows[position] == first - 1:
+                first = rows[position]
+                position += 1
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self._cards[first:last + 1]
+            self.endRemoveRows()
+        self._rows = {card['id']: row for row, card in enumerate(self._cards)}
+        self._rows_dirty = False
+
+
+class CardDelegate(QStyledItemDelegate):
+    """Dessine une carte (question, boîte et catégorie) sans créer de widgets."""
+
+    ROW_HEIGHT = 56
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.title_font = QFont()
+        self.title_font.setPointSize(12)
+        self.title_font.setBold(True)
+        self.body_font = QFont()
+        self.body_font.setPointSize(10)
+
+    def paint(self, painter, option, index):
+        card = index.data(CardListModel.CardRole)
+        painter.save()
+
+        selected = option.state & QStyle.State_Selected
+        background = option.palette.highlight() if selected else QColor("#f9f9f9")
+        painter.fillRect(option.rect.adjusted(0, 2, 0, -2), background)
+
+        rect = option.rect.adjusted(10, 6, -10, -6)
+        title = f"📋 {card['question']} (Boîte {card['box'] + 1})"
+        painter.setFont(self.title_font)
+        painter.setPen(option.palette.highlightedText().color() if selected else QColor("#333"))
+        title = painter.fontMetrics().elidedText(title, Qt.ElideRight, rect.width())
+        painter.drawText(rect, Qt.AlignLeft | Qt.AlignTop, title)
+
+        painter.setFont(self.body_font)
+        if not selected:
+            painter.setPen(QColor("#555"))
+        painter.drawText(rect, Qt.AlignLeft | Qt.AlignBottom,
+                         f"Catégorie : {card.get('category', 'Aucune catégorie')}")
+        painter.restore()
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self.ROW_HEIGHT)
@@ -1,157 +1,268 @@
 from PySide6.QtWidgets import (QPushButton, QLabel, QVBoxLayout, QWidget, 
-                               QComboBox, QMessageBox, QFrame, QHBoxLayout, 
-                               QScrollArea, QInputDialog, QDialog, QLineEdit)
+                               QComboBox, QMessageBox, QHBoxLayout, QListView,
+                               QInputDialog, QDialog, QLineEdit, QMenu)
 from PySide6.QtGui import QIcon
-from PySide6.QtCore import Qt
-from src.model import LeitnerService
-from functools import partial
+from PySide6.QtCore import Qt, QTimer
+from src import diagnostics
+from .card_list_model import CardListModel, CardDelegate
+from .category_combo import fill_categories
+
+ALL_CATEGORIES = "Toutes les catégories"
 
 class CardManagementView(QWidget):
-    def __init__(self):
+    SEARCH_DELAY_MS = 150  # Délai de regroupement des frappes dans le champ de recherche
+
+    def __init__(self, store):
         super().__init__()
-        self.leitner_service = LeitnerService()
-        self.scroll_layout = None  # Définir l'attribut ici
+        self.setAttribute(Qt.WA_DeleteOnClose)  # Libère la fenêtre (et ses connexions) à la fermeture
+        self.store = store
+        self.leitner_service = store.service  # Deck partagé : aucune lecture de fichier à l'ouverture
         self.init_view_cards()
+        self.store.cardAdded.connect(self.on_card_added)
+        self.store.cardUpdated.connect(self.on_card_changed)
+        self.store.cardMoved.connect(self.on_card_changed)
+        self.store.cardDeleted.connect(self.on_card_deleted)
+        self.store.cardsLoaded.connect(self.on_cards_loaded)
+        self.store.cardsAdded.connect(self.on_cards_loaded)
+        self.store.categoriesChanged.connect(self.on_categories_changed)
 
     def init_view_cards(self):
-        """Interface pour afficher toutes les cartes avec une UI améliorée et défilement vertical."""
-        scroll_area = QScrollArea()
-        scroll_area.setWidgetResizable(True)
-        scroll_content = QWidget()
-        self.scroll_layout = QVBoxLayout(scroll_content)  # Définir self.scroll_layout ici
+        """Interface pour afficher toutes les cartes dans une liste virtualisée."""
+        main_layout = QVBoxLayout()
 
         # Champ de recherche
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("Rechercher par mot-clé...")
-        self.search_input.textChanged.connect(self.update_card_view)  # Mettre à jour les cartes lors de la recherche
-        self.scroll_layout.addWidget(self.search_input)
+        main_layout.addWidget(self.search_input)
+
+        # La recherche n'est lancée qu'après une courte pause dans la frappe
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(self.update_card_view)
+        self.search_input.textChanged.connect(self.search_timer.start)
+
+        # Les lignes des cartes supprimées ou sorties du filtre sont retirées ensemble (actions en masse)
+        self.pending_removals = set()
+        self.removal_timer = QTimer(self)
+        self.removal_timer.setSingleShot(True)
+        self.removal_timer.timeout.connect(self.remove_pending_rows)
+
+        # L'index de recherche du deck partagé est construit par tranches pendant les temps morts
+        self.index_timer = QTimer(self)
+        self.index_timer.timeout.connect(self.build_search_index)
+        if not self.leitner_service.search_index.built:
+            self.index_timer.start(0)
 
         # Filtre par catégorie
         self.category_combo = QComboBox()
-        self.category_combo.addItem("Toutes les catégories")
+        self.category_combo.addItem(ALL_CATEGORIES)
 
         # Ajouter dynamiquement les catégories à partir du modèle
-        categories = self.leitner_service.get_all_categories()
-        for category in categories:
-            self.category_combo.addItem(category)
+        self.category_combo.addItems(self.leitner_service.get_all_categories())
 
         self.category_combo.currentIndexChanged.connect(self.update_card_view)
-        self.scroll_layout.addWidget(self.category_combo)
-
-        # Ajoutez un espace de séparation (optionnel) pour l'esthétique
-        self.scroll_layout.addSpacing(10)
+        category_layout = QHBoxLayout()
+        category_layout.addWidget(self.category_combo, 1)
+        btn_rename_category = QPushButton("Renommer / fusionner")
+        btn_rename_category.clicked.connect(self.rename_category)
+        category_layout.addWidget(btn_rename_category)
+        main_layout.addLayout(category_layout)
+
+        # Liste des cartes : seules les lignes visibles sont dessinées par le délégué
+        self.card_model = CardListModel(self)
+        self.card_list = QListView()
+        self.card_list.setModel(self.card_model)
+        self.card_list.setItemDelegate(CardDelegate(self.card_list))
+        self.card_list.setUniformItemSizes(True)
+        self.card_list.setSelectionMode(QListView.ExtendedSelection)  # Maj / Ctrl : actions en masse
+        self.card_list.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.card_list.customContextMenuRequested.connect(self.show_card_menu)
+        self.card_list.doubleClicked.connect(lambda index: self.edit_selected_field('question'))
+        main_layout.addWidget(self.card_list)
+
+        self.empty_label = QLabel("Aucune carte n'a été trouvée.")
+        self.empty_label.setAlignment(Qt.AlignCenter)
+        main_layout.addWidget(self.empty_label)
+
+        # Ligne horizontale pour les boutons d'action : suppression, catégorie et déplacement
+        # s'appliquent à toutes les cartes sélectionnées, les modifications de texte à la carte courante
+        action_layout = QHBoxLayout()
+
+        # Bouton Supprimer avec icône
+        btn_delete = QPushButton("Supprimer")
+        btn_delete.setIcon(QIcon("icons/trash.png"))
+        btn_delete.setStyleSheet("color: white; background-color: #e74c3c; border-radius: 4px; padding: 5px;")
+        btn_delete.clicked.connect(lambda: self.with_selected_cards(self.delete_cards))
+        action_layout.addWidget(btn_delete)
+
+        # Bouton Modifier Question
+        btn_edit_question = QPushButton("Modifier Question")
+        btn_edit_question.setIcon(QIcon("icons/edit.png"))
+        btn_edit_question.setStyleSheet("color: white; background-color: #f39c12; border-radius: 4px; padding: 5px;")
+        btn_edit_question.clicked.connect(lambda: self.edit_selected_field('question'))
+        action_layout.addWidget(btn_edit_question)
+
+        # Bouton Modifier Réponse
+        btn_edit_answer = QPushButton("Modifier Réponse")
+        btn_edit_answer.setIcon(QIcon("icons/edit.png"))
+        btn_edit_answer.setStyleSheet("color: white; background-color: #f39c12; border-radius: 4px; padding: 5px;")
+        btn_edit_answer.clicked.connect(lambda: self.edit_selected_field('command'))
+        action_layout.addWidget(btn_edit_answer)
+
+        # Bouton Modifier Catégorie
+        btn_edit_category = QPushButton("Modifier Catégorie")
+        btn_edit_category.setIcon(QIcon("icons/edit.png"))
+        btn_edit_category.setStyleSheet("color: white; background-color: #16a085; border-radius: 4px; padding: 5px;")
+        btn_edit_category.clicked.connect(lambda: self.with_selected_cards(self.edit_cards_category))
+        action_layout.addWidget(btn_edit_category)
+
+        # Bouton Déplacer avec menu déroulant pour sélectionner la boîte
+        self.box_combo = QComboBox()
+        self.box_combo.addItems([f"Boîte {i + 1}" for i in range(5)])
+        action_layout.addWidget(self.box_combo)
+
+        btn_move = QPushButton("Déplacer")
+        btn_move.setIcon(QIcon("icons/move.png"))
+        btn_move.setStyleSheet("color: white; background-color: #3498db; border-radius: 4px; padding: 5px;")
+        btn_move.clicked.connect(lambda: self.with_selected_cards(self.move_cards, self.box_combo.currentIndex()))
+        action_layout.addWidget(btn_move)
+
+        main_layout.addLayout(action_layout)
+        self.setLayout(main_layout)
 
         # Initialiser l'affichage des cartes
         self.display_cards()  # Afficher les cartes lors de l'initialisation
 
-        scroll_area.setWidget(scroll_content)
-        main_layout = QVBoxLayout()
-        main_layout.addWidget(scroll_area)
-        self.setLayout(main_layout)
+    def build_search_index(self):
+        """Indexe une tranche de cartes ; s'arrête une fois l'index complet."""
+        if self.leitner_service.search_index.build_step():
+            self.index_timer.stop()
 
+    @diagnostics.timed("view.display_cards")
     def display_cards(self):
-        """Affiche toutes les cartes dans le layout après application des filtres."""
-        # Effacez les anciens widgets
-        for i in reversed(range(self.scroll_layout.count())): 
-            widget = self.scroll_layout.itemAt(i).widget()
-            if widget is not None and widget not in [self.search_input, self.category_combo]:
-                widget.deleteLater()
-
-        all_cards = self.leitner_service.get_all_cards()
-        filtered_cards = self.filter_cards(all_cards)
-
-        if not filtered_cards:
-            empty_label = QLabel("Aucune carte n'a été trouvée.")
-            empty_label.setAlignment(Qt.AlignCenter)
-            self.scroll_layout.addWidget(empty_label)
-        else:
-            for card in filtered_cards:
-                # Créer un conteneur pour chaque carte
-                card_frame = QFrame()
-                card_frame.setFrameShape(QFrame.StyledPanel)
-                card_frame.setStyleSheet("background-color: #f9f9f9; border-radius: 8px; padding: 10px; margin-bottom: 10px;")
-
-                card_layout = QVBoxLayout()
-
-                # Titre de la carte (question)
-                card_label = QLabel(f"📋 {card['question']} (Boîte {card['box'] + 1})")
-                card_label.setStyleSheet("font-size: 16px; font-weight: bold; color: #333;")
-                card_layout.addWidget(card_label)
-
-                # Affichage de la catégorie
-                category_label = QLabel(f"Catégorie : {card.get('category', 'Aucune catégorie')}")
-                category_label.setStyleSheet("font-size: 14px; color: #555;")
-                card_layout.addWidget(category_label)
-
-                # Ligne horizontale pour les boutons d'action
-                action_layout = QHBoxLayout()
-
-                # Bouton Supprimer avec icône
-                btn_delete = QPushButton("Supprimer")
-                btn_delete.setIcon(QIcon("icons/trash.png"))
-                btn_delete.setStyleSheet("color: white; background-color: #e74c3c; border-radius: 4px; padding: 5px;")
-                btn_delete.clicked.connect(partial(self.delete_card, card['question']))
-                action_layout.addWidget(btn_delete)
-
-                # Bouton Modifier Question
-                btn_edit_question = QPushButton("Modifier Question")
-                btn_edit_question.setIcon(QIcon("icons/edit.png"))
-                btn_edit_question.setStyleSheet("color: white; background-color: #f39c12; border-radius: 4px; padding: 5px;")
-                btn_edit_question.clicked.connect(partial(self.edit_card_field, card['question'], 'question'))
-                action_layout.addWidget(btn_edit_question)
-
-                # Bouton Modifier Réponse
-                btn_edit_answer = QPushButton("Modifier Réponse")
-                btn_edit_answer.setIcon(QIcon("icons/edit.png"))
-                btn_edit_answer.setStyleSheet("color: white; background-color: #f39c12; border-radius: 4px; padding: 5px;")
-                btn_edit_answer.clicked.connect(partial(self.edit_card_field, card['question'], 'command'))
-                action_layout.addWidget(btn_edit_answer)
-
-                # Bouton Modifier Catégorie
-                btn_edit_category = QPushButton("Modifier Catégorie")
-                btn_edit_category.setIcon(QIcon("icons/edit.png"))
-                btn_edit_category.setStyleSheet("color: white; background-color: #16a085; border-radius: 4px; padding: 5px;")
-                btn_edit_category.clicked.connect(partial(self.edit_card_category, card['question']))
-                action_layout.addWidget(btn_edit_category)
-
-                # Bouton Déplacer avec menu déroulant pour sélectionner la boîte
-                btn_move = QPushButton("Déplacer")
-                btn_move.setIcon(QIcon("icons/move.png"))
-                btn_move.setStyleSheet("color: white; background-color: #3498db; border-radius: 4px; padding: 5px;")
-                combo_box = QComboBox()
-                combo_box.addItems([f"Boîte {i + 1}" for i in range(5)])
-                action_layout.addWidget(combo_box)
-
-                btn_move.clicked.connect(partial(self.move_card, card['question'], combo_box))
-                action_layout.addWidget(btn_move)
-
-                # Ajouter le layout d'action à la carte
-                card_layout.addLayout(action_layout)
-                card_frame.setLayout(card_layout)
-
-                # Ajouter le cadre de la carte au layout principal
-                self.scroll_layout.addWidget(card_frame)
-
-    def filter_cards(self, cards):
-        """Filtre les cartes selon le mot-clé et la catégorie."""
-        keyword = self.search_input.text().lower()
-        category = self.category_combo.currentText()
-
-        filtered_cards = []
-        for card in cards:
-            if (keyword in card['question'].lower() or keyword in card.get('command', '').lower()) and \
-               (category == "Toutes les catégories" or card.get('category', '') == category):
-                filtered_cards.append(card)
-
-        return filtered_cards
+        """Recharge le modèle de la liste avec les cartes qui passent les filtres."""
+        self.pending_removals.clear()  # Liste reconstruite : les suppressions en attente y sont déjà
+        self.card_model.set_cards(self.filter_cards())
+        self.update_empty_label()
+
+    def update_empty_label(self):
+        """Affiche le message d'absence de carte lorsque la liste est vide."""
+        self.empty_label.setVisible(self.card_model.rowCount() == 0)
+
+    def selected_card_id(self):
+        """Identifiant de la carte sélectionnée dans la liste, ou None."""
+        card = self.card_model.card_at(self.card_list.currentIndex().row())
+        return card['id'] if card else None
+
+    def selected_card_ids(self):
+        """Identifiants des cartes sélectionnées, dans l'ordre de la liste."""
+        rows = sorted(index.row() for index in self.card_list.selectionModel().selectedIndexes())
+        return [card['id'] for card in map(self.card_model.card_at, rows) if card]
+
+    def with_selected_card(self, action, *args):
+        """Applique une action à la carte sélectionnée."""
+        card_id = self.selected_card_id()
+        if card_id is None:
+            QMessageBox.warning(self, "Erreur", "Sélectionnez une carte.")
+            return
+        action(card_id, *args)
+
+    def with_selected_cards(self, action, *args):
+        """Applique une action en masse aux cartes sélectionnées."""
+        card_ids = self.selected_card_ids()
+        if not card_ids:
+            QMessageBox.warning(self, "Erreur", "Sélectionnez une ou plusieurs cartes.")
+            return
+        action(card_ids, *args)
+
+    def edit_selected_field(self, field):
+        """Modifie la question ou la réponse de la carte sélectionnée."""
+        self.with_selected_card(self.edit_card_field, field)
+
+    def show_card_menu(self, position):
+        """Menu contextuel reprenant les actions sur la carte sous le curseur."""
+        index = self.card_list.indexAt(position)
+        if not index.isValid():
+            return
+        if not self.card_list.selectionModel().isSelected(index):
+            self.card_list.setCurrentIndex(index)  # Sinon la sélection multiple est conservée
+
+        menu = QMenu(self)
+        menu.addAction("Modifier Question", lambda: self.edit_selected_field('question'))
+        menu.addAction("Modifier Réponse", lambda: self.edit_selected_field('command'))
+        menu.addAction("Modifier Catégorie", lambda: self.with_selected_cards(self.edit_cards_category))
+        move_menu = menu.addMenu("Déplacer")
+        for box in range(5):
+            move_menu.addAction(f"Boîte {box + 1}", lambda box=box: self.with_selected_cards(self.move_cards, box))
+        menu.addSeparator()
+        menu.addAction("Supprimer", lambda: self.with_selected_cards(self.delete_cards))
+        menu.exec(self.card_list.viewport().mapToGlobal(position))
+
+    def filter_cards(self):
+        """Filtre les cartes selon le mot-clé et la catégorie, à l'aide de l'index de recherche du modèle."""
+        keyword, category = self.current_filter()
+        return self.leitner_service.search_cards(keyword, None if category == ALL_CATEGORIES else category)
+
+    def current_filter(self):
+        """Mot-clé (en minuscules) et catégorie actuellement sélectionnés."""
+        return self.search_input.text().lower(), self.category_combo.currentText()
+
+    def matches_filter(self, card, keyword, category):
+        """Indique si une carte passe les filtres de recherche et de catégorie."""
+        return (keyword in card['question'].lower() or keyword in card.get('command', '').lower()) and \
+               (category == ALL_CATEGORIES or card.get('category', '') == category)
+
+    def on_categories_changed(self, names):
+        """Reporte dans le filtre les catégories apparues ou disparues."""
+        if fill_categories(self.category_combo, names):
+            self.update_card_view()
+
+    def on_card_added(self, card):
+        """Ajoute une ligne pour une carte créée, dans cette fenêtre ou une autre."""
+        if self.matches_filter(card, *self.current_filter()):
+            self.card_model.append_card(card)
+            self.update_empty_label()
+
+    def on_cards_loaded(self, cards):
+        """Ajoute en une fois les lignes d'un lot (chargé en arrière-plan ou importé) qui passent les filtres."""
+        keyword, category = self.current_filter()
+        self.card_model.append_cards([card for card in cards if self.matches_filter(card, keyword, category)])
+        self.update_empty_label()
+
+    def on_card_changed(self, card):
+        """Met à jour la seule ligne de la carte modifiée (ou l'ajoute/la retire selon les filtres)."""
+        shown = self.card_model.row_of(card['id']) is not None
+        if self.matches_filter(card, *self.current_filter()):
+            self.pending_removals.discard(card['id'])
+            if shown:
+                self.card_model.refresh_card(card)
+            else:
+                self.card_model.append_card(card)
+        elif shown:
+            self.queue_removal(card['id'])
+        self.update_empty_label()
+
+    def on_card_deleted(self, card):
+        """Retire la ligne d'une carte supprimée."""
+        self.queue_removal(card['id'])
+
+    def queue_removal(self, card_id):
+        self.pending_removals.add(card_id)
+        self.removal_timer.start(0)
+
+    def remove_pending_rows(self):
+        removals, self.pending_removals = self.pending_removals, set()
+        self.card_model.remove_cards(removals)
+        self.update_empty_label()
 
     def update_card_view(self):
         """Met à jour l'affichage des cartes selon les filtres appliqués."""
         self.display_cards()  # Appeler display_cards pour afficher les cartes
 
-    def edit_card_field(self, question, field):
+    def edit_card_field(self, card_id, field):
         """Ouvre une boîte de dialogue pour modifier le champ spécifié (question ou réponse) d'une carte."""
-        card = self.leitner_service.get_card_by_question(question)
+        card = self.leitner_service.get_card(card_id)
 
         if not card:
             QMessageBox.warning(self, "Erreur", "Carte introuvable.")
@@ -178,48 +289,53 @@ class CardManagementView(QWidget):
             else:
                 QMessageBox.warning(self, "Erreur", f"Le champ {field} ne peut pas être vide.")
 
-            self.update_card_view()
-
-    def edit_card_category(self, question):
-        """Permet de modifier la catégorie associée à une carte."""
-        card = self.leitner_service.get_card_by_question(question)
-
-        if not card:
-            QMessageBox.warning(self, "Erreur", "Carte introuvable.")
-            return
+    def edit_cards_category(self, card_ids):
+        """Permet de modifier la catégorie des cartes sélectionnées, en une seule écriture."""
+        card = self.leitner_service.get_card(card_ids[0])
+        categories = self.leitner_service.get_all_categories()
+        current = categories.index(card['category']) if card and card.get('category') in categories else 0
 
-        new_category, ok = QInputDialog.getItem(self, "Modifier Catégorie", 
-                                                 "Sélectionnez une nouvelle catégorie :",
-                                                 self.leitner_service.get_all_categories(), editable=True)
+        new_category, ok = QInputDialog.getItem(self, "Modifier Catégorie",
+                                                 f"Nouvelle catégorie ({len(card_ids)} carte(s)) :",
+                                                 categories, current, editable=True)
 
         if ok and new_category:
-            card['category'] = new_category
-            self.leitner_service.update_card(card)
-            self.update_card_view()
+            self.leitner_service.update_cards([{'id': card_id, 'category': new_category} for card_id in card_ids])
 
-    def delete_card(self, question):
-        """Supprime une carte en fonction de la question."""
-        card = self.leitner_service.get_card_by_question(question)
-        if not card:
-            QMessageBox.warning(self, "Erreur", "Carte introuvable.")
+    def rename_category(self):
+        """Renomme la catégorie du filtre, ou la fusionne dans une catégorie existante."""
+        old = self.category_combo.currentText()
+        if old == ALL_CATEGORIES:
+            QMessageBox.warning(self, "Erreur", "Sélectionnez une catégorie dans le filtre.")
             return
+        others = [name for name in self.leitner_service.get_all_categories() if name != old]
+        new, ok = QInputDialog.getItem(self, "Renommer / fusionner",
+                                       f"Nouveau nom de la catégorie « {old} » (ou catégorie existante) :",
+                                       [old] + others, editable=True)
+        new = new.strip()
+        if ok and new and new != old:
+            merged = new in others
+            count = self.leitner_service.rename_category(old, new)
+            self.category_combo.setCurrentText(new)
+            QMessageBox.information(self, "Catégorie modifiée",
+                                    f"{count} carte(s) {'fusionnée(s) dans' if merged else 'renommée(s) en'} « {new} ».")
+
+    def delete_cards(self, card_ids):
+        """Supprime les cartes sélectionnées, après confirmation."""
+        if len(card_ids) == 1:
+            card = self.leitner_service.get_card(card_ids[0])
+            if not card:
+                QMessageBox.warning(self, "Erreur", "Carte introuvable.")
+                return
+            message = f"Êtes-vous sûr de vouloir supprimer la carte : '{card['question']}' ?"
+        else:
+            message = f"Êtes-vous sûr de vouloir supprimer ces {len(card_ids)} cartes ?"
 
-        confirm = QMessageBox.question(self, "Confirmer", f"Êtes-vous sûr de vouloir supprimer la carte : '{question}' ?",
-                                        QMessageBox.Yes | QMessageBox.No)
+        confirm = QMessageBox.question(self, "Confirmer", message, QMessageBox.Yes | QMessageBox.No)
 
         if confirm == QMessageBox.Yes:
-            self.leitner_service.delete_card(card['question'])
-            self.update_card_view()
-
-    def move_card(self, question, combo_box):
-        """Déplace une carte vers une nouvelle boîte."""
-        card = self.leitner_service.get_card_by_question(question)
-
-        if not card:
-            QMessageBox.warning(self, "Erreur", "Carte introuvable.")
-            return
+            self.leitner_service.delete_cards(card_ids)
 
-        box_index = combo_box.currentIndex()  # Récupérer l'index de la boîte sélectionnée
-        card['box'] = box_index
-        self.leitner_service.update_card(card)
-        self.update_card_view()
+    def move_cards(self, card_ids, box_index):
+        """Déplace les cartes sélectionnées vers une nouvelle boîte."""
+        self.leitner_service.move_cards(card_ids, box_index)
@@ -0,0 +1,22 @@
+def fill_categories(combo, names, fixed=1):
+    """
+    Remplace les catégories d'un menu déroulant par `names` (signal categoriesChanged du deck),
+    après ses `fixed` premiers éléments qui restent en place. La sélection est conservée si sa
+    catégorie existe toujours ; renvoie True si elle a changé (la vue doit alors se rafraîchir).
+    """
+    if [combo.itemText(index) for index in range(fixed, combo.count())] == names:
+        return False
+    text = combo.currentText()
+    combo.blockSignals(True)
+    while combo.count() > fixed:
+        combo.removeItem(combo.count() - 1)
+    combo.addItems(names)
+    index = combo.findText(text)
+    if index != -1:
+        combo.setCurrentIndex(index)
+    elif combo.isEditable():
+        combo.setEditText(text)  # Nouvelle catégorie en cours de saisie
+    else:
+        combo.setCurrentIndex(0)
+    combo.blockSignals(False)
+    return combo.currentText() != text
@@ -0,0 +1,99 @@
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, # type: ignore
+                               QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox)
+from PySide6.QtCore import Qt, QTimer # type: ignore
+from src import diagnostics
+
+DURATION_COLUMNS = ("Mesure", "Appels", "Moyenne (ms)", "p50 (ms)", "p95 (ms)", "Max (ms)", "Total (ms)")
+WRITE_COLUMNS = ("Fichier", "Écritures", "Moyenne (Kio)", "Max (Kio)", "Total (Kio)")
+
+
+class DiagnosticsView(QWidget):
+    """Mesures de l'instrumentation (LEITNER_DIAGNOSTICS=1), rafraîchies chaque seconde."""
+
+    REFRESH_MS = 1000
+
+    def __init__(self):
+        super().__init__()
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.init_view()
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(self.REFRESH_MS)
+        self.refresh()
+
+    def init_view(self):
+        self.setWindowTitle("Diagnostics")
+        self.setGeometry(100, 100, 900, 600)
+        layout = QVBoxLayout()
+
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+        layout.addWidget(QLabel("Durée des appels"))
+        self.duration_table = self.make_table(DURATION_COLUMNS)
+        layout.addWidget(self.duration_table)
+
+        layout.addWidget(QLabel("Sauvegardes"))
+        self.write_table = self.make_table(WRITE_COLUMNS)
+        layout.addWidget(self.write_table)
+
+        buttons = QHBoxLayout()
+        btn_reset = QPushButton("Remettre à zéro")
+        btn_reset.clicked.connect(self.reset)
+        btn_export = QPushButton("Exporter")
+        btn_export.clicked.connect(self.export)
+        btn_close = QPushButton("Fermer")
+        btn_close.clicked.connect(self.close)
+        buttons.addWidget(btn_reset)
+        buttons.addWidget(btn_export)
+        buttons.addWidget(btn_close)
+        layout.addLayout(buttons)
+
+        self.setLayout(layout)
+
+    @staticmethod
+    def make_table(columns):
+        table = QTableWidget(0, len(columns))
+        table.setHorizontalHeaderLabels(columns)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        table.verticalHeader().hide()
+        table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        return table
+
+    @staticmethod
+    def fill_table(table, rows):
+        table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value if isinstance(value, str) else f"{value:,.3f}".rstrip("0").rstrip("."))
+                if column:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                table.setItem(row, column, item)
+
+    def refresh(self):
+        registry = diagnostics.registry
+        gauges = registry.gauges()
+        self.summary_label.setText(" - ".join(f"{name} : {value}" for name, value in gauges.items())
+                                   or "Aucune jauge.")
+        self.fill_table(self.duration_table, [
+            (name, histogram.count, histogram.sum / histogram.count * 1000, histogram.quantile(0.5) * 1000,
+             histogram.quantile(0.95) * 1000, histogram.max * 1000, histogram.sum * 1000)
+            for name, histogram in registry.histograms('call_duration_seconds').items()
+        ])
+        self.fill_table(self.write_table, [
+            (file, histogram.count, histogram.sum / histogram.count / 1024, histogram.max / 1024, histogram.sum / 1024)
+            for file, histogram in registry.histograms('write_bytes').items()
+        ])
+
+    def reset(self):
+        diagnostics.registry.reset()
+        self.refresh()
+
+    def export(self):
+        try:
+            diagnostics.registry.dump()
+        except OSError as error:
+            QMessageBox.warning(self, "Erreur", str(error))
+            return
+        QMessageBox.information(self, "Diagnostics",
+                                f"Mesures écrites dans {diagnostics.OUTPUT}.json et {diagnostics.OUTPUT}.prom.")
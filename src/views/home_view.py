@@ -1,12 +1,18 @@
-from PySide6.QtWidgets import QVBoxLayout, QPushButton, QWidget # type: ignore
-from .add_card_view import AddCardView
-from .review_view import ReviewView
-from .card_management_view import CardManagementView
+from PySide6.QtWidgets import QVBoxLayout, QPushButton, QWidget, QProgressBar, QMessageBox # type: ignore
+from src import diagnostics
+
+# Les autres fenêtres ne sont importées qu'à leur première ouverture : le démarrage
+# n'importe que ce module et les quelques widgets de l'accueil.
 
 class HomeView(QWidget):
-    def __init__(self):
+    def __init__(self, store):
         super().__init__()
+        self.store = store  # Deck partagé, transmis à chaque fenêtre ouverte
         self.init_home()
+        self.store.loadProgress.connect(self.on_load_progress)
+        self.store.loadFinished.connect(self.load_progress.hide)
+        self.store.loadFailed.connect(self.on_load_failed)
+        self.store.conflictsDetected.connect(self.on_conflicts)
 
     def init_home(self):
         """Initialisation de l'interface d'accueil."""
@@ -27,26 +33,100 @@ class HomeView(QWidget):
         btn_manage_cards.setStyleSheet("background-color: #5c85d6; color: white; padding: 10px; font-size: 16px; border-radius: 5px;")
         btn_manage_cards.clicked.connect(self.init_view_cards)
 
+        btn_import = QPushButton("Importer / exporter des fiches")
+        btn_import.setStyleSheet("background-color: #5c85d6; color: white; padding: 10px; font-size: 16px; border-radius: 5px;")
+        btn_import.clicked.connect(self.init_import)
+
+        btn_stats = QPushButton("Statistiques")
+        btn_stats.setStyleSheet("background-color: #5c85d6; color: white; padding: 10px; font-size: 16px; border-radius: 5px;")
+        btn_stats.clicked.connect(self.init_stats)
 
         layout.addWidget(btn_add_card)
         layout.addWidget(btn_revision)
         layout.addWidget(btn_manage_cards)
+        layout.addWidget(btn_import)
+        layout.addWidget(btn_stats)
+
+        # Mesures de performance, seulement si l'instrumentation est activée (LEITNER_DIAGNOSTICS=1)
+        if diagnostics.ENABLED:
+            btn_diagnostics = QPushButton("Diagnostics")
+            btn_diagnostics.clicked.connect(self.init_diagnostics)
+            layout.addWidget(btn_diagnostics)
+
+        # Avancement du chargement du deck, masqué une fois celui-ci terminé
+        self.load_progress = QProgressBar()
+        self.load_progress.setFormat("Chargement du deck... %p%")
+        self.load_progress.setVisible(self.store.loading)
+        layout.addWidget(self.load_progress)
 
         container = QWidget()
         container.setLayout(layout)
         self.setLayout(layout)
 
+    def on_load_progress(self, percent):
+        self.load_progress.show()
+        self.load_progress.setValue(percent)
+
+    def on_load_failed(self, message):
+        self.load_progress.hide()
+        QMessageBox.critical(self, "Erreur", f"Le deck n'a pas pu être entièrement chargé : {message}")
+
+    def on_conflicts(self, conflicts):
+        """Prévient que des modifications ont été écartées au profit de celles d'un autre processus."""
+        lines = []
+        for conflict in conflicts[:10]:
+            card = conflict.local or conflict.remote
+            if conflict.remote is None:
+                note = " (supprimée)"
+            elif conflict.local is None:
+                note = " (suppression annulée)"
+            else:
+                note = ""
+            lines.append(f"- {card['question']}{note}")
+        if len(conflicts) > 10:
+            lines.append(f"... et {len(conflicts) - 10} autre(s)")
+        QMessageBox.warning(self, "Modifications écartées",
+                            "Ces cartes ont été modifiées par une autre instance de l'application "
+                            "pendant que vous les modifiiez ; leur dernière version enregistrée est conservée :\n"
+                            + "\n".join(lines))
+
     def init_add_card(self):
         """Ouvre l'interface pour ajouter une nouvelle fiche."""
-        self.add_card_view = AddCardView()
+        from .add_card_view import AddCardView
+        self.store.ensure_loading()
+        self.add_card_view = AddCardView(self.store)
         self.add_card_view.show()
 
     def init_review_view(self):
         """Ouvre l'interface de révision des fiches."""
-        self.review_view = ReviewView()
+        from .review_view import ReviewView
+        self.store.ensure_loading()
+        self.review_view = ReviewView(self.store)
         self.review_view.show()
         
+    def init_import(self):
+        """Ouvre la fenêtre d'import et d'export des fiches."""
+        from .import_dialog import ImportDialog
+        self.store.ensure_loading()
+        self.import_dialog = ImportDialog(self.store)
+        self.import_dialog.show()
+
+    def init_stats(self):
+        """Ouvre les statistiques et la prévision des révisions."""
+        from .stats_view import StatsView
+        self.store.ensure_loading()
+        self.stats_view = StatsView(self.store)
+        self.stats_view.show()
+
+    def init_diagnostics(self):
+        """Ouvre la fenêtre des mesures de performance."""
+        from .diagnostics_view import DiagnosticsView
+        self.diagnostics_view = DiagnosticsView()
+        self.diagnostics_view.show()
+
     def init_view_cards(self):
         """Ouvre l'interface de révision des fiches."""
-        self.review_view = CardManagementView()
+        from .card_management_view import CardManagementView
+        self.store.ensure_loading()
+        self.review_view = CardManagementView(self.store)
         self.review_view.show()
\ No newline at end of file
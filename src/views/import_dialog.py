@@ -0,0 +1,146 @@
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QLineEdit, # type: ignore
+                               QPushButton, QComboBox, QProgressBar, QLabel, QFileDialog, QMessageBox,
+                               QCheckBox)
+from PySide6.QtCore import Qt, QTimer # type: ignore
+from src import transfer
+
+FILE_FILTER = "Fiches (*.csv *.jsonl *.ndjson *.tsv *.txt);;Tous les fichiers (*)"
+
+
+class ImportDialog(QDialog):
+    """
+    Import (et export) de fiches en masse. L'import avance d'un lot par passage de la
+    boucle d'événements : la fenêtre reste réactive et peut l'interrompre entre deux lots.
+    """
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.store = store
+        self.leitner_service = store.service
+        self.import_steps = None  # Générateur transfer.iter_import en cours
+        self.report = None  # Bilan du dernier lot importé
+        self.import_timer = QTimer(self)
+        self.import_timer.timeout.connect(self.import_step)
+        self.init_import_view()
+
+    def init_import_view(self):
+        self.setWindowTitle("Importer des fiches")
+        layout = QVBoxLayout()
+        form = QFormLayout()
+
+        path_layout = QHBoxLayout()
+        self.path_input = QLineEdit()
+        btn_browse = QPushButton("Parcourir...")
+        btn_browse.clicked.connect(self.choose_file)
+        path_layout.addWidget(self.path_input)
+        path_layout.addWidget(btn_browse)
+        form.addRow("Fichier", path_layout)
+
+        self.format_combo = QComboBox()
+        self.format_combo.addItem("Selon l'extension", None)
+        self.format_combo.addItem("CSV", 'csv')
+        self.format_combo.addItem("JSON Lines", 'jsonl')
+        self.format_combo.addItem("Anki (texte tabulé)", 'anki')
+        form.addRow("Format", self.format_combo)
+
+        self.category_input = QLineEdit()
+        self.category_input.setPlaceholderText("Pour les fiches sans catégorie")
+        form.addRow("Catégorie", self.category_input)
+
+        # Fiches qui ressemblent à une carte du deck ou du fichier (voir duplicates.py)
+        self.skip_similar_input = QCheckBox("Ignorer les quasi-doublons (sinon importés et signalés)")
+        form.addRow("", self.skip_similar_input)
+        layout.addLayout(form)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.hide()
+        layout.addWidget(self.progress_bar)
+
+        self.status_label = QLabel()
+        self.status_label.setWordWrap(True)
+        layout.addWidget(self.status_label)
+
+        buttons = QHBoxLayout()
+        self.btn_import = QPushButton("Importer")
+        self.btn_import.setStyleSheet("background-color: #5c85d6; color: white; padding: 8px; border-radius: 5px;")
+        self.btn_import.clicked.connect(self.start_import)
+        btn_export = QPushButton("Exporter le deck...")
+        btn_export.clicked.connect(self.export_deck)
+        self.btn_close = QPushButton("Fermer")
+        self.btn_close.clicked.connect(self.close)
+        buttons.addWidget(self.btn_import)
+        buttons.addWidget(btn_export)
+        buttons.addWidget(self.btn_close)
+        layout.addLayout(buttons)
+
+        self.setLayout(layout)
+
+    def choose_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Fichier à importer", "", FILE_FILTER)
+        if path:
+            self.path_input.setText(path)
+
+    def start_import(self):
+        path = self.path_input.text().strip()
+        if not path:
+            QMessageBox.warning(self, "Erreur", "Choisissez un fichier à importer.")
+            return
+        try:
+            format = self.format_combo.currentData() or transfer.guess_format(path)
+            near_duplicates = 'skip' if self.skip_similar_input.isChecked() else 'keep'
+            self.import_steps = transfer.iter_import(self.leitner_service, path, format,
+                                                     self.category_input.text().strip() or None,
+                                                     near_duplicates=near_duplicates)
+        except (OSError, ValueError) as error:
+            QMessageBox.warning(self, "Erreur", str(error))
+            return
+        self.report = None
+        self.btn_import.setEnabled(False)
+        self.btn_close.setText("Interrompre")
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.import_timer.start(0)
+
+    def import_step(self):
+        """Importe un lot et affiche l'avancement."""
+        try:
+            report = next(self.import_steps)
+        except StopIteration:
+            self.finish_import("Import terminé.")
+            return
+        except (OSError, ValueError) as error:
+            self.finish_import(f"Import interrompu : {error}")
+            return
+        self.report = report
+        self.progress_bar.setValue(report.progress)
+        self.status_label.setText(str(report))
+
+    def finish_import(self, message):
+        self.import_timer.stop()
+        if self.import_steps is not None:
+            self.import_steps.close()  # Ferme le fichier ; les lots déjà importés sont conservés
+            self.import_steps = None
+        self.status_label.setText(message + ("\n" + str(self.report) if self.report is not None else ""))
+        self.progress_bar.hide()
+        self.btn_import.setEnabled(True)
+        self.btn_close.setText("Fermer")
+
+    def export_deck(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Exporter le deck", "cartes.csv", FILE_FILTER)
+        if not path:
+            return
+        try:
+            count = transfer.export_cards(self.leitner_service, path)
+        except (OSError, ValueError) as error:
+            QMessageBox.warning(self, "Erreur", str(error))
+            return
+        self.status_label.setText(f"{count} carte(s) exportée(s) dans {path}.")
+
+    def closeEvent(self, event):
+        if self.import_steps is not None:
+            # Premier clic : on interrompt l'import ; la fenêtre reste ouverte pour le bilan
+            self.finish_import("Import interrompu.")
+            event.ignore()
+            return
+        super().closeEvent(event)
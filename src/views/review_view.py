@@ -1,17 +1,31 @@
 import sys
+import time
 from PySide6.QtWidgets import ( QPushButton, QLabel, QVBoxLayout, # type: ignore
                             QWidget, QTextEdit, QComboBox, QFrame)
 from PySide6.QtGui import QFont # type: ignore
-from PySide6.QtCore import Qt, QEvent # type: ignore
-from src.model import LeitnerService
+from PySide6.QtCore import Qt, QEvent, QTimer # type: ignore
+from src import diagnostics
+from src.scheduler import next_due_timestamp
+from .category_combo import fill_categories
 from functools import partial
-from datetime import datetime, timedelta
+from datetime import datetime
 
 class ReviewView(QWidget):
-    def __init__(self):
+    def __init__(self, store):
         super().__init__()
-        self.leitner_service = LeitnerService() 
+        self.setAttribute(Qt.WA_DeleteOnClose)  # Libère la fenêtre (et ses connexions) à la fermeture
+        self.store = store
+        self.leitner_service = store.service  # Deck partagé : aucune lecture de fichier à l'ouverture
         self.init_combined_view()
+        # Les rafales de modifications (chargement, journal rejoué) ne redessinent les boîtes qu'une fois
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.timeout.connect(self.update_revision_boxes)
+        self.store.connect_all(self.on_cards_changed)
+        self.store.cardsLoaded.connect(self.on_cards_loaded)
+        self.store.cardsAdded.connect(self.on_cards_loaded)
+        self.store.cardsRescheduled.connect(self.on_cards_loaded)
+        self.store.categoriesChanged.connect(self.on_categories_changed)
 
     def init_combined_view(self):
         """Interface combinée pour sélectionner une catégorie et choisir une boîte de révision."""
@@ -56,6 +70,19 @@ class ReviewView(QWidget):
         # Appeler update_revision_boxes après la configuration initiale
         self.update_revision_boxes()  # Ajoutez cette ligne pour que les boîtes s'affichent immédiatement
 
+    def on_cards_changed(self, card):
+        """Rafraîchit les boîtes lorsqu'une carte est modifiée, dans cette fenêtre ou une autre."""
+        self.refresh_timer.start(0)
+
+    def on_cards_loaded(self, cards):
+        """Met à jour les compteurs après un lot de cartes (chargement du deck, import, échéances recalculées)."""
+        self.refresh_timer.start(0)
+
+    def on_categories_changed(self, names):
+        if fill_categories(self.category_input, names):
+            self.refresh_timer.start(0)
+
+    @diagnostics.timed("view.update_revision_boxes")
     def update_revision_boxes(self):
         """Actualise l'affichage des boîtes de révision en fonction de la catégorie sélectionnée."""
 
@@ -71,52 +98,44 @@ class ReviewView(QWidget):
 
         # Ajouter les boutons de boîtes de révision filtrés par catégorie
         for i in range(5):  # Boîtes de 1 à 5
-            cards_in_box = self.leitner_service.get_cards_by_box_and_category(i, selected_category)
+            # Compteur et échéance la plus proche sont tenus à jour par le planificateur
+            count = self.leitner_service.count_cards(i, selected_category)
+            next_revision = self.leitner_service.get_next_due(i, selected_category)
 
-            if not cards_in_box:
+            if next_revision is None:
                 revision_status = "Pas de cartes à réviser"
+            elif datetime.now() >= next_revision:
+                revision_status = "Révision à faire"
             else:
-                last_revision = min([card['last_revision'] for card in cards_in_box])
-                due, next_revision = self.is_revision_due(last_revision, i)
-                revision_status = "Révision à faire" if due else f"Prochaine révision dans {self.format_time_left(next_revision - datetime.now())}"
+                revision_status = f"Prochaine révision dans {self.format_time_left(next_revision - datetime.now())}"
 
-            btn_box = QPushButton(f"Boîte {i + 1} - {revision_status}")
+            btn_box = QPushButton(f"Boîte {i + 1} ({count} cartes) - {revision_status}")
             btn_box.clicked.connect(partial(self.launch_start_review, i, selected_category))
             btn_box.setStyleSheet("background-color: #5c85d6; color: white; padding: 10px; font-size: 18px; border-radius: 5px;")
             self.box_layout.addWidget(btn_box)
 
     def launch_start_review(self, selected_box, selected_category):
         print(f"Launching review for box {selected_box} and category {selected_category}")
-        self.start_review_view = StartReviewView(selected_box, selected_category)
+        self.start_review_view = StartReviewView(self.store, selected_box, selected_category)
         self.start_review_view.show()
 
-    def is_revision_due(self, last_revision, box):
+    def is_revision_due(self, card):
         """
-        Vérifie si une révision est due pour une carte donnée, en fonction de l'intervalle de la boîte.
-        
-        last_revision : string (date ISO format)
-        box : int (index de la boîte, entre 0 et 4)
-        
+        Vérifie si une révision est due pour une carte donnée, selon le délai de sa boîte ou celui
+        choisi par l'algorithme de planification (voir scheduler.next_due_timestamp).
+
         Renvoie un tuple (due, next_revision)
         due : booléen indiquant si la révision est due
-        next_revision : datetime de la prochaine révision
+        next_revision : datetime de la prochaine révision (None pour une carte jamais révisée)
         """
-        last_revision_date = datetime.fromisoformat(last_revision)
-        # Délais de révision en fonction de la boîte (en minutes, jours, semaines, mois)
-        intervals = [
-            timedelta(minutes=10),   # Boîte 1 : 10 minutes
-            timedelta(days=1),       # Boîte 2 : 1 jour
-            timedelta(weeks=1),      # Boîte 3 : 1 semaine
-            timedelta(weeks=4),      # Boîte 4 : 1 mois (approximé à 4 semaines)
-            timedelta(weeks=24)      # Boîte 5 : 6 mois (approximé à 24 semaines)
-        ]
-        
-        # Calcul de la prochaine date de révision en fonction de la boîte
-        next_revision = last_revision_date + intervals[box]
-        
+        due_at = next_due_timestamp(card)
+        if due_at is None:
+            return True, None
+        next_revision = datetime.fromtimestamp(due_at)
+
         # Si la date actuelle est supérieure ou égale à la prochaine révision, elle est due
         due = datetime.now() >= next_revision
-        
+
         return due, next_revision
 
     def format_time_left(self, time_left):
@@ -135,16 +154,28 @@ class ReviewView(QWidget):
             return f"{minutes}m"
 
 class StartReviewView(QWidget):
-    def __init__(self, selected_box, selected_category):
+    ANSWER_POLL_MS = 20  # Consultation du verdict d'une réponse exécutée (mode 'execute')
+
+    def __init__(self, store, selected_box, selected_category):
         super().__init__()
-        self.leitner_service = LeitnerService()
+        self.setAttribute(Qt.WA_DeleteOnClose)  # Libère la fenêtre (et ses connexions) à la fermeture
+        self.store = store
+        self.leitner_service = store.service
         self.results = []
         self.current_index = 0
         self.selected_box = selected_box
         self.selected_category = selected_category
-        self.questions = self.leitner_service.get_cards_by_box_and_category(selected_box, selected_category)
+        # Seules les cartes dont la révision est due sont chargées pour la session
+        self.questions = self.leitner_service.get_due_cards(selected_box, selected_category)
+        # Mode 'execute' : processus d'exécution lancés pendant que l'on répond à la première carte
+        self.leitner_service.prepare_answers()
+        self.pending_answer = None  # (carte, Future du verdict, temps de réponse) d'une réponse en cours d'exécution
+        self.answer_timer = QTimer(self)
+        self.answer_timer.setInterval(self.ANSWER_POLL_MS)
+        self.answer_timer.timeout.connect(self.poll_answer)
 
         self.init_ui()  # Initialiser l'interface une seule fois
+        self.store.cardDeleted.connect(self.on_card_deleted)
 
         if self.questions:
             self.show_current_question()
@@ -199,39 +230,77 @@ class StartReviewView(QWidget):
 
         self.setLayout(self.layout)
 
+    def on_card_deleted(self, card):
+        """Retire des questions à venir une carte supprimée depuis une autre fenêtre."""
+        upcoming = self.questions[self.current_index + 1:]
+        if any(question['id'] == card['id'] for question in upcoming):
+            self.questions = self.questions[:self.current_index + 1] + \
+                [question for question in upcoming if question['id'] != card['id']]
+
     def show_current_question(self):
         """Met à jour l'interface pour afficher la question actuelle sans recréer les widgets."""
         current_card = self.questions[self.current_index]
         self.question_label.setText(current_card['question'])  # Mettre à jour la question
         self.command_input.clear()  # Effacer le champ de texte pour la nouvelle réponse
         self.feedback_label.hide()  # Cacher le feedback pour la prochaine question
+        self.question_shown_at = time.monotonic()  # Début du temps de réponse
 
+    @diagnostics.timed("view.submit_revision")
     def submit_revision(self):
         """Soumet la réponse, affiche le feedback et attend que l'utilisateur passe à la question suivante."""
+        if self.pending_answer is not None:
+            return  # Réponse précédente encore en cours d'exécution
         current_card = self.questions[self.current_index]
-        user_command = self.command_input.toPlainText().strip()
+        user_command = self.command_input.toPlainText()
+        latency = time.monotonic() - self.question_shown_at
+
+        # Espaces, guillemets, ordre des options... selon le mode de comparaison choisi ; en mode
+        # 'execute', une réponse différente est exécutée en arrière-plan : la fenêtre reste active
+        verdict = self.leitner_service.submit_answer(current_card, user_command)
+        if verdict.done():
+            self.show_feedback(current_card, verdict.result(), latency)
+            return
+        self.pending_answer = (current_card, verdict, latency)
+        self.feedback_label.setText("Exécution de la commande…")
+        self.feedback_label.setStyleSheet("color: gray;")
+        self.feedback_label.show()
+        self.btn_submit.setEnabled(False)
+        self.answer_timer.start()
+
+    def poll_answer(self):
+        """Affiche le verdict d'une réponse exécutée, dès qu'il est connu."""
+        current_card, verdict, latency = self.pending_answer
+        if not verdict.done():
+            return
+        self.answer_timer.stop()
+        self.pending_answer = None
+        self.btn_submit.setEnabled(True)
+        self.show_feedback(current_card, verdict.result(), latency)
+
+    def record_answer(self, current_card, correct, latency):
+        """Enregistre la réponse et l'ajoute aux résultats de la session ; renvoie la bonne réponse."""
         correct_answer = current_card['command'].strip()
 
-        correct = user_command == correct_answer
+        # Change de boîte selon la réussite, met à jour la date de révision, enregistre
+        # et ajoute la réponse à l'historique
+        self.leitner_service.review_card(current_card, correct, latency)
+
+        # Ajoute la question, la correction et la bonne réponse dans les résultats
+        self.results.append((current_card['question'], correct, correct_answer))
+        return correct_answer
+
+    def show_feedback(self, current_card, correct, latency):
+        correct_answer = self.record_answer(current_card, correct, latency)
 
-        # Met à jour la boîte en fonction de la réussite ou de l'échec
         if correct:
-            current_card['box'] = min(current_card['box'] + 1, 4)  # Passe à la boîte suivante (max boîte 4)
             self.feedback_label.setText("✔ Correct!")
             self.feedback_label.setStyleSheet("color: green;")
         else:
-            current_card['box'] = max(current_card['box'] - 1, 0)  # Revient à la boîte précédente
             self.feedback_label.setText(f"✘ Incorrect! La bonne réponse est: {correct_answer}")
             self.feedback_label.setStyleSheet("color: red;")
 
         self.feedback_label.show()  # Afficher le feedback
 
-        current_card['last_revision'] = datetime.now().isoformat()  # Met à jour la date de révision
-        self.leitner_service.update_card(current_card)  # Enregistre les modifications
-
-        # Ajoute la question, la correction et la bonne réponse dans les résultats
-        self.results.append((current_card['question'], correct, correct_answer))
-
         # Change la fonction du bouton pour aller à la question suivante
         self.btn_submit.setText("Question suivante")
         self.btn_submit.clicked.disconnect()  # Déconnecte le signal précédent
@@ -277,6 +346,11 @@ class StartReviewView(QWidget):
 
     def show_results(self):
         """Affiche les résultats après la révision."""
+        if self.pending_answer is not None:
+            # Révision terminée pendant l'exécution d'une réponse : son verdict est attendu (TIMEOUT au plus)
+            self.answer_timer.stop()
+            (current_card, verdict, latency), self.pending_answer = self.pending_answer, None
+            self.record_answer(current_card, verdict.result(), latency)
         self.clear_layout()
 
         if not self.results:
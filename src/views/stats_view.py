@@ -0,0 +1,143 @@
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox, # type: ignore
+                               QTableWidget, QTableWidgetItem, QHeaderView)
+from PySide6.QtCore import Qt, QTimer # type: ignore
+from src import diagnostics, forecast
+
+ALL_LABEL = "Toutes les catégories"
+NO_CATEGORY_LABEL = "(sans catégorie)"
+WEEKDAYS = ("lun.", "mar.", "mer.", "jeu.", "ven.", "sam.", "dim.")
+
+
+class StatsView(QWidget):
+    """
+    Statistiques du deck : cartes dues chaque jour des 90 prochains jours, par boîte,
+    répartition des cartes et taux de réussite par boîte. Les tableaux NumPy du deck ne sont
+    reconstruits qu'après une modification ; changer de catégorie ne fait que les relire.
+    """
+
+    REBUILD_DELAY_MS = 500  # Une rafale de modifications ne reconstruit les tableaux qu'une fois
+
+    def __init__(self, store):
+        super().__init__()
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.store = store
+        self.leitner_service = store.service
+        self.deck = None
+        self.init_view()
+        self.rebuild_timer = QTimer(self)
+        self.rebuild_timer.setSingleShot(True)
+        self.rebuild_timer.timeout.connect(self.rebuild)
+        self.store.connect_all(self.on_cards_changed)
+        self.store.cardsLoaded.connect(self.on_cards_changed)
+        self.store.cardsAdded.connect(self.on_cards_changed)
+        self.store.cardsRescheduled.connect(self.on_cards_changed)
+        self.rebuild()
+
+    def init_view(self):
+        self.setWindowTitle("Statistiques")
+        self.setGeometry(100, 100, 900, 700)
+        layout = QVBoxLayout()
+
+        self.category_input = QComboBox()
+        self.category_input.setStyleSheet("font-size: 16px; padding: 8px;")
+        self.category_input.currentIndexChanged.connect(self.refresh)
+        layout.addWidget(self.category_input)
+
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+        layout.addWidget(QLabel("Répartition par boîte"))
+        self.box_table = self.make_table(("Boîte", "Cartes", "Part du deck", "Révisions", "Réussite"))
+        self.box_table.setMaximumHeight(200)
+        layout.addWidget(self.box_table)
+
+        layout.addWidget(QLabel(f"Cartes à réviser sur {forecast.DEFAULT_DAYS} jours (sans nouvelle révision)"))
+        self.forecast_table = self.make_table(
+            ("Jour",) + tuple(f"Boîte {box + 1}" for box in range(forecast.NUM_BOXES)) + ("Total",))
+        layout.addWidget(self.forecast_table)
+
+        buttons = QHBoxLayout()
+        btn_refresh = QPushButton("Actualiser")
+        btn_refresh.clicked.connect(self.rebuild)
+        btn_close = QPushButton("Fermer")
+        btn_close.clicked.connect(self.close)
+        buttons.addWidget(btn_refresh)
+        buttons.addWidget(btn_close)
+        layout.addLayout(buttons)
+
+        self.setLayout(layout)
+
+    @staticmethod
+    def make_table(columns):
+        table = QTableWidget(0, len(columns))
+        table.setHorizontalHeaderLabels(columns)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        table.verticalHeader().hide()
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        return table
+
+    @staticmethod
+    def fill_table(table, rows):
+        table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(str(value))
+                if column:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                table.setItem(row, column, item)
+
+    def on_cards_changed(self, _):
+        self.rebuild_timer.start(self.REBUILD_DELAY_MS)
+
+    @diagnostics.timed("view.stats_rebuild")
+    def rebuild(self):
+        """Convertit le deck en tableaux, calcule prévision et répartition pour toutes les catégories."""
+        self.deck = forecast.DeckArrays(self.leitner_service.get_all_cards())
+        self.forecast = forecast.forecast(self.deck)
+        self.distribution = forecast.box_distribution(self.deck)
+        self.days = forecast.day_labels()
+
+        selected = self.category_input.currentData()
+        self.category_input.blockSignals(True)  # Un seul rafraîchissement, après la liste
+        self.category_input.clear()
+        self.category_input.addItem(ALL_LABEL, None)
+        for code in sorted(range(len(self.deck.names)), key=lambda code: self.deck.names[code].lower()):
+            self.category_input.addItem(self.deck.names[code] or NO_CATEGORY_LABEL, self.deck.names[code])
+        index = self.category_input.findData(selected) if selected is not None else 0
+        self.category_input.setCurrentIndex(max(index, 0))
+        self.category_input.blockSignals(False)
+        self.refresh()
+
+    def refresh(self):
+        """Affiche les chiffres de la catégorie choisie (ou de tout le deck)."""
+        if self.deck is None:
+            return
+        category = self.category_input.currentData()
+        if category is None:
+            due = self.forecast.sum(axis=0)  # [boîte, jour]
+            cards = self.distribution.sum(axis=0)
+        else:
+            code = self.deck.names.index(category)
+            due, cards = self.forecast[code], self.distribution[code]
+
+        total = int(cards.sum())
+        per_day = due.sum(axis=0)
+        self.summary_label.setText(
+            f"{total} carte(s) - à réviser aujourd'hui : {int(per_day[0])}, "
+            f"sous 7 jours : {int(per_day[:7].sum())}, sous 30 jours : {int(per_day[:30].sum())}, "
+            f"sous {len(per_day)} jours : {int(per_day.sum())}")
+
+        # Réussite par boîte : historique des révisions, toutes catégories confondues
+        stats = self.leitner_service.history.stats
+        rows = []
+        for box in range(forecast.NUM_BOXES):
+            reviews = stats.boxes.get(str(box), (0, 0))[0]
+            rate = stats.success_rate(stats.boxes, box)
+            rows.append((f"Boîte {box + 1}", int(cards[box]), f"{cards[box] / total:.1%}" if total else "-",
+                         reviews, f"{rate:.1%}" if rate is not None else "-"))
+        self.fill_table(self.box_table, rows)
+
+        self.fill_table(self.forecast_table, [
+            (f"{WEEKDAYS[day.weekday()]} {day:%d/%m/%Y}",) + tuple(int(count) for count in due[:, offset]) + (int(per_day[offset]),)
+            for offset, day in enumerate(self.days)
+        ])